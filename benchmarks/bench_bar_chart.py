@@ -0,0 +1,142 @@
+"""
+This script compares the bar chart of the comparison page built with plotly express and with graph_objects.
+
+figures.create_bar_chart draws one go.Bar trace for each academic year from
+arrays precomputed for each category. It replaced a builder that filtered the
+rows of the category and passed them to px.bar, which groups the DataFrame again
+on every call. That builder is kept here as create_bar_chart_px, so both can be
+timed on the same selections: the first HE providers of the data, at each of the
+given numbers of HE providers, for every academic year. For each builder and
+number of HE providers the script reports the median and fastest time taken to
+build the figure and serialise it as Dash does, the size of the figure once
+serialised to JSON, and whether both builders drew the same figure.
+
+The data files are read from the folder given by --data-dir, so the files
+written by data/generate_synthetic_data.py can be used to compare more HE providers.
+
+Run it from the root of the repository:
+    python benchmarks/bench_bar_chart.py --providers 10 50 all --repeat 20
+    python benchmarks/bench_bar_chart.py --data-dir data/synthetic --providers 100 500 all
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+from statistics import median
+
+import plotly
+import plotly.express as px
+
+SRC_DIR = Path(__file__).parent.parent.joinpath('src')
+sys.path.insert(0, str(SRC_DIR))
+
+# The default category, from the Finances and people class
+DEFAULT_CATEGORY = 'Total income (£)'
+
+
+def create_bar_chart_px(hei=None, year=None, category=None):
+    """
+    Create the bar chart with plotly express, as figures.create_bar_chart did before it drew go.Bar traces.
+
+    Args:
+        hei (list, optional): List of HE providers to include. Defaults to None.
+        year (list, optional): List of academic years to include. Defaults to None.
+        category (str, optional): Category of data to include. Defaults to None.
+
+    Returns:
+        plotly.graph_objects.Figure: The bar chart.
+    """
+    from figures import get_bar_chart_data, to_plain_columns
+
+    data_df = get_bar_chart_data(hei, year, category)
+    unique_years = sorted(data_df['Academic Year'].unique())
+    color_scale = px.colors.qualitative.Set3[:len(unique_years)]
+    fig = px.bar(to_plain_columns(data_df), x='HE Provider', y='Value', color='Academic Year',
+                 barmode='group', color_discrete_sequence=color_scale)
+    title = f"{data_df['Category marker'].iloc[0]}: {category}" if category else None
+    fig.update_layout(title_text=title)
+    return fig
+
+
+def to_json(figure):
+    """
+    Serialise a figure to JSON, as Dash does before sending it to the browser.
+
+    Args:
+        figure (plotly.graph_objects.Figure): The figure.
+
+    Returns:
+        str: The JSON of the figure.
+    """
+    return json.dumps(figure.to_plotly_json(), cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def time_builder(builder, hei, year, category, repeat):
+    """
+    Time a bar chart builder, including the serialisation of its figure.
+
+    Args:
+        builder (callable): The bar chart builder.
+        hei (list): The HE providers to include.
+        year (list): The academic years to include.
+        category (str): The category to include.
+        repeat (int): The number of times the builder is timed.
+
+    Returns:
+        tuple: The median and fastest time in milliseconds, and the JSON of the figure.
+    """
+    output = to_json(builder(hei, year, category))
+    times = timeit.repeat(lambda: to_json(builder(hei, year, category)), number=1, repeat=repeat)
+    return median(times) * 1000, min(times) * 1000, output
+
+
+def main():
+    """
+    Time both bar chart builders at each number of HE providers and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--providers', nargs='+', default=['10', '50', 'all'],
+                        help="The numbers of HE providers to compare, or 'all'")
+    parser.add_argument('--category', default=DEFAULT_CATEGORY, help="The category shown on the bar chart")
+    parser.add_argument('--repeat', type=int, default=20, help="The number of times each builder is timed")
+    parser.add_argument('--data-dir', type=Path, help="The folder of the data files")
+    parser.add_argument('--output', type=Path, help="Save the report as JSON to this file")
+    args = parser.parse_args()
+    if args.data_dir:
+        # The dataset store reads the folder when it is imported
+        os.environ['HEI_DATA_DIR'] = str(args.data_dir.resolve())
+
+    from figures import create_bar_chart, get_bar_chart_index, get_metadata_catalog
+
+    catalog = get_metadata_catalog()
+    # Build the index first, so it is not timed as part of the first call
+    bar_chart_index = get_bar_chart_index()
+    if args.category not in bar_chart_index:
+        parser.error(f"The category {args.category!r} is not in the data")
+    years = sorted(bar_chart_index[args.category]['years'].tolist())
+
+    report = {}
+    print(f"{'Builder':<12}{'Providers':>10}{'Median ms':>12}{'Min ms':>10}{'JSON bytes':>12}{'Same':>6}")
+    for providers in args.providers:
+        heis = catalog['providers'] if providers == 'all' else catalog['providers'][:int(providers)]
+        px_median, px_min, px_output = time_builder(create_bar_chart_px, heis, years, args.category, args.repeat)
+        go_median, go_min, go_output = time_builder(create_bar_chart, heis, years, args.category, args.repeat)
+        same = json.loads(px_output) == json.loads(go_output)
+        report[len(heis)] = {
+            'px': {'median_ms': round(px_median, 3), 'min_ms': round(px_min, 3), 'json_bytes': len(px_output)},
+            'go': {'median_ms': round(go_median, 3), 'min_ms': round(go_min, 3), 'json_bytes': len(go_output)},
+            'same_figure': same}
+        for builder, results in [('px.bar', report[len(heis)]['px']), ('go.Bar', report[len(heis)]['go'])]:
+            print(f"{builder:<12}{len(heis):>10}{results['median_ms']:>12.1f}{results['min_ms']:>10.1f}"
+                  f"{results['json_bytes']:>12}{'yes' if same else 'no':>6}")
+        print(f"{'Speed-up':<12}{len(heis):>10}{px_median / go_median:>11.1f}x")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+This script reports how long it takes to import the Dash app, and which modules the time goes to.
+
+The app is imported in a new Python process started with -X importtime, once
+for each repeat. The script reports the median wall time of 'import app', the
+median self and cumulative import time of the app modules, the time taken to
+run each page module and the slowest modules overall. Dash runs the page modules
+itself rather than importing them, so -X importtime does not list them and
+their time is measured around Dash's call instead. It also reports the data files
+read while the app was imported, which should be none: the data is loaded by
+the dataset store when it is first needed, or by src/wsgi.py before the workers
+of a WSGI server are forked.
+
+Run it from the root of the repository:
+    python benchmarks/bench_import_time.py --repeat 5 --top 15
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+
+SRC_DIR = Path(__file__).parent.parent.joinpath('src')
+
+# The modules of the app reported on their own
+APP_MODULES = ['app', 'data_store', 'figures', 'export', 'http_cache', 'instrumentation', 'search_index']
+
+# Imports the app, recording the data files pandas reads and the time taken to run each
+# page module, and prints the wall time, the files and the page times as JSON
+IMPORT_SCRIPT = """
+import json, time
+from importlib.machinery import SourceFileLoader
+import pandas as pd
+reads = []
+for name in ['read_csv', 'read_parquet']:
+    def record(*args, _read=getattr(pd, name), **kwargs):
+        reads.append(str(args[0] if args else kwargs.get('filepath_or_buffer', kwargs.get('path'))))
+        return _read(*args, **kwargs)
+    setattr(pd, name, record)
+pages = {}
+exec_module = SourceFileLoader.exec_module
+def timed_exec_module(loader, module):
+    start = time.perf_counter()
+    exec_module(loader, module)
+    if module.__name__.startswith('pages.'):
+        pages[module.__name__] = (time.perf_counter() - start) * 1000
+SourceFileLoader.exec_module = timed_exec_module
+start = time.perf_counter()
+import app
+print(json.dumps({'wall_ms': (time.perf_counter() - start) * 1000, 'reads': reads, 'pages': pages}))
+"""
+
+IMPORT_TIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| *(\S+)')
+
+
+def parse_import_times(stderr):
+    """
+    Read the self and cumulative import time of each module from the output of -X importtime.
+
+    Args:
+        stderr (str): The standard error of a Python process started with -X importtime.
+
+    Returns:
+        dict: The self and cumulative time in milliseconds, keyed by module name.
+    """
+    times = {}
+    for match in IMPORT_TIME_LINE.finditer(stderr):
+        self_us, cumulative_us, module = match.groups()
+        times[module] = {'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000}
+    return times
+
+
+def import_app():
+    """
+    Import the app in a new Python process started with -X importtime.
+
+    Returns:
+        tuple: The result printed by IMPORT_SCRIPT and the import times of the modules.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT],
+                             cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.strip().splitlines()[-1]), parse_import_times(process.stderr)
+
+
+def main():
+    """
+    Import the app several times and print the median import times.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help="The number of times the app is imported")
+    parser.add_argument('--top', type=int, default=15, help="The number of slowest modules to list")
+    parser.add_argument('--output', type=Path, help="Save the report as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [import_app() for _ in range(args.repeat)]
+    modules = {module: {key: median(times[module][key] for _, times in runs if module in times)
+                        for key in ('self_ms', 'cumulative_ms')}
+               for module in set().union(*(times for _, times in runs))}
+    report = {'wall_ms': median(result['wall_ms'] for result, _ in runs),
+              'data_files_read': runs[0][0]['reads'],
+              'app_modules': {module: modules[module] for module in APP_MODULES if module in modules},
+              'page_modules': {page: median(result['pages'][page] for result, _ in runs)
+                               for page in sorted(runs[0][0]['pages'])},
+              'slowest_modules': dict(sorted(modules.items(), key=lambda item: item[1]['self_ms'],
+                                             reverse=True)[:args.top])}
+
+    print(f"import app: {report['wall_ms']:.1f} ms (median of {args.repeat})")
+    print(f"Data files read at import: {len(report['data_files_read'])}")
+    for file_path in report['data_files_read']:
+        print(f"    {file_path}")
+    print(f"\n{'Page modules':<40}{'Run ms':>12}")
+    for page, run_ms in report['page_modules'].items():
+        print(f"{page:<40}{run_ms:>12.1f}")
+    for title, rows in [("App modules", report['app_modules']), ("Slowest modules", report['slowest_modules'])]:
+        print(f"\n{title:<40}{'Self ms':>12}{'Cumulative ms':>16}")
+        for module, times in rows.items():
+            print(f"{module:<40}{times['self_ms']:>12.1f}{times['cumulative_ms']:>16.1f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+This script benchmarks create_scatter_mapbox against the previous builder that
+added one Scattermapbox trace for every HE provider.
+
+For each builder it reports the median time taken to build the homepage map and
+the size of the figure once serialised to JSON, which is what Dash sends to the
+browser.
+
+Run it from the root of the repository:
+    python benchmarks/bench_scatter_mapbox.py --repeat 20
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from statistics import median
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath('src')))
+
+from data_store import data_path  # noqa: E402
+from figures import create_scatter_mapbox, filter_dataframe, load_data  # noqa: E402
+
+
+def legacy_scatter_mapbox(region=None, hei=None):
+    """
+    Create the scatter mapbox plot with one trace for each HE provider.
+
+    This is the builder create_scatter_mapbox replaced, kept here for comparison.
+
+    Args:
+        region (list, optional): Filter the plot by region of HE provider. Defaults to None.
+        hei (list, optional): Filter the plot by HE provider. Defaults to None.
+
+    Returns:
+        go.Figure: Plotly graph objects Scatter mapbox plot.
+    """
+    cols = ['UKPRN', 'HE Provider', 'Region of HE provider', 'lat', 'lon']
+    df_loc = load_data(data_path('hei_data.csv'), cols)
+    if region:
+        df_loc = filter_dataframe(df_loc, {'Region of HE provider': region})
+    if hei:
+        df_loc = filter_dataframe(df_loc, {'HE Provider': hei})
+
+    regions = df_loc['Region of HE provider'].unique()
+    colors = px.colors.qualitative.Set3[:len(regions)]
+    color_scale = {region: color for region, color in zip(regions, colors)}
+
+    fig = go.Figure()
+    added_regions = {}
+    for _, row in df_loc.iterrows():
+        region = row['Region of HE provider']
+        trace_settings = dict(lat=[row['lat']], lon=[row['lon']], mode='markers',
+                              marker=dict(
+                                  size=12, color=color_scale[region], opacity=0.7),
+                              text=row['HE Provider'], hoverinfo='text',
+                              customdata=[row['UKPRN']])
+        if region not in added_regions:
+            trace_settings['name'] = region
+            added_regions[region] = True
+        else:
+            trace_settings['showlegend'] = False
+        fig.add_trace(go.Scattermapbox(**trace_settings))
+
+    fig.update_layout(mapbox_style="carto-positron", mapbox_zoom=4.8,
+                      mapbox_center={
+                          "lat": df_loc['lat'].mean(), "lon": df_loc['lon'].mean()},
+                      margin={"r": 0, "t": 0, "l": 0, "b": 0}, width=800, height=370,
+                      legend_title_text='Region', showlegend=True)
+    return fig
+
+
+def benchmark(builder, repeat):
+    """
+    Time a map builder and measure the size of the figure it returns.
+
+    Args:
+        builder (callable): The function that builds the map.
+        repeat (int): The number of times to build the map.
+
+    Returns:
+        dict: The median build time in milliseconds, the number of traces and
+        the size of the serialised figure in bytes.
+    """
+    times = timeit.repeat(builder, number=1, repeat=repeat)
+    fig = builder()
+    return {'build_ms': median(times) * 1000, 'traces': len(fig.data),
+            'json_bytes': len(fig.to_json())}
+
+
+def main():
+    """
+    Run the benchmark and print a comparison of the two builders.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='number of times each builder is run (default: 20)')
+    args = parser.parse_args()
+
+    # Load the data before timing so both builders read from memory
+    create_scatter_mapbox()
+    results = {'legacy (one trace per HEI)': benchmark(legacy_scatter_mapbox, args.repeat),
+               'vectorised (one trace per region)': benchmark(create_scatter_mapbox, args.repeat)}
+
+    print(f"{'builder':<36}{'build (ms)':>12}{'traces':>8}{'JSON (bytes)':>14}")
+    for name, result in results.items():
+        print(f"{name:<36}{result['build_ms']:>12.2f}{result['traces']:>8}{result['json_bytes']:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+This script is the benchmark suite of the figure builders and page callbacks.
+
+Every builder in figures.py and every page callback is called directly, without
+a browser, on the data in the data folder and on synthetic copies of it that are
+larger by the given scale factors. For each function the suite reports the
+median and fastest time taken and the size of its output once serialised to
+JSON, which is what Dash sends to the browser. The figure cache is cleared
+before each callback call, so the callbacks are timed as if the figure had not
+been built before.
+
+Each scale runs in its own process, so the caches of one scale do not affect
+the next. The data files are read from the folder given by --data-dir, which
+defaults to the data folder of the app, so files written by
+data/generate_synthetic_data.py can be benchmarked too. The report can be saved as JSON and compared with a previous report:
+the script exits with status 1 if a function became slower, or its output
+larger, by more than the threshold.
+
+Run it from the root of the repository:
+    python benchmarks/bench_suite.py --scales 1 10 100 --repeat 5 --output report.json
+    python benchmarks/bench_suite.py --compare report.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+from contextvars import copy_context
+from pathlib import Path
+from statistics import median
+
+import pandas as pd
+import plotly
+
+SRC_DIR = Path(__file__).parent.parent.joinpath('src')
+sys.path.insert(0, str(SRC_DIR))
+
+import data_store  # noqa: E402
+
+# The data files copied at each scale
+HEI_FILE = 'hei_data.csv'
+ENTRY_FILES = ['entry_data.csv', 'dataset_prepared.csv']
+
+
+def scale_dataset(source_dir, target_dir, scale):
+    """
+    Write copies of the data files with every HE provider repeated a number of times.
+
+    The copies of a HE provider get a numbered name, a new UKPRN and a slightly
+    moved location, so they behave as separate providers with the same values.
+
+    Args:
+        source_dir (pathlib.Path): The folder of the data files to copy.
+        target_dir (pathlib.Path): The folder to write the copies to.
+        scale (int): The number of copies of each HE provider.
+    """
+    suffixes = [''] + [f" ({copy + 1})" for copy in range(1, scale)]
+    hei_df = pd.read_csv(source_dir.joinpath(HEI_FILE))
+    pd.concat([hei_df.assign(**{
+        'UKPRN': hei_df['UKPRN'] + copy * 100_000_000,
+        'HE Provider': hei_df['HE Provider'] + suffix,
+        'Alternative Name': hei_df['Alternative Name'].astype(str) + suffix,
+        'lat': hei_df['lat'] + copy * 0.001,
+        'lon': hei_df['lon'] + copy * 0.001}) for copy, suffix in enumerate(suffixes)]
+    ).to_csv(target_dir.joinpath(HEI_FILE), index=False)
+    for file_name in ENTRY_FILES:
+        data_df = pd.read_csv(source_dir.joinpath(file_name))
+        pd.concat([data_df.assign(**{'HE Provider': data_df['HE Provider'] + suffix}) for suffix in suffixes]
+                  ).to_csv(target_dir.joinpath(file_name), index=False)
+
+
+def json_size(output):
+    """
+    Return the size of the output of a builder or callback once serialised to JSON.
+
+    Args:
+        output: The figure, component, Patch or value returned.
+
+    Returns:
+        int: The number of bytes, or None for values such as the indexes that are
+        not sent to the browser.
+    """
+    try:
+        return len(json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder))
+    except TypeError:
+        return None
+
+
+def with_trigger(callback_function, prop_id, *args):
+    """
+    Call a callback function as if the given input had triggered it.
+
+    Args:
+        callback_function (callable): The callback function.
+        prop_id (str): The 'id.property' of the input that changed.
+        *args: The arguments of the callback.
+
+    Returns:
+        The output of the callback.
+    """
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    def call():
+        context_value.set(AttributeDict(triggered_inputs=[{'prop_id': prop_id, 'value': None}]))
+        return callback_function(*args)
+    return copy_context().run(call)
+
+
+def benchmark_cases():
+    """
+    Return the builders and callbacks to benchmark, called on values taken from the loaded data.
+
+    Returns:
+        list: A list of (name, function) pairs. Each function takes no arguments.
+    """
+    import app  # noqa: F401  (registers the pages)
+    import figures
+    from data_store import data_path, dataset_store
+    from pages import comparison, homepage, overview, ranking_table
+
+    catalog = figures.get_metadata_catalog()
+    provider = catalog['providers'][0]
+    region = catalog['regions'][0]
+    class_name, markers = next(iter(catalog['class_markers'].items()))
+    category = catalog['marker_categories'][markers[0]][0]
+    years = dataset_store.get(data_path('entry_data.csv'))['Academic Year'].unique().tolist()
+    ukprn = next(iter(catalog['ukprn_names']))
+    heis = catalog['providers'][:10]
+    entry_df = dataset_store.get(data_path('entry_data.csv'))
+    hei_df = dataset_store.get(data_path('hei_data.csv'))
+    prepared_df = dataset_store.get(data_path('dataset_prepared.csv'))
+    filter_query = '{HE Provider} icontains "university"'
+    sort_by = [{'column_id': 'HE Provider', 'direction': 'desc'}]
+
+    def cold(callback_function, *args):
+        figures.figure_cache.clear()
+        return callback_function(*args)
+
+    return [
+        ('figures.build_metadata_catalog', lambda: figures.build_metadata_catalog(entry_df, hei_df)),
+        ('figures.build_card_metrics', lambda: figures.build_card_metrics(entry_df, hei_df)),
+        ('figures.build_line_chart_index', lambda: figures.build_line_chart_index(entry_df)),
+        ('figures.build_bar_chart_index', lambda: figures.build_bar_chart_index(entry_df)),
+        ('figures.build_ranking_pivots', lambda: figures.build_ranking_pivots(prepared_df)),
+        ('figures.create_scatter_mapbox', figures.create_scatter_mapbox),
+        ('figures.create_scatter_mapbox[region]', lambda: figures.create_scatter_mapbox(region=[region])),
+        ('figures.create_map_patch[region]', lambda: figures.create_map_patch(region=[region])),
+        ('figures.create_card', lambda: figures.create_card(ukprn)),
+        ('figures.create_line_chart', lambda: figures.create_line_chart(provider, class_name, markers[0])),
+        ('figures.get_line_chart_series', lambda: figures.get_line_chart_series(provider)),
+        ('figures.create_bar_chart[10]', lambda: figures.create_bar_chart(heis, years, category)),
+        ('figures.create_bar_chart[all]', lambda: figures.create_bar_chart(catalog['providers'], years, category)),
+        ('figures.create_ranking_table', lambda: figures.create_ranking_table(class_name, years[-1], None)),
+        ('figures.get_ranking_page[query]', lambda: figures.get_ranking_page(
+            class_name, years[-1], None, 1, figures.RANKING_PAGE_SIZE, filter_query, sort_by)),
+        ('figures.create_category_marker_options', lambda: figures.create_category_marker_options(class_name)),
+        ('figures.create_category_options', lambda: figures.create_category_options(markers[0])),
+        ('homepage.layout', lambda: cold(homepage.layout)),
+        ('homepage.update_hei_options', lambda: homepage.update_hei_options([region])),
+        ('homepage.update_map', lambda: cold(
+            with_trigger, homepage.update_map, 'region-dropdown-map.value', [region], None)),
+        ('homepage.display_card', lambda: homepage.display_card({'points': [{'customdata': ukprn}]})),
+        ('overview.layout', lambda: overview.layout(provider)),
+        ('overview.update_nav', lambda: overview.update_nav('univ')),
+        ('overview.update_category_marker_dropdown_overview',
+         lambda: overview.update_category_marker_dropdown_overview(class_name)),
+        ('overview.update_line_chart', lambda: cold(
+            overview.update_line_chart, class_name, markers[0], f"/university/{provider}")),
+        ('comparison.update_category_marker_dropdown_comparison',
+         lambda: comparison.update_category_marker_dropdown_comparison(class_name)),
+        ('comparison.update_category_dropdown_comparison',
+         lambda: comparison.update_category_dropdown_comparison(markers[0])),
+        ('comparison.update_bar_chart', lambda: cold(comparison.update_bar_chart, heis, years, category, None)),
+        ('comparison.update_export_link', lambda: comparison.update_export_link(heis, years, category)),
+        ('ranking_table.update_table', lambda: cold(ranking_table.update_table, class_name, years[-1], None)),
+        ('ranking_table.update_table_page', lambda: ranking_table.update_table_page(
+            1, figures.RANKING_PAGE_SIZE, sort_by, filter_query, class_name, years[-1], None)),
+        ('ranking_table.update_export_link', lambda: ranking_table.update_export_link(
+            class_name, years[-1], None, filter_query, sort_by)),
+    ]
+
+
+def run_benchmarks(repeat):
+    """
+    Time every builder and callback on the data in the data folder of the dataset store.
+
+    Args:
+        repeat (int): The number of times each function is timed.
+
+    Returns:
+        dict: The median and fastest time in milliseconds and the JSON size in
+        bytes of each function, keyed by its name.
+    """
+    results = {}
+    for name, function in benchmark_cases():
+        output = function()
+        times = timeit.repeat(function, number=1, repeat=repeat)
+        results[name] = {'median_ms': round(median(times) * 1000, 3),
+                         'min_ms': round(min(times) * 1000, 3),
+                         'json_bytes': json_size(output)}
+    return results
+
+
+def run_scale(scale, repeat, source_dir):
+    """
+    Run the benchmarks in a new process on the data files repeated at the given scale.
+
+    Args:
+        scale (int): The number of copies of each HE provider.
+        repeat (int): The number of times each function is timed.
+        source_dir (pathlib.Path): The folder of the data files.
+
+    Returns:
+        dict: The results of run_benchmarks.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = source_dir
+        if scale > 1:
+            data_dir = Path(temp_dir)
+            scale_dataset(source_dir, data_dir, scale)
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--repeat', str(repeat)],
+            env=dict(os.environ, HEI_DATA_DIR=str(data_dir)), check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def compare_reports(report, baseline, threshold, min_delta_ms):
+    """
+    Find the functions that are slower, or whose output is larger, than in a previous report.
+
+    Args:
+        report (dict): The new report.
+        baseline (dict): The previous report.
+        threshold (float): The allowed relative increase, e.g. 0.25 for 25%.
+        min_delta_ms (float): Time increases smaller than this are ignored as noise.
+
+    Returns:
+        list: A description of each regression.
+    """
+    regressions = []
+    for scale, results in report['scales'].items():
+        for name, result in results.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(name)
+            if previous is None:
+                continue
+            if (result['median_ms'] > previous['median_ms'] * (1 + threshold)
+                    and result['median_ms'] - previous['median_ms'] > min_delta_ms):
+                regressions.append(f"x{scale} {name}: {previous['median_ms']:.2f} ms -> "
+                                   f"{result['median_ms']:.2f} ms")
+            if result['json_bytes'] and previous['json_bytes'] and \
+                    result['json_bytes'] > previous['json_bytes'] * (1 + threshold):
+                regressions.append(f"x{scale} {name}: {previous['json_bytes']} bytes -> "
+                                   f"{result['json_bytes']} bytes")
+    return regressions
+
+
+def main():
+    """
+    Run the benchmark suite, print the results and compare them with a previous report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help="The sizes of the synthetic data, as multiples of the data files")
+    parser.add_argument('--repeat', type=int, default=5, help="The number of times each function is timed")
+    parser.add_argument('--data-dir', type=Path, default=data_store.DATA_DIR, help="The folder of the data files")
+    parser.add_argument('--output', type=Path, help="Save the report as JSON to this file")
+    parser.add_argument('--compare', type=Path, help="A previous report to compare the results with")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="The allowed relative increase in time or JSON size")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help="Time increases smaller than this are ignored as noise")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_benchmarks(args.repeat)))
+        return
+
+    report = {'environment': {'python': platform.python_version(), 'pandas': pd.__version__,
+                              'plotly': plotly.__version__, 'repeat': args.repeat},
+              'scales': {}}
+    for scale in args.scales:
+        results = run_scale(scale, args.repeat, args.data_dir)
+        report['scales'][str(scale)] = results
+        print(f"\nx{scale} data")
+        print(f"{'Function':<58}{'Median ms':>12}{'Min ms':>12}{'JSON bytes':>12}")
+        for name, result in results.items():
+            print(f"{name:<58}{result['median_ms']:>12.2f}{result['min_ms']:>12.2f}{result['json_bytes'] or '-':>12}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare_reports(report, json.loads(args.compare.read_text()),
+                                      args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+This script reports how much memory each worker saves by loading the repeated
+text columns of the data files as categoricals.
+
+For each data file it compares the deep memory usage of the DataFrame with plain
+object (string) columns against the DataFrame held by the dataset store, and
+multiplies the saving by the number of worker processes.
+
+Run it from the root of the repository:
+    python benchmarks/memory_report.py --workers 4
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath('src')))
+
+from data_store import DATASET_FILES, data_path, read_dataset  # noqa: E402
+
+
+def memory_mb(data_df):
+    """
+    Return the deep memory usage of a DataFrame in megabytes.
+
+    Args:
+        data_df (pandas.DataFrame): The DataFrame to measure.
+
+    Returns:
+        float: The memory usage in megabytes.
+    """
+    return data_df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main():
+    """
+    Print the memory usage of each data file with and without categorical columns.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of worker processes serving the app (default: 4)')
+    args = parser.parse_args()
+
+    print(f"{'file':<24}{'rows':>10}{'object (MB)':>14}{'categorical (MB)':>18}{'saved (MB)':>12}")
+    total_saved = 0
+    for file_name in DATASET_FILES:
+        file_path = data_path(file_name)
+        if not file_path.exists():
+            print(f"{file_name:<24}{'missing':>10}")
+            continue
+        plain_df = pd.read_csv(file_path)
+        typed_df = read_dataset(file_path)
+        saved = memory_mb(plain_df) - memory_mb(typed_df)
+        total_saved += saved
+        print(f"{file_name:<24}{len(typed_df):>10}{memory_mb(plain_df):>14.2f}"
+              f"{memory_mb(typed_df):>18.2f}{saved:>12.2f}")
+
+    print(f"\nSaved per worker: {total_saved:.2f} MB")
+    print(f"Saved across {args.workers} workers: {total_saved * args.workers:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+This script converts the CSV data files used by the dashboard into typed Parquet files.
+
+The 'Value' column is converted to numbers and the text columns that repeat a
+small set of values, such as 'HE Provider', 'Class' and 'Category', are stored as
+categoricals. Each Parquet file is written next to its CSV file, e.g.
+entry_data.csv becomes entry_data.parquet, and the dashboard reads it instead of
+the CSV file when pyarrow is installed.
+
+Run the script again after replacing a CSV file with a new HESA release:
+    python data/convert_to_parquet.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.joinpath('src')))
+
+from data_store import DATASET_FILES, data_path, encode_categoricals, parquet_path, read_dataset  # noqa: E402
+
+
+def convert_to_parquet(file_path):
+    """
+    Convert a CSV data file into a typed, categorical-encoded Parquet file.
+
+    Args:
+        file_path (pathlib.Path): The path to the CSV file.
+
+    Returns:
+        pathlib.Path: The path of the Parquet file that was written.
+    """
+    data_df = encode_categoricals(read_dataset(file_path))
+    output_path = parquet_path(file_path)
+    data_df.to_parquet(output_path, index=False)
+    return output_path
+
+
+if __name__ == '__main__':
+    for file_name in DATASET_FILES:
+        csv_path = data_path(file_name)
+        if not csv_path.exists():
+            print(f"Skipping {file_name}: file not found")
+            continue
+        parquet_file = convert_to_parquet(csv_path)
+        print(f"Converted {file_name} to {parquet_file.name}")
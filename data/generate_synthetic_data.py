@@ -0,0 +1,209 @@
+"""
+This script generates synthetic data files with the shape of the HESA data used by the dashboard.
+
+It writes hei_data.csv, entry_data.csv and dataset_prepared.csv to a folder, at
+a chosen number of HE providers, campuses and academic years, so the dashboard
+can be tested with more data than the data folder holds. The providers in
+data/hei_data.csv are used first, followed by numbered synthetic providers
+placed around the centre of a region. Each extra campus of a provider is written
+as its own HE provider, e.g. 'Aston University (Campus 2)', with its own
+location, as in the campus-level HESA tables.
+
+The values follow the classes, category markers and categories of the HESA
+Estates Management Record. Each provider has a size that scales all of its
+values, and each value changes by a few percent from one year to the next.
+A share of the values can be left out to resemble providers that did not report
+every category.
+
+Point the dashboard at the generated folder with the HEI_DATA_DIR environment variable.
+
+Run it from the root of the repository:
+    python data/generate_synthetic_data.py --providers 500 --campuses 2 --years 10 --output data/synthetic
+    HEI_DATA_DIR=data/synthetic python src/app.py
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path(__file__).parent
+
+# The columns of entry_data.csv and dataset_prepared.csv
+ENTRY_COLUMNS = ['Academic Year', 'HE Provider', 'Region of HE provider', 'Class', 'Category marker', 'Category',
+                 'Value']
+
+# The categories of each category marker of each class, with the typical value of a
+# medium-sized provider, or None for categories answered with 'Yes' or 'No'
+CATEGORIES = {
+    'Building and spaces': {
+        'Grounds area': {'Grounds area (ha)': 60, 'Green space area (ha)': 25},
+        'Gross internal area': {'Gross internal area (m2)': 250_000, 'Non-residential gross internal area (m2)': 180_000},
+    },
+    'Energy': {
+        'Energy consumption': {'Total energy (kWh)': 60_000_000, 'Renewable energy generated onsite (kWh)': 1_500_000},
+        'Energy sources': {'Grid electricity (kWh)': 30_000_000, 'Natural gas (kWh)': 25_000_000},
+    },
+    'Emissions and waste': {
+        'Carbon emissions': {'Total scope 1 and 2 carbon emissions (Kg CO2e)': 15_000_000,
+                             'Scope 3 emissions (Kg CO2e)': 40_000_000},
+        'Waste': {'Total waste mass (tonnes)': 2_500, 'Waste recycled (tonnes)': 1_200},
+    },
+    'Transport and environment': {
+        'Environmental management': {'Environmental management system external verification': None,
+                                     'Sustainability policy published': None},
+        'Fleet': {'Number of fleet vehicles': 40, 'Fleet fuel used (litres)': 60_000},
+    },
+    'Finances and people': {
+        'Income': {'Total income (£)': 300_000_000},
+        'Staff and students': {'Total staff FTE': 3_000, 'Student FTE': 18_000},
+    },
+}
+
+
+def academic_years(count, last_year='2021/22'):
+    """
+    Return a number of consecutive academic years ending with the given year.
+
+    Args:
+        count (int): The number of academic years.
+        last_year (str, optional): The last academic year. Defaults to '2021/22'.
+
+    Returns:
+        list: The academic years, oldest first, e.g. ['2020/21', '2021/22'].
+    """
+    end = int(last_year[:4])
+    return [f"{year}/{(year + 1) % 100:02d}" for year in range(end - count + 1, end + 1)]
+
+
+def category_table():
+    """
+    Return the classes, category markers and categories as a table.
+
+    Returns:
+        pd.DataFrame: One row per category with its 'Class', 'Category marker',
+        'Category' and typical value ('Base'), which is NaN for 'Yes'/'No' categories.
+    """
+    return pd.DataFrame([(class_name, marker, category, np.nan if base is None else base)
+                         for class_name, markers in CATEGORIES.items()
+                         for marker, categories in markers.items()
+                         for category, base in categories.items()],
+                        columns=['Class', 'Category marker', 'Category', 'Base'])
+
+
+def generate_providers(hei_data_df, providers, campuses, rng):
+    """
+    Generate the HE providers, with their region and location.
+
+    Args:
+        hei_data_df (pd.DataFrame): The real HE providers to start from.
+        providers (int): The number of HE providers.
+        campuses (int): The number of campuses of each HE provider.
+        rng (np.random.Generator): The random number generator.
+
+    Returns:
+        pd.DataFrame: The data of hei_data.csv, with one row per campus.
+    """
+    real_df = hei_data_df.head(providers)
+    extra = providers - len(real_df)
+    centres = hei_data_df.groupby('Region of HE provider')[['lat', 'lon']].median()
+    regions = rng.choice(centres.index.to_numpy(), size=extra)
+    numbers = np.arange(len(real_df) + 1, providers + 1)
+    synthetic_df = pd.DataFrame({
+        'UKPRN': 20_000_000 + numbers,
+        'HE Provider': [f"Synthetic University {number:04d}" for number in numbers],
+        'Region of HE provider': regions,
+        'lat': centres.loc[regions, 'lat'].to_numpy() + rng.normal(0, 0.25, extra),
+        'lon': centres.loc[regions, 'lon'].to_numpy() + rng.normal(0, 0.35, extra),
+    })
+    synthetic_df['Alternative Name'] = synthetic_df['HE Provider']
+    provider_df = pd.concat([real_df, synthetic_df], ignore_index=True)
+
+    campus_dfs = [provider_df]
+    for campus in range(2, campuses + 1):
+        campus_dfs.append(provider_df.assign(**{
+            'UKPRN': provider_df['UKPRN'] + campus * 100_000_000,
+            'HE Provider': provider_df['HE Provider'] + f" (Campus {campus})",
+            'Alternative Name': provider_df['Alternative Name'].astype(str) + f" (Campus {campus})",
+            'lat': provider_df['lat'] + rng.normal(0, 0.05, len(provider_df)),
+            'lon': provider_df['lon'] + rng.normal(0, 0.05, len(provider_df))}))
+    return pd.concat(campus_dfs, ignore_index=True)
+
+
+def generate_entries(hei_data_df, years, missing, rng):
+    """
+    Generate the values of every category of every HE provider in every academic year.
+
+    Args:
+        hei_data_df (pd.DataFrame): The HE providers, as returned by generate_providers.
+        years (list): The academic years.
+        missing (float): The share of values to leave out, between 0 and 1.
+        rng (np.random.Generator): The random number generator.
+
+    Returns:
+        pd.DataFrame: The data of entry_data.csv, with the columns in ENTRY_COLUMNS.
+    """
+    categories_df = category_table()
+    n_providers, n_years, n_categories = len(hei_data_df), len(years), len(categories_df)
+
+    # Each provider has a size, and each of its values drifts by a few percent a year
+    size = rng.lognormal(0, 0.6, (n_providers, 1, 1))
+    drift = np.cumprod(rng.normal(1, 0.05, (n_providers, n_years, n_categories)), axis=1)
+    values = size * drift * categories_df['Base'].to_numpy()
+    values = np.round(values, 2).ravel().astype(object)
+    yes_no = np.isnan(np.tile(categories_df['Base'].to_numpy(), n_providers * n_years))
+    values[yes_no] = rng.choice(['Yes', 'No'], size=yes_no.sum(), p=[0.7, 0.3])
+
+    entry_df = pd.DataFrame({
+        'Academic Year': np.tile(np.repeat(years, n_categories), n_providers),
+        'HE Provider': np.repeat(hei_data_df['HE Provider'].to_numpy(), n_years * n_categories),
+        'Region of HE provider': np.repeat(hei_data_df['Region of HE provider'].to_numpy(), n_years * n_categories),
+        'Class': np.tile(categories_df['Class'].to_numpy(), n_providers * n_years),
+        'Category marker': np.tile(categories_df['Category marker'].to_numpy(), n_providers * n_years),
+        'Category': np.tile(categories_df['Category'].to_numpy(), n_providers * n_years),
+        'Value': values,
+    })
+    return entry_df[rng.random(len(entry_df)) >= missing].reset_index(drop=True)
+
+
+def generate_dataset(output_dir, providers=132, campuses=1, years=4, missing=0.0, seed=0):
+    """
+    Write synthetic hei_data.csv, entry_data.csv and dataset_prepared.csv files to a folder.
+
+    Args:
+        output_dir (pathlib.Path): The folder to write the files to. It is created if needed.
+        providers (int, optional): The number of HE providers. Defaults to 132.
+        campuses (int, optional): The number of campuses of each HE provider. Defaults to 1.
+        years (int, optional): The number of academic years, ending with 2021/22. Defaults to 4.
+        missing (float, optional): The share of values to leave out. Defaults to 0.
+        seed (int, optional): The seed of the random number generator. Defaults to 0.
+
+    Returns:
+        dict: The number of rows written to each file, keyed by file name.
+    """
+    rng = np.random.default_rng(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    hei_data_df = generate_providers(pd.read_csv(DATA_DIR.joinpath('hei_data.csv')), providers, campuses, rng)
+    entry_df = generate_entries(hei_data_df, academic_years(years), missing, rng)
+
+    hei_data_df.to_csv(output_dir.joinpath('hei_data.csv'), index=False)
+    entry_df.to_csv(output_dir.joinpath('entry_data.csv'), index=False)
+    entry_df.to_csv(output_dir.joinpath('dataset_prepared.csv'), index=False)
+    return {'hei_data.csv': len(hei_data_df), 'entry_data.csv': len(entry_df), 'dataset_prepared.csv': len(entry_df)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--providers', type=int, default=132, help="The number of HE providers")
+    parser.add_argument('--campuses', type=int, default=1, help="The number of campuses of each HE provider")
+    parser.add_argument('--years', type=int, default=4, help="The number of academic years, ending with 2021/22")
+    parser.add_argument('--missing', type=float, default=0.0, help="The share of values to leave out")
+    parser.add_argument('--seed', type=int, default=0, help="The seed of the random number generator")
+    parser.add_argument('--output', type=Path, default=DATA_DIR.joinpath('synthetic'),
+                        help="The folder to write the files to")
+    args = parser.parse_args()
+
+    row_counts = generate_dataset(args.output, args.providers, args.campuses, args.years, args.missing, args.seed)
+    for file_name, rows in row_counts.items():
+        print(f"Wrote {rows} rows to {args.output.joinpath(file_name)}")
@@ -1,23 +1,28 @@
 """
 This script geocodes the HEI (Higher Education Institution) names within the bounding box of England and updates the latitude and longitude values in the given DataFrame.
 
-The script uses the geopy library to perform geocoding and the Nominatim geocoder to obtain the latitude and longitude coordinates of the HEIs. It maps alternative names of universities to their corresponding names in the DataFrame and creates a new column for the alternative names. The latitude and longitude values are then updated for each HEI in the DataFrame.
+The script maps alternative names of universities to their corresponding names in the DataFrame and creates a new column for the alternative names, which are the names that are geocoded.
+
+The coordinates are found by a geocoder backend: by default the Nominatim geocoder of the geopy library, or a local gazetteer file with 'name', 'lat' and 'lon' columns, which works offline. Every answer is kept in a cache file keyed by the backend and the normalised name, including names that were not found, so running the script again with the same backend only looks up names that are new. The cache file is saved as the lookups go, so an interrupted run keeps the answers it already had. The lookups run in a pool of threads, and a rate limiter keeps them within the request rate allowed by the geocoder (one request per second for Nominatim). The coordinates are then added to the DataFrame in a single merge.
 
 The updated DataFrame is saved to a CSV file and the script also prints the message 'Latitude and Longitude added to the dataset' once the process is complete.
 
+Run it from the root of the repository:
+    python data/get_lat_lon.py
+    python data/get_lat_lon.py --backend gazetteer --gazetteer data/gazetteer.csv
 """
 
-from pathlib import Path
+import argparse
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from geopy.geocoders import Nominatim
 import pandas as pd
 
-geolocator = Nominatim(user_agent="HeiEnvironmentalDashboard", timeout=10)
-
-raw_data = Path(__file__).parent.joinpath('hei_data.csv')
-data_df = pd.read_csv(raw_data)
-
+DATA_DIR = Path(__file__).parent
 
 # Dictionary to map universities to their alternative names
 university_alternative_names = {
@@ -57,58 +62,291 @@ university_alternative_names = {
     "SOAS University of London": "SOAS",
 }
 
-# Map university names to their alternative names and create a new column
-data_df['Alternative Name'] = data_df['HE Provider'].map(
-    university_alternative_names).fillna(data_df['HE Provider'])
 
-# Create an array of HEIs
-heis = data_df['Alternative Name']
+def cache_key(backend, name):
+    """
+    Return the key of a name in the geocode cache.
 
-# Function to find the latitude and longitude of HEIs in England
+    The key includes the backend, so a name that one backend did not find is
+    still looked up by another.
 
+    Args:
+        backend (str): The name of the geocoder backend.
+        name (str): The name of a HEI.
 
-def get_lat_lon(heis1, data_df1):
+    Returns:
+        str: The backend and the normalised name, separated by a colon.
     """
-    Geocodes the HEI names within the bounding box of England and updates the latitude and longitude values in the given DataFrame.
+    return f"{backend}:{normalize_name(name)}"
+
+
+def normalize_name(name):
+    """
+    Return the key of a name in the gazetteer.
 
     Args:
-        heis1 (list): A list of HEI names to geocode.
-        data_df1 (pandas.DataFrame): The DataFrame containing the data to be updated.
+        name (str): The name of a HEI.
 
     Returns:
-        pandas.DataFrame: The updated DataFrame with latitude and longitude values.
+        str: The name in lower case with repeated spaces removed.
+    """
+    return ' '.join(str(name).casefold().split())
 
-    Raises:
-        Exception: If there is an error during geocoding.
 
+class GeocodeCache:
     """
-    hei_array = heis1
-    for i in hei_array:
-        retry_count = 0
-        while retry_count < 3:  # Retry up to 3 times
+    Keeps the coordinates found by each backend for each normalised name in a JSON file.
+
+    Names that were not found are kept with None as their coordinates, so they
+    are not looked up again.
+    """
+
+    def __init__(self, path):
+        """
+        Load the cache file, if it exists.
+
+        Args:
+            path (pathlib.Path): The path of the cache file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._coordinates = json.loads(path.read_text()) if path.exists() else {}
+
+    def __contains__(self, key):
+        return key in self._coordinates
+
+    def get(self, key):
+        """
+        Return the coordinates of a name.
+
+        Args:
+            key (str): The cache key of the name.
+
+        Returns:
+            list: The [lat, lon] of the name, or None if it was not found or is not in the cache.
+        """
+        return self._coordinates.get(key)
+
+    def set(self, key, coordinates):
+        """
+        Store the coordinates of a name.
+
+        Args:
+            key (str): The cache key of the name.
+            coordinates (tuple): The (lat, lon) of the name, or None if it was not found.
+        """
+        with self._lock:
+            self._coordinates[key] = list(coordinates) if coordinates else None
+
+    def save(self):
+        """
+        Write the cache to its file, replacing the file only once it has been written.
+        """
+        with self._lock:
+            temp_path = self.path.with_suffix('.tmp')
+            temp_path.write_text(json.dumps(self._coordinates, indent=1, sort_keys=True))
+            os.replace(temp_path, self.path)
+
+
+class RateLimiter:
+    """
+    Spaces out the requests made by several threads to a maximum rate.
+    """
+
+    def __init__(self, requests_per_second):
+        """
+        Create a rate limiter.
+
+        Args:
+            requests_per_second (float): The maximum number of requests per second.
+        """
+        self.interval = 1 / requests_per_second
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Wait until the next request is allowed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        time.sleep(start - now)
+
+
+class NominatimGeocoder:
+    """
+    Finds the coordinates of names in Great Britain with the Nominatim geocoder of geopy.
+    """
+
+    # The name of the backend in the geocode cache
+    backend = 'nominatim'
+    # The request rate allowed by the Nominatim usage policy
+    requests_per_second = 1.0
+
+    def __init__(self):
+        """
+        Create the geopy Nominatim geocoder.
+        """
+        from geopy.geocoders import Nominatim
+        self.geolocator = Nominatim(user_agent="HeiEnvironmentalDashboard", timeout=10)
+
+    def geocode(self, name):
+        """
+        Find the coordinates of a name.
+
+        Args:
+            name (str): The name to geocode.
+
+        Returns:
+            tuple: The (lat, lon) of the name, or None if it was not found.
+
+        Raises:
+            geopy.exc.GeopyError: If the request fails.
+        """
+        location = self.geolocator.geocode(name, country_codes='GB')
+        return None if location is None else (location.latitude, location.longitude)
+
+
+class GazetteerGeocoder:
+    """
+    Finds the coordinates of names in a local CSV file with 'name', 'lat' and 'lon' columns.
+    """
+
+    # The name of the backend in the geocode cache
+    backend = 'gazetteer'
+    # Local lookups need no rate limit
+    requests_per_second = None
+
+    def __init__(self, path):
+        """
+        Load the gazetteer file.
+
+        Args:
+            path (pathlib.Path): The path of the gazetteer CSV file.
+        """
+        gazetteer_df = pd.read_csv(path)
+        self.coordinates = dict(zip(gazetteer_df['name'].map(normalize_name),
+                                    zip(gazetteer_df['lat'], gazetteer_df['lon'])))
+
+    def geocode(self, name):
+        """
+        Find the coordinates of a name.
+
+        Args:
+            name (str): The name to geocode.
+
+        Returns:
+            tuple: The (lat, lon) of the name, or None if it is not in the gazetteer.
+        """
+        return self.coordinates.get(normalize_name(name))
+
+
+def geocode_names(names, geocoder, cache, workers=4, requests_per_second=None, retries=3, save_every=20):
+    """
+    Find the coordinates of the names that are not in the cache and add them to the cache.
+
+    Names whose lookup still fails after the retries are not added to the cache,
+    so they are looked up again on the next run. The cache is saved after every
+    save_every lookups and once the lookups end, even if they are interrupted.
+
+    Args:
+        names (iterable): The names to geocode.
+        geocoder: The geocoder backend, with a backend name and a geocode(name) method.
+        cache (GeocodeCache): The geocode cache.
+        workers (int, optional): The number of lookups that can run at once. Defaults to 4.
+        requests_per_second (float, optional): The maximum request rate. Defaults to the
+        rate of the geocoder, or no limit if it has none.
+        retries (int, optional): The number of attempts for each name. Defaults to 3.
+        save_every (int, optional): The number of lookups between saves of the cache. Defaults to 20.
+
+    Returns:
+        int: The number of names that were looked up.
+    """
+    requests_per_second = requests_per_second or geocoder.requests_per_second
+    rate_limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    new_names = {cache_key(geocoder.backend, name): name for name in names}
+    new_names = {key: name for key, name in new_names.items() if key not in cache}
+
+    def lookup(key):
+        name = new_names[key]
+        for attempt in range(retries):
+            if rate_limiter:
+                rate_limiter.wait()
             try:
-                # Geocode the HEI name within the bounding box of England
-                location = geolocator.geocode(i, country_codes='GB')
-                if location is not None:
-                    data_df1.loc[data_df1['Alternative Name']
-                                 == i, 'lat'] = location.latitude
-                    data_df1.loc[data_df1['Alternative Name']
-                                 == i, 'lon'] = location.longitude
-                break  # Break out of the retry loop if successful
+                cache.set(key, geocoder.geocode(name))
+                return
             except Exception as e:
-                print(f"Error geocoding {i}: {e}")
-                retry_count += 1
-                time.sleep(2)  # Wait for 2 seconds before retrying
-    return data_df1
+                print(f"Error geocoding {name}: {e}")
+                if attempt + 1 < retries:
+                    time.sleep(2 ** attempt)  # Wait longer after each failed attempt
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for done, _ in enumerate(executor.map(lookup, new_names), 1):
+                if done % save_every == 0:
+                    cache.save()
+    finally:
+        cache.save()
+    return len(new_names)
+
+
+def add_lat_lon(data_df, cache, backend):
+    """
+    Set the latitude and longitude of each HEI found in the cache by a backend.
+
+    HEIs that were not found keep the coordinates they already had.
+
+    Args:
+        data_df (pandas.DataFrame): The HEI data, with an 'Alternative Name' column.
+        cache (GeocodeCache): The geocode cache.
+        backend (str): The name of the geocoder backend whose coordinates are used.
+
+    Returns:
+        pandas.DataFrame: The HEI data with the 'lat' and 'lon' columns updated.
+    """
+    keys = data_df['Alternative Name'].map(lambda name: cache_key(backend, name))
+    coordinates = pd.DataFrame([cache.get(key) or [None, None] for key in keys.unique()],
+                               index=keys.unique(), columns=['lat', 'lon'], dtype=float)
+    found = coordinates.reindex(keys).set_axis(data_df.index)
+    data_df = data_df.copy()
+    for column in ['lat', 'lon']:
+        data_df[column] = found[column].fillna(data_df[column]) if column in data_df else found[column]
+    return data_df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', type=Path, default=DATA_DIR.joinpath('hei_data.csv'),
+                        help="The HEI data file to update")
+    parser.add_argument('--backend', choices=['nominatim', 'gazetteer'], default='nominatim',
+                        help="The geocoder backend")
+    parser.add_argument('--gazetteer', type=Path, help="The gazetteer CSV file used by the gazetteer backend")
+    parser.add_argument('--cache', type=Path, default=DATA_DIR.joinpath('geocode_cache.json'),
+                        help="The geocode cache file")
+    parser.add_argument('--workers', type=int, default=4, help="The number of lookups that can run at once")
+    parser.add_argument('--rate', type=float, help="The maximum number of requests per second")
+    args = parser.parse_args()
+    if args.backend == 'gazetteer' and args.gazetteer is None:
+        parser.error("--gazetteer is required by the gazetteer backend")
+
+    data_df = pd.read_csv(args.data)
 
+    # Map university names to their alternative names and create a new column
+    data_df['Alternative Name'] = data_df['HE Provider'].map(
+        university_alternative_names).fillna(data_df['HE Provider'])
 
-new_df = get_lat_lon(heis, data_df)
+    geocoder = GazetteerGeocoder(args.gazetteer) if args.backend == 'gazetteer' else NominatimGeocoder()
+    geocode_cache = GeocodeCache(args.cache)
+    looked_up = geocode_names(data_df['Alternative Name'], geocoder, geocode_cache, args.workers, args.rate)
+    print(f"Looked up {looked_up} new names")
+    new_df = add_lat_lon(data_df, geocode_cache, geocoder.backend)
 
-# Save the dataframe to a csv file
-new_df.to_csv(Path(__file__).parent.parent.joinpath(
-    'data', 'hei_data.csv'), index=False)
-print('Latitude and Longitude added to the dataset')
+    # Save the dataframe to a csv file
+    new_df.to_csv(args.data, index=False)
+    print('Latitude and Longitude added to the dataset')
 
-# find rows where the he provider are different but lat and lon are the same
-duplicate = new_df[new_df.duplicated(subset=['lat', 'lon'], keep=False)]
-print(duplicate)
+    # find rows where the he provider are different but lat and lon are the same
+    duplicate = new_df[new_df.duplicated(subset=['lat', 'lon'], keep=False)]
+    print(duplicate)
@@ -0,0 +1,19 @@
+"""
+Configuration of the gunicorn WSGI server used to run the Dash app in production.
+
+Run the app with `gunicorn` from the root of the repository. The number of
+workers and the address can be changed with the WEB_CONCURRENCY and BIND
+environment variables.
+"""
+
+import multiprocessing
+import os
+
+# The Flask server of the Dash app, in src/wsgi.py
+pythonpath = 'src'
+wsgi_app = 'wsgi:server'
+bind = os.environ.get('BIND', '0.0.0.0:8051')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Load the data before forking the workers so they share it
+preload_app = True
@@ -1,11 +1,22 @@
 """
 This script defines a Dash application that displays an HEI Environmental Dashboard.
 It includes functions to create a navigation bar and a footer, as well as the layout of the application.
+
+Importing the module does not read the data files: the pages load the data
+through the dataset store when it is first needed. Running this script loads the
+data and starts Flask's development server. Set the HEI_DEBUG environment
+variable to 1 to turn on debug mode. In production, serve the app with a WSGI
+server using src/wsgi.py instead, which loads the data before the workers are forked.
 """
 
+import os
 import dash
 from dash import html, dcc, Dash
 import dash_bootstrap_components as dbc
+from export import register_export_routes
+from http_cache import register_http_caching
+from figures import figure_cache, preload_indexes
+from instrumentation import register_metrics_route
 
 # Variable that contains the external_stylesheet to use, in this case Bootstrap styling from dash bootstrap
 # components (dbc)
@@ -84,5 +95,16 @@ app.layout = html.Div([
     dcc.Location(id='url', refresh=True)
 ])
 
+# Add the routes that export the data as files
+register_export_routes(app.server)
+
+# Add ETags to the responses that only depend on the data files
+register_http_caching(app.server)
+
+# Add the /metrics route when the timing instrumentation is turned on
+register_metrics_route(app.server, extra={'figure_cache': figure_cache.info})
+
 if __name__ == '__main__':
-    app.run(debug=True, port=8051)
+    # Load the data files and build the indexes before the first request
+    preload_indexes()
+    app.run(debug=os.environ.get('HEI_DEBUG', '0') == '1', port=8051)
@@ -0,0 +1,132 @@
+/*
+This file contains the clientside callbacks of the homepage.
+
+The callbacks use the compact map data held in the 'map-data' store, so hovering
+over the map and filtering it by region or HEI do not need a request to the server.
+They give the same results as the server callbacks in src/pages/homepage.py: the
+map keeps one trace per region with a fixed color, and each trace only holds the
+HEIs that are shown.
+
+Functions:
+- update_hei_options: Updates the options of the HEI dropdown based on the selected regions.
+- update_map: Updates the map figure based on the selected regions and HEIs.
+- display_card: Displays the card with information about the hovered HEI.
+*/
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    homepage: {
+        update_hei_options: function (selected_regions, map_data) {
+            var providers = map_data.providers;
+            // if regions are selected, show only HEIs in those regions
+            if (selected_regions && selected_regions.length) {
+                providers = [];
+                selected_regions.forEach(function (region) {
+                    map_data.providers.forEach(function (provider) {
+                        if (provider.region === region) {
+                            providers.push(provider);
+                        }
+                    });
+                });
+            }
+            return providers.map(function (provider) {
+                return {label: provider.name, value: provider.name};
+            });
+        },
+
+        update_map: function (selected_regions, selected_heis, map_data, figure) {
+            var triggered = window.dash_clientside.callback_context.triggered;
+            var prop_id = triggered.length ? triggered[0].prop_id : null;
+            // filter the HEIs on the dropdown that was changed
+            var is_shown = function () {
+                return true;
+            };
+            if (prop_id === 'region-dropdown-map.value' && selected_regions && selected_regions.length) {
+                is_shown = function (provider) {
+                    return selected_regions.indexOf(provider.region) !== -1;
+                };
+            } else if (prop_id === 'hei-dropdown-map.value' && selected_heis && selected_heis.length) {
+                is_shown = function (provider) {
+                    return selected_heis.indexOf(provider.name) !== -1;
+                };
+            }
+
+            // Add one trace for each region, in the order the regions first appear in
+            // the HEI data, with the color the region has on the full map. The HEIs
+            // that are filtered out are left out of the traces, so they cannot be hovered over.
+            var traces = [];
+            var region_traces = {};
+            var shown = [];
+            map_data.providers.forEach(function (provider) {
+                if (provider.region === null || provider.region === undefined) {
+                    return;
+                }
+                var trace = region_traces[provider.region];
+                if (trace === undefined) {
+                    trace = {
+                        customdata: [], hoverinfo: 'text', lat: [], lon: [], mode: 'markers',
+                        marker: {color: map_data.colors[traces.length % map_data.colors.length], opacity: 0.7, size: 12},
+                        name: provider.region, text: [], type: 'scattermapbox', visible: false
+                    };
+                    region_traces[provider.region] = trace;
+                    traces.push(trace);
+                }
+                if (is_shown(provider)) {
+                    trace.customdata.push(provider.ukprn);
+                    trace.lat.push(provider.lat);
+                    trace.lon.push(provider.lon);
+                    trace.text.push(provider.name);
+                    trace.visible = true;
+                    shown.push(provider);
+                }
+            });
+
+            // Center the map on the average location, skipping missing locations
+            var mean = function (key) {
+                var values = shown.map(function (provider) {
+                    return provider[key];
+                }).filter(function (value) {
+                    return typeof value === 'number' && !isNaN(value);
+                });
+                if (!values.length) {
+                    return null;
+                }
+                return values.reduce(function (total, value) {
+                    return total + value;
+                }, 0) / values.length;
+            };
+            var mapbox = Object.assign({}, figure.layout.mapbox, {center: {lat: mean('lat'), lon: mean('lon')}});
+            return {data: traces, layout: Object.assign({}, figure.layout, {mapbox: mapbox})};
+        },
+
+        display_card: function (hover_data, map_data) {
+            if (!hover_data || hover_data.points[0].customdata === undefined ||
+                hover_data.points[0].customdata === null) {
+                return null;
+            }
+            var ukprn = hover_data.points[0].customdata;
+            var provider = map_data.providers.find(function (record) {
+                return record.ukprn === ukprn;
+            });
+            if (provider === undefined) {
+                return window.dash_clientside.no_update;
+            }
+            var subtitle = function (text) {
+                return {namespace: 'dash_html_components', type: 'H6',
+                        props: {children: text, className: 'card-subtitle pb-2'}};
+            };
+            var title = {namespace: 'dash_html_components', type: 'H4',
+                         props: {children: provider.name, className: 'card-title'}};
+            var header = {namespace: 'dash_html_components', type: 'A',
+                          props: {children: title, href: '/university/' + provider.name}};
+            var body = [
+                subtitle('UKPRN: ' + provider.ukprn),
+                {namespace: 'dash_html_components', type: 'H6',
+                 props: {children: 'Key metrics (' + map_data.academic_year + '):', style: {'font-weight': 'bold'}}}
+            ].concat(provider.metrics.map(subtitle));
+            return {namespace: 'dash_bootstrap_components', type: 'Card', props: {children: [
+                {namespace: 'dash_bootstrap_components', type: 'CardHeader', props: {children: header}},
+                {namespace: 'dash_bootstrap_components', type: 'CardBody', props: {children: body}}
+            ]}};
+        }
+    }
+});
@@ -0,0 +1,45 @@
+/*
+This file contains the clientside callback of the overview page.
+
+The callback draws the line chart from every series of the university held in
+the 'overview-line-data' store, so choosing a class or category marker does not
+need a request to the server. It gives the same figure as the update_line_chart
+callback in src/pages/overview.py.
+
+Functions:
+- update_line_chart: Updates the line chart based on the selected class and category marker.
+*/
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    overview: {
+        update_line_chart: function (class_name, category_marker, line_data, figure) {
+            // wait for a class to be chosen
+            if (!class_name) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            var traces = line_data.series.filter(function (series) {
+                return series.class === class_name && series.marker === category_marker;
+            }).map(function (series, index) {
+                return {
+                    hovertemplate: 'Category=' + series.category + '<br>Academic Year=%{x}<br>Value=%{y}<extra></extra>',
+                    legendgroup: series.category,
+                    line: {color: line_data.colors[index % line_data.colors.length], dash: 'solid'},
+                    marker: {symbol: 'circle'}, mode: 'lines+markers', name: series.category,
+                    orientation: 'v', showlegend: true, x: series.x, xaxis: 'x', y: series.y, yaxis: 'y',
+                    type: 'scatter'
+                };
+            });
+
+            var layout = Object.assign({}, figure.layout, {
+                legend: Object.assign({}, figure.layout.legend, {title: {text: 'Category'}}),
+                // Set title based on category marker
+                title: {text: category_marker ? "Trend of '" + category_marker + "' categories:" : 'Trend of categories:'}
+            });
+            // plotly express only titles the legend when there are lines
+            if (!traces.length) {
+                delete layout.legend.title;
+            }
+            return {data: traces, layout: layout};
+        }
+    }
+});
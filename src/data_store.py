@@ -0,0 +1,308 @@
+"""
+This module contains the in-memory dataset store used by the figure builders.
+
+Each data file is parsed once, converted to typed columns and kept in memory.
+Text columns that repeat a small set of values, such as 'HE Provider' and
+'Category', are stored as categoricals, which saves memory in every worker and
+lets filters compare integer codes instead of strings.
+Callers receive views of the cached DataFrames instead of re-reading the CSV
+file on every callback. The store checks the modification time of a file each
+time it is requested and reloads it if it has changed, so a new HESA release
+can be dropped into the data folder without restarting the app. The data folder
+is the data folder of the repository unless the HEI_DATA_DIR environment
+variable names another one.
+
+If a Parquet copy of a CSV file has been created with data/convert_to_parquet.py
+and pyarrow is installed, the store reads the Parquet file instead, which is
+faster and already holds typed, categorical-encoded columns.
+
+Classes:
+- DatasetStore: Loads data files once and hands out read-only views of them
+and of values derived from them, such as indexes.
+
+Functions:
+- data_path(file_name): Returns the path of a file in the data folder.
+- parquet_path(file_path): Returns the path of the Parquet copy of a CSV file.
+- dataset_source(file_path): Returns the file the data should be read from.
+- encode_categoricals(data_df): Converts repeated text columns to categoricals.
+- read_dataset(file_path): Reads a data file and converts its columns to typed values.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentation import timed
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# The folder of the data files, which can be set with the HEI_DATA_DIR environment variable,
+# e.g. to a folder written by data/generate_synthetic_data.py
+DATA_DIR = Path(os.environ.get('HEI_DATA_DIR', Path(__file__).parent.parent.joinpath('data')))
+
+# The data files used by the app
+DATASET_FILES = ['hei_data.csv', 'entry_data.csv', 'dataset_prepared.csv']
+
+# Columns that hold numbers but may contain text such as 'Yes'/'No'
+NUMERIC_COLUMNS = ['Value']
+
+# Text columns that repeat a small set of values
+CATEGORICAL_COLUMNS = ['Academic Year', 'HE Provider', 'Region of HE provider',
+                       'Class', 'Category marker', 'Category']
+
+
+def data_path(file_name):
+    """
+    Return the path of a file in the data folder.
+
+    Args:
+        file_name (str): The name of the data file.
+
+    Returns:
+        pathlib.Path: The path of the data file.
+    """
+    return DATA_DIR.joinpath(file_name)
+
+
+def parquet_path(file_path):
+    """
+    Return the path of the Parquet copy of a CSV file.
+
+    Args:
+        file_path (str): The path to the CSV file.
+
+    Returns:
+        pathlib.Path: The path of the Parquet file.
+    """
+    return Path(file_path).with_suffix('.parquet')
+
+
+def dataset_source(file_path):
+    """
+    Return the file the data should be read from.
+
+    The Parquet copy is used when pyarrow is installed and the copy is at least
+    as new as the CSV file, so a new CSV release is never hidden by an old copy.
+
+    Args:
+        file_path (str): The path to the CSV file.
+
+    Returns:
+        str: The path of the Parquet copy if it can be used, otherwise the CSV path.
+    """
+    parquet_file = parquet_path(file_path)
+    if PARQUET_AVAILABLE and parquet_file.exists():
+        if not os.path.exists(file_path) or os.stat(parquet_file).st_mtime_ns >= os.stat(file_path).st_mtime_ns:
+            return str(parquet_file)
+    return str(file_path)
+
+
+def encode_categoricals(data_df):
+    """
+    Convert the text columns that repeat a small set of values to categoricals.
+
+    Args:
+        data_df (pandas.DataFrame): The DataFrame to convert.
+
+    Returns:
+        pandas.DataFrame: The DataFrame with categorical columns.
+    """
+    columns = [column for column in CATEGORICAL_COLUMNS if column in data_df.columns]
+    return data_df.astype({column: 'category' for column in columns})
+
+
+@timed()
+def read_dataset(file_path):
+    """
+    Read a data file and convert its columns to typed values.
+
+    Parquet files are read as they are, since they were typed when they were
+    created. In CSV files, values that cannot be converted to numbers in a
+    numeric column are set to NaN, and text columns that repeat a small set of
+    values are converted to categoricals.
+
+    Args:
+        file_path (str): The path to the CSV or Parquet file.
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing all the columns of the file.
+    """
+    if str(file_path).endswith('.parquet'):
+        return pd.read_parquet(file_path)
+    data_df = pd.read_csv(file_path)
+    for column in NUMERIC_COLUMNS:
+        if column in data_df.columns:
+            data_df[column] = pd.to_numeric(data_df[column], errors='coerce')
+    return encode_categoricals(data_df)
+
+
+def _file_stamp(file_path):
+    """
+    Return a value that changes whenever the file is modified.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        tuple: The path, modification time in nanoseconds and size of the file.
+    """
+    stat = os.stat(file_path)
+    return file_path, stat.st_mtime_ns, stat.st_size
+
+
+class DatasetStore:
+    """
+    Loads data files once and keeps them in memory as typed DataFrames.
+
+    The file is reloaded when its modification time or size changes. The
+    DataFrames handed out by the store are views of the cached data and must be
+    treated as read-only.
+    """
+
+    def __init__(self, reader=read_dataset):
+        """
+        Create an empty dataset store.
+
+        Args:
+            reader (callable, optional): The function used to read a data file.
+            Defaults to read_dataset.
+        """
+        self._reader = reader
+        self._entries = {}
+        self._derived = {}
+        self._reload_listeners = []
+        self._lock = threading.RLock()
+
+    def _load(self, file_path):
+        """
+        Return the cache entry for a file, reading the file if it is missing or out of date.
+
+        Args:
+            file_path (str): The path to the data file.
+
+        Returns:
+            tuple: The file stamp and the cached DataFrame.
+        """
+        path = os.path.abspath(file_path)
+        stamp = _file_stamp(dataset_source(path))
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != stamp:
+            reloaded = False
+            with self._lock:
+                # Another thread may have loaded the file while this one waited
+                entry = self._entries.get(path)
+                if entry is None or entry[0] != stamp:
+                    reloaded = entry is not None
+                    entry = (stamp, self._reader(stamp[0]))
+                    self._entries[path] = entry
+            if reloaded:
+                self._notify_reload()
+        return entry
+
+    def _notify_reload(self):
+        """
+        Call the reload listeners after the data in the store has changed.
+        """
+        for listener in self._reload_listeners:
+            listener()
+
+    def add_reload_listener(self, listener):
+        """
+        Register a function to call whenever a data file is reloaded or the store is cleared.
+
+        This is used by caches of values built from the data, so they can drop
+        entries that were built from the previous version of a file.
+
+        Args:
+            listener (callable): A function that takes no arguments.
+        """
+        self._reload_listeners.append(listener)
+
+    def get(self, file_path, columns=None):
+        """
+        Return a read-only view of a data file.
+
+        Args:
+            file_path (str): The path to the data file.
+            columns (list, optional): The columns to include. Defaults to all columns.
+
+        Returns:
+            pandas.DataFrame: A DataFrame containing the requested columns.
+        """
+        data_df = self._load(file_path)[1]
+        if columns is None:
+            return data_df.copy(deep=False)
+        return data_df[list(columns)]
+
+    def derive(self, name, file_paths, builder):
+        """
+        Return a value computed from one or more data files, such as an index.
+
+        The value is built once and kept until one of the data files is reloaded.
+
+        Args:
+            name (str): The name the value is cached under.
+            file_paths (list): The paths of the data files the value is built from.
+            builder (callable): A function that takes a read-only DataFrame for
+            each data file, in the same order, and returns the value.
+
+        Returns:
+            The cached value.
+        """
+        entries = [self._load(file_path) for file_path in file_paths]
+        version = tuple(stamp for stamp, _ in entries)
+        entry = self._derived.get(name)
+        if entry is None or entry[0] != version:
+            with self._lock:
+                entry = self._derived.get(name)
+                if entry is None or entry[0] != version:
+                    entry = (version, builder(
+                        *[data_df.copy(deep=False) for _, data_df in entries]))
+                    self._derived[name] = entry
+        return entry[1]
+
+    def version(self, file_paths):
+        """
+        Return a value that changes whenever one of the data files changes on disk.
+
+        The value is built from the modification time and size of the file that
+        each data file is read from, so it is the same in every worker process.
+
+        Args:
+            file_paths (list): The paths of the data files.
+
+        Returns:
+            str: A hexadecimal digest of the file stamps.
+        """
+        stamps = [_file_stamp(dataset_source(os.path.abspath(file_path))) for file_path in file_paths]
+        return hashlib.sha1(repr(stamps).encode()).hexdigest()
+
+    def preload(self, file_paths):
+        """
+        Load the given data files into the store.
+
+        Args:
+            file_paths (list): The paths of the data files to load.
+        """
+        for file_path in file_paths:
+            self._load(file_path)
+
+    def clear(self):
+        """
+        Remove all the cached DataFrames from the store.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._derived.clear()
+        self._notify_reload()
+
+
+# The store shared by the whole process
+dataset_store = DatasetStore()
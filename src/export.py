@@ -0,0 +1,248 @@
+"""
+This module contains the routes that export the dashboard data as files.
+
+The routes are added to the Flask server of the Dash app. The data is written
+to the response in chunks as it is generated, so the server never builds the
+whole file in memory and the browser does not need to hold the full table.
+Files can be exported as CSV, or as Parquet when pyarrow is installed.
+
+Classes:
+- ChunkBuffer: A write-only file object that collects the bytes written to it
+until they are drained.
+
+Functions:
+- generate_csv(data_df, chunk_size): Generates a CSV file from a DataFrame in chunks.
+- generate_parquet(data_df, chunk_size): Generates a Parquet file from a DataFrame in chunks.
+- parse_sort_by(sort): Reads the DataTable sort order of the export query string.
+- ranking_export_data(args): Returns the ranking table data for the export query string.
+- comparison_export_data(args): Returns the bar chart data for the export query string.
+- register_export_routes(server): Adds the export routes to the Flask server.
+
+Routes:
+- /export/ranking.<csv|parquet>: The ranking table for a class, year and
+regions, with the DataTable filter query and sort order applied.
+- /export/comparison.<csv|parquet>: The data shown on the bar chart of the
+comparison page for the selected HEIs, years and category.
+"""
+
+import json
+
+from flask import Response, request
+
+from data_store import PARQUET_AVAILABLE
+from figures import get_bar_chart_data, get_ranking_pivot, query_ranking_pivot
+
+# Number of rows written to the response at a time
+EXPORT_CHUNK_SIZE = 1000
+
+
+class ChunkBuffer:
+    """
+    A write-only file object that collects the bytes written to it until they are drained.
+
+    The Parquet writer writes to this buffer, and the bytes are sent to the
+    client after each row group instead of being kept until the file is complete.
+    """
+
+    def __init__(self):
+        """
+        Create an empty buffer.
+        """
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        """
+        Add bytes to the buffer.
+
+        Args:
+            data (bytes): The bytes to add.
+
+        Returns:
+            int: The number of bytes added.
+        """
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        """
+        Return the number of bytes written so far.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        return self._position
+
+    def flush(self):
+        """
+        Do nothing, the bytes are kept until they are drained.
+        """
+
+    def close(self):
+        """
+        Mark the buffer as closed.
+        """
+        self.closed = True
+
+    def drain(self):
+        """
+        Return the bytes written since the buffer was last drained.
+
+        Returns:
+            bytes: The bytes written.
+        """
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def generate_csv(data_df, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Generate a CSV file from a DataFrame, one chunk of rows at a time.
+
+    Args:
+        data_df (pandas.DataFrame): The data to export.
+        chunk_size (int, optional): The number of rows in each chunk. Defaults to EXPORT_CHUNK_SIZE.
+
+    Yields:
+        str: The header row, followed by the rows of each chunk.
+    """
+    yield data_df.iloc[:0].to_csv(index=False)
+    for start in range(0, len(data_df), chunk_size):
+        yield data_df.iloc[start:start + chunk_size].to_csv(index=False, header=False)
+
+
+def generate_parquet(data_df, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Generate a Parquet file from a DataFrame, writing one row group for each chunk of rows.
+
+    Args:
+        data_df (pandas.DataFrame): The data to export.
+        chunk_size (int, optional): The number of rows in each row group. Defaults to EXPORT_CHUNK_SIZE.
+
+    Yields:
+        bytes: The parts of the Parquet file as they are written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = ChunkBuffer()
+    schema = pa.Schema.from_pandas(data_df, preserve_index=False)
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for start in range(0, len(data_df), chunk_size):
+            writer.write_table(pa.Table.from_pandas(
+                data_df.iloc[start:start + chunk_size], schema=schema, preserve_index=False))
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def parse_sort_by(sort):
+    """
+    Read the DataTable sort order of the export query string.
+
+    Args:
+        sort (str): The DataTable sort_by as JSON, e.g.
+        '[{"column_id": "HE Provider", "direction": "asc"}]', or None.
+
+    Returns:
+        list: The sort order, a list of dictionaries with 'column_id' and 'direction' keys.
+
+    Raises:
+        ValueError: If the sort order is not a valid DataTable sort_by.
+    """
+    try:
+        sort_by = json.loads(sort or '[]')
+    except ValueError:
+        raise ValueError(f"Cannot read sort order: {sort}") from None
+    if not isinstance(sort_by, list) or not all(
+            isinstance(item, dict) and isinstance(item.get('column_id'), str)
+            and item.get('direction') in ('asc', 'desc') for item in sort_by):
+        raise ValueError(f"Cannot read sort order: {sort}")
+    return sort_by
+
+
+def ranking_export_data(args):
+    """
+    Return the ranking table data for the export query string.
+
+    The query string takes the same values as the ranking table page: 'class',
+    'year', 'region' (repeated for each region), 'filter' (the DataTable filter
+    query) and 'sort' (the DataTable sort_by as JSON).
+
+    Args:
+        args (werkzeug.datastructures.MultiDict): The query string arguments.
+
+    Returns:
+        pandas.DataFrame: The filtered and sorted ranking table.
+
+    Raises:
+        ValueError: If the filter query or sort order cannot be read.
+    """
+    sort_by = parse_sort_by(args.get('sort'))
+    pivot_df = get_ranking_pivot(args.get('class'), args.get('year'), args.getlist('region'))
+    return query_ranking_pivot(pivot_df, args.get('filter'), sort_by)
+
+
+def comparison_export_data(args):
+    """
+    Return the bar chart data of the comparison page for the export query string.
+
+    The query string takes 'hei' and 'year', repeated for each selected HEI and
+    academic year, and 'category'.
+
+    Args:
+        args (werkzeug.datastructures.MultiDict): The query string arguments.
+
+    Returns:
+        pandas.DataFrame: The rows shown on the bar chart.
+
+    Raises:
+        ValueError: If the category, HEIs or academic years are missing, as the
+        comparison page never shows a chart without them.
+    """
+    hei, year, category = args.getlist('hei'), args.getlist('year'), args.get('category')
+    missing = [name for name, value in [('hei', hei), ('year', year), ('category', category)] if not value]
+    if missing:
+        raise ValueError(f"Missing query string arguments: {', '.join(missing)}")
+    return get_bar_chart_data(hei, year, category)
+
+
+# The datasets that can be exported, by the name used in the route
+EXPORTS = {'ranking': ranking_export_data, 'comparison': comparison_export_data}
+
+
+def register_export_routes(server):
+    """
+    Add the export routes to the Flask server of the Dash app.
+
+    Args:
+        server (flask.Flask): The Flask server of the Dash app.
+    """
+    @server.route('/export/<name>.<file_format>')
+    def export_data(name, file_format):
+        """
+        Stream a dataset as a CSV or Parquet file.
+
+        Args:
+            name (str): The name of the dataset, 'ranking' or 'comparison'.
+            file_format (str): The file format, 'csv' or 'parquet'.
+
+        Returns:
+            flask.Response: The streamed file, or an error message.
+        """
+        if name not in EXPORTS or file_format not in ('csv', 'parquet'):
+            return Response("Export not found", status=404, mimetype='text/plain')
+        if file_format == 'parquet' and not PARQUET_AVAILABLE:
+            return Response("Parquet export requires pyarrow", status=501, mimetype='text/plain')
+        try:
+            data_df = EXPORTS[name](request.args)
+        except ValueError as error:
+            return Response(str(error), status=400, mimetype='text/plain')
+        headers = {'Content-Disposition': f'attachment; filename={name}.{file_format}'}
+        if file_format == 'parquet':
+            return Response(generate_parquet(data_df), mimetype='application/vnd.apache.parquet',
+                            headers=headers)
+        return Response(generate_csv(data_df), mimetype='text/csv', headers=headers)
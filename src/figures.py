@@ -2,44 +2,174 @@
 This module contains functions for creating various visualizations and data manipulation operations.
 
 Functions:
-- load_data(file_path, columns): Loads data from a CSV file and
-returns a DataFrame with specified columns.
+- load_data(file_path, columns): Returns a DataFrame with specified
+columns from the in-memory dataset store.
+- column_mask(series, values): Returns a boolean mask of the rows whose
+value is one of the given values.
 - filter_dataframe(data_df, filters): Filters a DataFrame based on
 specified column-value pairs.
+- to_plain_columns(data_df): Converts categorical columns back to plain values.
 - create_scatter_mapbox(region=None, hei=None): Creates a scatter
 mapbox plot of HE providers' locations.
+- build_map_trace_positions(hei_data_df): Finds the rows of the HEI data shown
+by each trace of the full map.
+- get_map_trace_positions(): Returns the rows of the HEI data shown by each
+trace of the full map.
+- get_map_region_colors(): Returns the color of each region on the map.
+- create_map_patch(region=None, hei=None): Creates the changes that filter the
+full map shown on the homepage.
 - filter_data_for_table(data_df, ClassName, acedemic_year,
 selected_regions): Filters data for creating a table based on
 specified criteria.
 - format_number(number): Formats a number with appropriate suffixes
 (e.g., k, M, B).
-- create_card(ukprn): Creates a card with key metrics for a specific HE provider.
+- build_card_metrics(entry_data_df, hei_data_df, academic_year): Builds the key
+metrics shown on the map cards for every HE provider.
+- get_card_metrics(ukprn, academic_year): Returns the key metrics of a HE provider.
+- format_card_metrics(metrics): Formats the key metrics of a HE provider as the
+lines of text shown on the map card.
+- build_map_data(hei_data_df, card_metrics, academic_year): Builds the compact
+data used by the clientside callbacks of the homepage map.
+- get_map_data(academic_year): Returns the compact data used by the clientside
+callbacks of the homepage map.
+- create_card(ukprn, academic_year): Creates a card with key metrics for a specific HE provider.
+- build_line_chart_index(data_df): Builds an index of the line chart data
+keyed by HE provider, class and category marker, and by HE provider.
+- get_line_chart_data(hei, Class, category_marker): Returns the sorted line
+chart rows for a HE provider, class and category marker.
+- get_line_chart_series(hei): Returns every line chart series of a HE provider,
+used by the clientside callback of the overview page.
 - create_line_chart(hei=None, Class=None, category_marker=None): Creates
 a line chart showing trends of categories for a specific HE provider and class.
 - create_options_from_data(data_df, column): Creates a list of
 options from unique values in a DataFrame column.
+- build_bar_chart_arrays(data_df): Precomputes the academic year codes, HE
+provider codes and values the bar chart is drawn from.
+- build_bar_chart_index(data_df): Slices the bar chart columns of the entry
+data by category, with the arrays of each category.
+- get_bar_chart_index(): Returns the bar chart columns of the entry data sliced by category.
+- get_bar_chart_data(hei=None, year=None, category=None): Returns the rows
+of the entry data shown in the bar chart.
+- code_mask(names, codes, values): Returns a boolean mask of the rows whose
+code stands for one of the given values.
+- to_value_list(values): Converts an array of values into a plain list, with
+None for missing values.
+- create_bar_traces(arrays, hei=None, year=None): Creates one bar trace for
+each academic year.
 - create_bar_chart(hei=None, year=None, category=None): Creates a
 bar chart showing values for a specific HE provider, year, and category.
+- get_bar_chart_traces(figure): Returns the academic year and HE providers of
+each trace of a bar chart.
+- create_bar_chart_patch(traces, added_heis, removed_heis, year, category):
+Creates the changes that add or remove HE providers on the bar chart.
+- pivot_ranking_data(data_df): Pivots the data for one class and academic
+year into a ranking table.
+- build_ranking_pivots(data_df): Builds the ranking table pivot for every
+combination of class and academic year.
+- get_ranking_pivot(ClassName, academic_year, selected_regions): Returns the
+precomputed ranking table data filtered to the selected regions.
+- parse_filter_query(filter_query): Parses a DataTable filter query into a
+list of column filters.
+- filter_mask(series, op_name, value, case_sensitive): Returns a boolean mask
+of the rows of a column that match a DataTable filter.
+- query_dataframe(data_df, filter_query, sort_by): Applies a DataTable filter
+query and sort order to a DataFrame.
+- query_ranking_pivot(pivot_df, filter_query, sort_by): Applies a DataTable
+filter query and sort order to a ranking table pivot.
+- paginate_ranking_pivot(pivot_df, page_current, page_size, filter_query,
+sort_by): Returns one page of a ranking table pivot.
+- get_ranking_page(ClassName, academic_year, selected_regions, page_current,
+page_size, filter_query, sort_by): Returns one page of the ranking table.
 - create_ranking_table(ClassName=None, academic_year=None,selected_regions=None): Creates a ranking table based on
 specified criteria.
+- group_unique_values(data_df, key, column): Maps each value of a key column
+to the unique values of another column in its rows.
+- build_metadata_catalog(entry_data_df, hei_data_df): Builds the lookups used
+to fill the dropdowns and sidebar of the pages.
+- get_metadata_catalog(): Returns the metadata catalog of the loaded data files.
 - create_category_marker_options(class_name): Creates a list of category marker options for a specific class.
 - create_category_options(category_marker): Creates a list of category
 options for a specific category marker.
+- normalize_argument(argument): Normalizes a callback argument for use in a cache key.
+- serialize_output(output): Converts a figure into the dictionary sent to the browser.
+- preload_indexes(): Builds the indexes, lookups and default figures derived from the data files.
+
+Classes:
+- FigureCache: A bounded least-recently-used cache of built figures and tables.
+
+The module also creates figure_cache, the FigureCache shared by the page callbacks.
 """
 
-from pathlib import Path
+from collections import OrderedDict
+import math
+import operator
+import re
+import threading
 from urllib.parse import quote
+import numpy as np
 import pandas as pd
-from dash import html, dash_table
+from dash import html, dash_table, Patch
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
+from data_store import DATASET_FILES, dataset_store, data_path
+from instrumentation import stage, timed
+
+# Maximum number of figures and tables kept by the figure cache
+FIGURE_CACHE_SIZE = 256
+
+# Columns of the prepared dataset used by the ranking table
+RANKING_COLUMNS = ['HE Provider', 'Region of HE provider',
+                   'Academic Year', 'Class', 'Category', 'Value']
+
+# Number of rows on each page of the ranking table
+RANKING_PAGE_SIZE = 50
+
+# The class and academic year the ranking table page opens with
+RANKING_DEFAULT_CLASS = 'Building and spaces'
+RANKING_DEFAULT_YEAR = '2021/22'
+
+# Categories that are not shown in the ranking table
+RANKING_EXCLUDED_CATEGORIES = ['Environmental management system external verification']
+
+# Comparison operators that can be used in a DataTable filter query
+FILTER_OPERATORS = {'=': operator.eq, 'eq': operator.eq, '!=': operator.ne, 'ne': operator.ne,
+                    '<': operator.lt, 'lt': operator.lt, '<=': operator.le, 'le': operator.le,
+                    '>': operator.gt, 'gt': operator.gt, '>=': operator.ge, 'ge': operator.ge}
+
+# A single '{column} operator value' clause of a DataTable filter query
+FILTER_CLAUSE = re.compile(r"""
+    \s*\{(?P<column>[^}]+)\}\s*
+    (?:(?P<operator>is\s+(?:blank|nil|num|str))
+      |(?P<case>[si])?(?P<comparison>contains|datestartswith|eq|ne|lt|le|gt|ge|!=|<=|>=|=|<|>))
+    (?:\s*(?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`|[^\s&|'"`]+))?
+    \s*(?:&&|$)
+""", re.VERBOSE)
+
+# The academic year of the key metrics shown on the map cards
+CARD_ACADEMIC_YEAR = '2021/22'
+
+# The categories shown on the map cards and the text used to show their values
+CARD_METRICS = {
+    'Total income (£)': "Total income: £{}",
+    'Total scope 1 and 2 carbon emissions (Kg CO2e)': "Total scope 1 and 2 carbon emissions: {} Kg CO2e",
+}
+
+# Columns of the entry data used by the bar chart
+BAR_CHART_COLUMNS = ['Academic Year', 'HE Provider', 'Category marker', 'Category', 'Value']
+
+# Columns of the entry data used by the line chart
+LINE_CHART_COLUMNS = ['Academic Year', 'HE Provider',
+                      'Class', 'Category marker', 'Category', 'Value']
 
 
 def load_data(file_path, columns):
     """
     Load data from a CSV file and return a DataFrame with specified columns.
 
+    The file is read once by the dataset store and kept in memory, so the
+    returned DataFrame is a read-only view of the cached data.
+
     Parameters:
     file_path (str): The path to the CSV file.
     columns (list): A list of column names to be included in the DataFrame.
@@ -47,8 +177,29 @@ def load_data(file_path, columns):
     Returns:
     pandas.DataFrame: A DataFrame containing the specified columns from the CSV file.
     """
-    data_df = pd.read_csv(file_path, usecols=columns)
-    return data_df
+    return dataset_store.get(file_path, columns)
+
+
+def column_mask(series, values):
+    """
+    Return a boolean mask of the rows whose value is one of the given values.
+
+    For categorical columns the values are looked up in the categories once and
+    the rows are compared on their integer codes instead of on strings.
+
+    Args:
+        series (pandas.Series): The column to compare.
+        values: A value or a list of values to match.
+
+    Returns:
+        numpy.ndarray: The boolean mask.
+    """
+    if not isinstance(values, (list, tuple, set)):
+        values = [values]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.categories.get_indexer(list(values))
+        return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
+    return series.isin(values).to_numpy()
 
 
 def filter_dataframe(data_df, filters):
@@ -73,10 +224,28 @@ def filter_dataframe(data_df, filters):
         3  4  d
     """
     for column, values in filters.items():
-        data_df = data_df[data_df[column].isin(values)]
+        data_df = data_df[column_mask(data_df[column], values)]
     return data_df
 
 
+def to_plain_columns(data_df):
+    """
+    Convert the categorical columns of a DataFrame back to plain values.
+
+    The data files may be loaded with categorical columns, but plotly express
+    expects plain values in the columns it groups by.
+
+    Args:
+        data_df (pandas.DataFrame): The DataFrame to convert.
+
+    Returns:
+        pandas.DataFrame: The DataFrame without categorical columns.
+    """
+    columns = data_df.select_dtypes('category').columns
+    return data_df.astype({column: object for column in columns})
+
+
+@timed()
 def create_scatter_mapbox(region=None, hei=None):
     """
     Create a scatter mapbox plot of HE providers' locations.
@@ -89,44 +258,33 @@ def create_scatter_mapbox(region=None, hei=None):
         go.Figure: Plotly graph objects Scatter mapbox plot.
     """
     # Load HEI data
-    hei_data = Path(__file__).parent.parent.joinpath('data', 'hei_data.csv')
+    hei_data = data_path('hei_data.csv')
     cols = ['UKPRN', 'HE Provider', 'Region of HE provider', 'lat', 'lon']
-    df_loc = load_data(hei_data, cols)
-    # Filter data based on region and HEI
-    if region:
-        df_loc = filter_dataframe(df_loc, {'Region of HE provider': region})
-    if hei:
-        df_loc = filter_dataframe(df_loc, {'HE Provider': hei})
-
-    # Assign colors to regions
-    regions = df_loc['Region of HE provider'].unique()
-    colors = px.colors.qualitative.Set3[:len(regions)]
-    color_scale = {region: color for region, color in zip(regions, colors)}
+    with stage('data') as timing:
+        df_loc = load_data(hei_data, cols)
+        # Filter data based on region and HEI
+        if region:
+            df_loc = filter_dataframe(df_loc, {'Region of HE provider': region})
+        if hei:
+            df_loc = filter_dataframe(df_loc, {'HE Provider': hei})
+        timing.rows = len(df_loc)
+
+    # Give each region the color it has on the full map, so filtering does not change the colors
+    region_colors = get_map_region_colors()
+
+    # Add one trace for each region, built from the column arrays of its HE providers,
+    # so the legend has one entry per region
+    traces = [go.Scattermapbox(lat=region_df['lat'].to_numpy(), lon=region_df['lon'].to_numpy(),
+                               mode='markers', name=region,
+                               marker=dict(
+                                   size=12, color=region_colors[region], opacity=0.7),
+                               text=region_df['HE Provider'].to_numpy(), hoverinfo='text',
+                               # Custom data to store UKPRN for linking to university page
+                               customdata=region_df['UKPRN'].to_numpy())
+              for region, region_df in df_loc.groupby('Region of HE provider', sort=False, observed=True)]
 
     # Create the scatter mapbox plot
-    fig = go.Figure()
-    added_regions = {}
-
-    # Add traces for each HE provider
-    for _, row in df_loc.iterrows():
-        region = row['Region of HE provider']
-        trace_settings = dict(lat=[row['lat']], lon=[row['lon']], mode='markers',
-                              marker=dict(
-                                  size=12, color=color_scale[region], opacity=0.7),
-                              text=row['HE Provider'], hoverinfo='text',
-                              # Custom data to store UKPRN for linking to university page
-                              customdata=[row['UKPRN']])
-        # Check if region has already been added to the plot
-        if region not in added_regions:
-            # Add trace with region name for legend
-            trace_settings['name'] = region
-            added_regions[region] = True
-        # Hide legend for subsequent traces
-        else:
-            trace_settings['showlegend'] = False
-
-        # Add trace to the figure
-        fig.add_trace(go.Scattermapbox(**trace_settings))
+    fig = go.Figure(data=traces)
 
     # Update layout
     fig.update_layout(mapbox_style="carto-positron", mapbox_zoom=4.8,
@@ -138,6 +296,93 @@ def create_scatter_mapbox(region=None, hei=None):
     return fig
 
 
+@timed()
+def build_map_trace_positions(hei_data_df):
+    """
+    Find the rows of the HEI data shown by each trace of the full map.
+
+    The traces of the map built by create_scatter_mapbox() without filters are
+    in the order the regions first appear in the HEI data.
+
+    Args:
+        hei_data_df (pandas.DataFrame): The HEI data.
+
+    Returns:
+        tuple: The HE provider names, UKPRNs, latitudes and longitudes of the HEI
+        data and a list of (region, row positions) pairs, one for each trace.
+    """
+    groups = hei_data_df.groupby('Region of HE provider', sort=False, observed=True).indices
+    return (hei_data_df['HE Provider'].to_numpy(dtype=object), hei_data_df['UKPRN'].to_numpy(),
+            hei_data_df['lat'].to_numpy(), hei_data_df['lon'].to_numpy(),
+            [(region, positions) for region, positions in groups.items()])
+
+
+def get_map_trace_positions():
+    """
+    Return the rows of the HEI data shown by each trace of the full map.
+
+    Returns:
+        tuple: The values described in build_map_trace_positions.
+    """
+    return dataset_store.derive('map_trace_positions', [data_path('hei_data.csv')], build_map_trace_positions)
+
+
+def get_map_region_colors():
+    """
+    Return the color of each region on the map.
+
+    The regions take the colors of the Set3 palette in the order they first
+    appear in the HEI data, the order of the traces of the full map.
+
+    Returns:
+        dict: The color of each region.
+    """
+    colors = px.colors.qualitative.Set3
+    return {region: colors[index % len(colors)] for index, (region, _) in enumerate(get_map_trace_positions()[4])}
+
+
+@timed()
+def create_map_patch(region=None, hei=None):
+    """
+    Create the changes that filter the full map shown on the homepage.
+
+    Instead of building a new figure, each trace of the map built by
+    create_scatter_mapbox() is cut down to the HE providers in the selected
+    regions, or to the selected HE providers, and hidden if none are left. The
+    HE providers that are filtered out are removed from the trace rather than
+    made transparent, so they cannot be hovered over. The map is centered on the
+    average location of the HE providers that are shown.
+
+    Args:
+        region (list, optional): Filter the map by region of HE provider. Defaults to None.
+        hei (list, optional): Filter the map by HE provider. Defaults to None.
+
+    Returns:
+        dash.Patch: The changes to apply to the full map figure.
+    """
+    names, ukprns, lat, lon, traces = get_map_trace_positions()
+    selected_heis = set(hei) if hei else None
+    patch = Patch()
+    shown = []
+    for trace_index, (trace_region, positions) in enumerate(traces):
+        if region:
+            points = positions if trace_region in region else positions[:0]
+        elif selected_heis is not None:
+            points = positions[[name in selected_heis for name in names[positions]]]
+        else:
+            points = positions
+        shown.extend(points.tolist())
+        patch['data'][trace_index]['visible'] = bool(len(points))
+        patch['data'][trace_index]['lat'] = lat[points].tolist()
+        patch['data'][trace_index]['lon'] = lon[points].tolist()
+        patch['data'][trace_index]['text'] = names[points].tolist()
+        patch['data'][trace_index]['customdata'] = ukprns[points].tolist()
+    # Center the map on the average location of the HE providers that are shown
+    patch['layout']['mapbox']['center'] = {'lat': float(np.nanmean(lat[shown])) if shown else None,
+                                           'lon': float(np.nanmean(lon[shown])) if shown else None}
+    return patch
+
+
 def filter_data_for_table(data_df, ClassName, acedemic_year, selected_regions):
     """
     Filters the data dataframe based on the given class name, academic year, and selected regions.
@@ -152,8 +397,8 @@ def filter_data_for_table(data_df, ClassName, acedemic_year, selected_regions):
         pandas.DataFrame: The filtered dataframe.
 
     """
-    data_df = data_df[(data_df['Class'] == ClassName) & (
-        data_df['Academic Year'] == acedemic_year)]
+    data_df = data_df[column_mask(data_df['Class'], ClassName) & column_mask(
+        data_df['Academic Year'], acedemic_year)]
     if selected_regions:
         data_df = filter_dataframe(
             data_df, {'Region of HE provider': selected_regions})
@@ -186,67 +431,218 @@ def format_number(number):
     return f"{round(number, 3)}{suffixes[magnitude]}"
 
 
-def create_card(ukprn):
+@timed()
+def build_card_metrics(entry_data_df, hei_data_df, academic_year=CARD_ACADEMIC_YEAR):
+    """
+    Build the key metrics shown on the map cards for every HE provider.
+
+    Args:
+        entry_data_df (pandas.DataFrame): The entry data.
+        hei_data_df (pandas.DataFrame): The HEI data.
+        academic_year (str, optional): The academic year of the metrics. Defaults to CARD_ACADEMIC_YEAR.
+
+    Returns:
+        dict: A dictionary mapping each UKPRN to a dictionary of the values of
+        the CARD_METRICS categories reported by that HE provider.
+    """
+    data_df = entry_data_df[['HE Provider', 'Academic Year', 'Category', 'Value']]
+    data_df = data_df[column_mask(data_df['Academic Year'], academic_year) & column_mask(
+        data_df['Category'], list(CARD_METRICS))]
+    # Keep the first value reported for each category
+    data_df = data_df.drop_duplicates(['HE Provider', 'Category'])
+    provider_metrics = {}
+    for he_name, category, value in zip(data_df['HE Provider'].tolist(), data_df['Category'].tolist(),
+                                        data_df['Value'].tolist()):
+        provider_metrics.setdefault(he_name, {})[category] = value
+    return {ukprn: provider_metrics.get(he_name, {})
+            for ukprn, he_name in zip(hei_data_df['UKPRN'].tolist(), hei_data_df['HE Provider'].tolist())}
+
+
+def get_card_metrics(ukprn, academic_year=CARD_ACADEMIC_YEAR):
+    """
+    Return the key metrics of a HE provider for the map card.
+
+    Args:
+        ukprn (int): The UKPRN of the HE provider.
+        academic_year (str, optional): The academic year of the metrics. Defaults to CARD_ACADEMIC_YEAR.
+
+    Returns:
+        dict: The values of the CARD_METRICS categories reported by the HE provider.
+    """
+    card_metrics = dataset_store.derive(
+        f'card_metrics_{academic_year}', [data_path('entry_data.csv'), data_path('hei_data.csv')],
+        lambda entry_data_df, hei_data_df: build_card_metrics(entry_data_df, hei_data_df, academic_year))
+    return card_metrics.get(ukprn, {})
+
+
+def format_card_metrics(metrics):
+    """
+    Format the key metrics of a HE provider as the lines of text shown on the map card.
+
+    Args:
+        metrics (dict): The values of the CARD_METRICS categories reported by the HE provider.
+
+    Returns:
+        list: One line of text for each of the CARD_METRICS categories.
+    """
+    return [label.format(format_number(float(metrics[category])) if category in metrics else "No data")
+            for category, label in CARD_METRICS.items()]
+
+
+@timed()
+def build_map_data(hei_data_df, card_metrics, academic_year=CARD_ACADEMIC_YEAR):
+    """
+    Build the compact data used by the clientside callbacks of the homepage map.
+
+    Args:
+        hei_data_df (pandas.DataFrame): The HEI data.
+        card_metrics (dict): The key metrics of each HE provider, keyed by UKPRN.
+        academic_year (str, optional): The academic year of the key metrics. Defaults to CARD_ACADEMIC_YEAR.
+
+    Returns:
+        dict: A dictionary with the following keys:
+        - 'academic_year': The academic year of the key metrics.
+        - 'colors': The colors given to the regions on the map, in order.
+        - 'providers': One record for each HE provider, in the order of the HEI
+        data, with its UKPRN, name, region, location and formatted card metrics.
+    """
+    columns = ['UKPRN', 'HE Provider', 'Region of HE provider', 'lat', 'lon']
+    providers = [
+        {'ukprn': ukprn, 'name': he_name, 'region': region, 'lat': lat, 'lon': lon,
+         'metrics': format_card_metrics(card_metrics.get(ukprn, {}))}
+        for ukprn, he_name, region, lat, lon in zip(*[hei_data_df[column].tolist() for column in columns])
+    ]
+    return {'academic_year': academic_year, 'colors': px.colors.qualitative.Set3, 'providers': providers}
+
+
+def get_map_data(academic_year=CARD_ACADEMIC_YEAR):
+    """
+    Return the compact data used by the clientside callbacks of the homepage map.
+
+    Args:
+        academic_year (str, optional): The academic year of the key metrics. Defaults to CARD_ACADEMIC_YEAR.
+
+    Returns:
+        dict: The data described in build_map_data. It is shared by all callers and must not be modified.
+    """
+    return dataset_store.derive(
+        f'map_data_{academic_year}', [data_path('entry_data.csv'), data_path('hei_data.csv')],
+        lambda entry_data_df, hei_data_df: build_map_data(
+            hei_data_df, build_card_metrics(entry_data_df, hei_data_df, academic_year), academic_year))
+
+
+@timed()
+def create_card(ukprn, academic_year=CARD_ACADEMIC_YEAR):
     """
     Create a card component for a university based on the given UKPRN.
 
     Parameters:
     - ukprn (str): The UKPRN (UK Provider Reference Number) of the university.
+    - academic_year (str, optional): The academic year of the key metrics. Defaults to CARD_ACADEMIC_YEAR.
 
     Returns:
     - card (dbc.Card): A Bootstrap Card component containing information about the university.
 
     """
-    hei_data_path = Path(__file__).parent.parent.joinpath(
-        'data', 'hei_data.csv')
-    data_df = load_data(hei_data_path, ['HE Provider', 'UKPRN'])
-    # Filter the row with the given UKPRN
-    row = data_df[data_df['UKPRN'] == ukprn]
-    ukprn_value, he_name = row.iloc[0]
-
-    # Load entry data
-    entry_data_path = Path(__file__).parent.parent.joinpath(
-        'data', 'entry_data.csv')
-    entry_data_df = load_data(
-        entry_data_path, ['HE Provider', 'Category', 'Value', 'Academic Year'])
-    # Filter the entries for the given HE provider and academic year
-    he_entries = entry_data_df[(entry_data_df['HE Provider'] == he_name) & (
-        entry_data_df['Academic Year'] == '2021/22')]
-
-    # Check if he_entries DataFrame is empty before accessing its elements
-    formatted_income = "No data"
-    formatted_emissions = "No data"
-    if not he_entries.empty:
-        # Access elements and calculate formatted_income and formatted_emissions
-        formatted_income_series = he_entries[he_entries['Category']
-                                             == 'Total income (£)']['Value']
-        formatted_emissions_series = he_entries[he_entries['Category']
-                                                == 'Total scope 1 and 2 carbon emissions (Kg CO2e)']['Value']
-        # Check if the series are not empty before accessing the first element
-        if not formatted_income_series.empty:
-            formatted_income = format_number(
-                float(formatted_income_series.iloc[0]))
-        if not formatted_emissions_series.empty:
-            formatted_emissions = format_number(
-                float(formatted_emissions_series.iloc[0]))
+    # Look up the name and key metrics of the HE provider with the given UKPRN
+    he_name = get_metadata_catalog()['ukprn_names'][ukprn]
+    metric_rows = [html.H6(text, className='card-subtitle pb-2')
+                   for text in format_card_metrics(get_card_metrics(ukprn, academic_year))]
 
     card = dbc.Card([
         dbc.CardHeader(html.A(
             # Add a link to the university page
             html.H4(he_name, className='card-title'), href=f"/university/{he_name}")),
         dbc.CardBody([
-            html.H6(f"UKPRN: {ukprn_value}", className='card-subtitle pb-2'),
+            html.H6(f"UKPRN: {ukprn}", className='card-subtitle pb-2'),
             # Add key metrics
-            html.H6("Key metrics (2021/22):", style={"font-weight": "bold"}),
-            html.H6(f"Total income: £{formatted_income}",
-                    className='card-subtitle pb-2'),
-            html.H6(f"Total scope 1 and 2 carbon emissions: {
-                    formatted_emissions} Kg CO2e", className='card-subtitle pb-2')
+            html.H6(f"Key metrics ({academic_year}):", style={"font-weight": "bold"}),
+            *metric_rows
         ])
     ])
     return card
 
 
+@timed()
+def build_line_chart_index(data_df):
+    """
+    Build an index of the line chart data keyed by HE provider, class and category marker.
+
+    The rows are sorted by academic year once, so each lookup only has to take
+    the positions stored for its key.
+
+    Args:
+        data_df (pandas.DataFrame): The entry data with a numeric 'Value' column.
+
+    Returns:
+        tuple: The sorted DataFrame, a dictionary mapping each
+        (HE provider, class, category marker) key to the positions of its rows,
+        and a dictionary mapping each HE provider to the positions of its rows.
+    """
+    data_df = data_df[LINE_CHART_COLUMNS].sort_values(
+        by='Academic Year', kind='stable').reset_index(drop=True)
+    positions = data_df.groupby(
+        ['HE Provider', 'Class', 'Category marker'], sort=False, observed=True).indices
+    provider_positions = data_df.groupby('HE Provider', sort=False, observed=True).indices
+    return data_df, positions, provider_positions
+
+
+def get_line_chart_index():
+    """
+    Return the line chart index, building it when the entry data is first loaded or changes.
+
+    Returns:
+        tuple: The index described in build_line_chart_index.
+    """
+    return dataset_store.derive('line_chart_index', [data_path('entry_data.csv')], build_line_chart_index)
+
+
+def get_line_chart_data(hei, Class, category_marker):
+    """
+    Return the line chart rows for a HE provider, class and category marker.
+
+    Args:
+        hei (str): The Higher Education Institution (HEI) provider.
+        Class (str): The class of the data.
+        category_marker (str): The category marker.
+
+    Returns:
+        pandas.DataFrame: The matching rows sorted by academic year.
+    """
+    data_df, positions, _ = get_line_chart_index()
+    return data_df.take(positions.get((hei, Class, category_marker), []))
+
+
+@timed()
+def get_line_chart_series(hei):
+    """
+    Return every line chart series of a HE provider, for all classes and category markers.
+
+    The overview page sends them with the page, so the clientside callback can
+    draw the line chart for any class and category marker without a request.
+
+    Args:
+        hei (str): The Higher Education Institution (HEI) provider.
+
+    Returns:
+        dict: A dictionary with the following keys:
+        - 'colors': The colors of the lines, in the order the categories are drawn.
+        - 'series': A list with the 'class', 'marker', 'category', academic
+        years ('x') and values ('y') of each category, in the order
+        create_line_chart draws them. Missing values are None.
+    """
+    data_df, _, provider_positions = get_line_chart_index()
+    data_df = to_plain_columns(data_df.take(provider_positions.get(hei, [])))
+    series = []
+    for (class_name, category_marker, category), group in data_df.groupby(
+            ['Class', 'Category marker', 'Category'], sort=False):
+        series.append({'class': class_name, 'marker': category_marker, 'category': category,
+                       'x': group['Academic Year'].tolist(),
+                       'y': [None if math.isnan(value) else value for value in group['Value'].tolist()]})
+    return {'colors': px.colors.qualitative.Set3, 'series': series}
+
+
+@timed()
 def create_line_chart(hei=None, Class=None, category_marker=None):
     """
     Create a line chart based on the provided parameters.
@@ -260,18 +656,18 @@ def create_line_chart(hei=None, Class=None, category_marker=None):
         fig: The plotly express line chart figure.
 
     """
-    data_path = Path(__file__).parent.parent.joinpath('data', 'entry_data.csv')
-    data_df = load_data(data_path, [
-                        'Academic Year', 'HE Provider', 'Class', 'Category marker', 'Category', 'Value'])
-    # Filter data based on HEI, category marker, and class
-    data_df = data_df[(data_df['HE Provider'] == hei) & (
-        data_df['Category marker'] == category_marker) & (data_df['Class'] == Class)]
-    # Convert 'Value' column to numeric
-    data_df['Value'] = pd.to_numeric(data_df['Value'], errors='coerce')
-    data_df = data_df.sort_values(by='Academic Year')
+    # Look up the rows for the HEI, class and category marker in the prebuilt index.
+    # The empty chart shown before a class is chosen does not need the data.
+    with stage('data') as timing:
+        if hei is None:
+            data_df = pd.DataFrame(columns=LINE_CHART_COLUMNS)
+        else:
+            data_df = get_line_chart_data(hei, Class, category_marker)
+        timing.rows = len(data_df)
     # Create the line chart
-    fig = px.line(data_df, x='Academic Year', y='Value', color='Category',
-                  markers=True, color_discrete_sequence=px.colors.qualitative.Set3)
+    with stage('plot'):
+        fig = px.line(to_plain_columns(data_df), x='Academic Year', y='Value', color='Category',
+                      markers=True, color_discrete_sequence=px.colors.qualitative.Set3)
     # Update layout
     # Set title based on category marker
     if category_marker:
@@ -296,10 +692,175 @@ def create_options_from_data(data_df, column):
     return data_df[column].unique().tolist()
 
 
+@timed()
+def build_bar_chart_arrays(data_df):
+    """
+    Precompute the arrays the bar chart is drawn from.
+
+    The academic years and HE providers are stored as integer codes in the
+    order they first appear, which is the order plotly express draws them in.
+
+    Args:
+        data_df (pandas.DataFrame): The bar chart rows, without duplicates.
+
+    Returns:
+        dict: A dictionary with the following keys:
+        - 'year_codes', 'years': The code of each row's academic year and the academic year of each code.
+        - 'provider_codes', 'providers': The code of each row's HE provider and the HE provider of each code.
+        - 'values': The value of each row as a float, NaN if it is missing.
+    """
+    year_codes, years = pd.factorize(data_df['Academic Year'])
+    provider_codes, providers = pd.factorize(data_df['HE Provider'])
+    return {'year_codes': year_codes, 'years': np.asarray(years, dtype=object),
+            'provider_codes': provider_codes, 'providers': np.asarray(providers, dtype=object),
+            'values': pd.to_numeric(data_df['Value'], errors='coerce').to_numpy(dtype=float)}
+
+
+@timed()
+def build_bar_chart_index(data_df):
+    """
+    Slice the bar chart columns of the entry data by category.
+
+    Args:
+        data_df (pandas.DataFrame): The entry data.
+
+    Returns:
+        dict: A dictionary mapping each category to a dictionary with its rows
+        without duplicates ('data'), its category marker ('marker') and the
+        arrays described in build_bar_chart_arrays.
+    """
+    data_df = data_df[BAR_CHART_COLUMNS]
+    index = {}
+    for category, category_df in data_df.groupby('Category', sort=False, observed=True):
+        category_df = category_df.drop_duplicates()
+        index[category] = {'data': category_df, 'marker': category_df['Category marker'].iloc[0],
+                           **build_bar_chart_arrays(category_df)}
+    return index
+
+
+def get_bar_chart_index():
+    """
+    Return the bar chart columns of the entry data sliced by category.
+
+    Returns:
+        dict: The slices described in build_bar_chart_index.
+    """
+    return dataset_store.derive('bar_chart_index', [data_path('entry_data.csv')], build_bar_chart_index)
+
+
+@timed()
+def get_bar_chart_data(hei=None, year=None, category=None):
+    """
+    Return the rows of the entry data shown in the bar chart.
+
+    Args:
+        hei (list, optional): List of Higher Education Institutions
+        (HEI) to include. Defaults to None.
+        year (list, optional): List of academic years to include. Defaults to None.
+        category (str, optional): Category of data to include. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The matching rows, without duplicates.
+    """
+    if category:
+        # Start from the rows of the category, sliced once when the data is loaded
+        category_index = get_bar_chart_index().get(category)
+        data_df = category_index['data'] if category_index else pd.DataFrame(columns=BAR_CHART_COLUMNS)
+    else:
+        data_df = load_data(data_path('entry_data.csv'), BAR_CHART_COLUMNS)
+    # Filter data based on HEI and year
+    if year:
+        data_df = data_df[column_mask(data_df['Academic Year'], year)]
+    if hei:
+        data_df = data_df[column_mask(data_df['HE Provider'], hei)]
+    return data_df.drop_duplicates()
+
+
+def code_mask(names, codes, values):
+    """
+    Return a boolean mask of the rows whose code stands for one of the given values.
+
+    Args:
+        names (numpy.ndarray): The value of each code.
+        codes (numpy.ndarray): The code of each row.
+        values: A value or a list of values to match.
+
+    Returns:
+        numpy.ndarray: The boolean mask.
+    """
+    if not isinstance(values, (list, tuple, set)):
+        values = [values]
+    values = set(values)
+    return np.fromiter((name in values for name in names), dtype=bool, count=len(names))[codes]
+
+
+def to_value_list(values):
+    """
+    Convert an array of values into a plain list, with None for missing values.
+
+    Plotly serialises numpy arrays as typed binary data, which the Patch
+    operations of the browser cannot delete items from or extend, so the bar
+    chart is drawn from plain lists.
+
+    Args:
+        values (numpy.ndarray): The values as floats, NaN if they are missing.
+
+    Returns:
+        list: The values, with None in place of NaN.
+    """
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+def create_bar_traces(arrays, hei=None, year=None):
+    """
+    Create one bar trace for each academic year, in the format drawn by plotly express.
+
+    Args:
+        arrays (dict): The arrays of the bar chart rows, as returned by build_bar_chart_arrays.
+        hei (list, optional): List of Higher Education Institutions
+        (HEI) to include. Defaults to None.
+        year (list, optional): List of academic years to include. Defaults to None.
+
+    Returns:
+        list: The go.Bar traces, one for each academic year in the order the
+        years first appear in the rows, with their HE providers and values as
+        plain lists.
+    """
+    year_codes = arrays['year_codes']
+    selected = np.ones(len(year_codes), dtype=bool)
+    if year:
+        selected &= code_mask(arrays['years'], year_codes, year)
+    if hei:
+        selected &= code_mask(arrays['providers'], arrays['provider_codes'], hei)
+    rows = np.flatnonzero(selected)
+    # Group the rows by academic year, keeping their order within each year
+    rows = rows[np.argsort(year_codes[rows], kind='stable')]
+    trace_codes, starts = np.unique(year_codes[rows], return_index=True)
+    colors = px.colors.qualitative.Set3
+    traces = []
+    # Draw the academic years in the order they first appear, as plotly express does
+    for color_index, position in enumerate(np.argsort(rows[starts], kind='stable')):
+        year_rows = rows[starts[position]:starts[position + 1] if position + 1 < len(starts) else None]
+        name = str(arrays['years'][trace_codes[position]])
+        traces.append(go.Bar(
+            x=arrays['providers'][arrays['provider_codes'][year_rows]].tolist(),
+            y=to_value_list(arrays['values'][year_rows]),
+            name=name, legendgroup=name, offsetgroup=name, alignmentgroup='True',
+            marker={'color': colors[color_index % len(colors)], 'pattern': {'shape': ''}},
+            hovertemplate=f"Academic Year={name}<br>HE Provider=%{{x}}<br>Value=%{{y}}<extra></extra>",
+            orientation='v', showlegend=True, textposition='auto', xaxis='x', yaxis='y'))
+    return traces
+
+
+@timed()
 def create_bar_chart(hei=None, year=None, category=None):
     """
     Create a bar chart based on the provided parameters.
 
+    The bars are drawn from the arrays precomputed for each category, with one
+    go.Bar trace for each academic year, so the chart looks the same as the
+    plotly express bar chart without grouping a DataFrame on every call.
+
     Args:
         hei (list, optional): List of Higher Education Institutions
         (HEI) to include in the chart. Defaults to None.
@@ -309,34 +870,340 @@ def create_bar_chart(hei=None, year=None, category=None):
         chart. Defaults to None.
 
     Returns:
-        fig: A plotly express bar chart figure object.
+        fig: A plotly bar chart figure object.
 
     """
-    data_path = Path(__file__).parent.parent.joinpath('data', 'entry_data.csv')
-    data_df = load_data(data_path, [
-                        'Academic Year', 'HE Provider', 'Category marker', 'Category', 'Value'])
-    # Filter data based on HEI, year, and category
-    if year:
-        data_df = data_df[data_df['Academic Year'].isin(year)]
-    if category:
-        data_df = data_df[data_df['Category'] == category]
-    if hei:
-        data_df = data_df[data_df['HE Provider'].isin(hei)]
-    # Convert 'Value' column to numeric
-    data_df['Value'] = pd.to_numeric(data_df['Value'], errors='coerce')
-
-    unique_years = sorted(data_df['Academic Year'].unique())
-    color_scale = px.colors.qualitative.Set3[:len(unique_years)]
-    data_df = data_df.drop_duplicates()
+    with stage('data') as timing:
+        if category:
+            arrays = get_bar_chart_index().get(category)
+            if arrays is None:
+                arrays = build_bar_chart_arrays(pd.DataFrame(columns=BAR_CHART_COLUMNS))
+        else:
+            arrays = build_bar_chart_arrays(get_bar_chart_data(hei, year))
+        traces = create_bar_traces(arrays, hei, year)
+        timing.rows = sum(len(trace.x) for trace in traces)
     # Create the bar chart
-    fig = px.bar(data_df, x='HE Provider', y='Value', color='Academic Year',
-                 barmode='group', color_discrete_sequence=color_scale)
-    title = f"{data_df['Category marker'].iloc[0]}: {
-        category}" if category else None
-    fig.update_layout(title_text=title)
+    with stage('plot'):
+        fig = go.Figure(data=traces, layout={
+            'xaxis': {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': 'HE Provider'}},
+            'yaxis': {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': 'Value'}},
+            'legend': {'tracegroupgap': 0}, 'margin': {'t': 60}, 'barmode': 'group'})
+        if traces:
+            fig.update_layout(legend_title_text='Academic Year')
+    # Set the title based on the category marker
+    if category and arrays.get('marker'):
+        fig.update_layout(title_text=f"{arrays['marker']}: {category}")
     return fig
 
 
+def get_bar_chart_traces(figure):
+    """
+    Return the academic year and HE providers of each trace of a bar chart.
+
+    Args:
+        figure (dict): The serialized bar chart.
+
+    Returns:
+        list: A list of [academic year, list of HE providers] pairs, one for each
+        trace, in the format used by create_bar_chart_patch.
+    """
+    return [[trace['name'], [str(hei) for hei in trace['x']]] for trace in figure['data']]
+
+
+@timed()
+def create_bar_chart_patch(traces, added_heis, removed_heis, year, category):
+    """
+    Create the changes that add or remove HE providers on the bar chart shown in the browser.
+
+    Args:
+        traces (list): The academic year and HE providers of each trace of the
+        bar chart, as returned by get_bar_chart_traces.
+        added_heis (list): The HE providers to add to the chart.
+        removed_heis (list): The HE providers to remove from the chart.
+        year (list): The academic years shown on the chart.
+        category (str): The category shown on the chart.
+
+    Returns:
+        tuple: The dash.Patch to apply to the chart and the updated traces, or
+        None if the chart has to be rebuilt because a HE provider has data for
+        an academic year that has no trace yet.
+    """
+    traces = [[trace_year, list(trace_heis)] for trace_year, trace_heis in traces]
+    trace_index = {trace_year: index for index, (trace_year, _) in enumerate(traces)}
+    added_df = get_bar_chart_data(added_heis, year, category) if added_heis else None
+    if added_df is not None and not set(added_df['Academic Year'].tolist()) <= set(trace_index):
+        return None
+
+    patch = Patch()
+    removed = set(removed_heis)
+    for index, (_, trace_heis) in enumerate(traces):
+        # Delete the last bars first so the positions of the others do not change
+        positions = [position for position, hei in enumerate(trace_heis) if hei in removed]
+        for position in reversed(positions):
+            del patch['data'][index]['x'][position]
+            del patch['data'][index]['y'][position]
+            del trace_heis[position]
+    if added_df is not None:
+        for trace_year, year_df in added_df.groupby('Academic Year', sort=False, observed=True):
+            heis = year_df['HE Provider'].astype(str).tolist()
+            patch['data'][trace_index[trace_year]]['x'].extend(heis)
+            values = pd.to_numeric(year_df['Value'], errors='coerce').to_numpy(dtype=float)
+            patch['data'][trace_index[trace_year]]['y'].extend(to_value_list(values))
+            traces[trace_index[trace_year]][1].extend(heis)
+    return patch, traces
+
+
+@timed()
+def pivot_ranking_data(data_df):
+    """
+    Pivot the data for one class and academic year into a ranking table.
+
+    Args:
+        data_df (pandas.DataFrame): The data for one class and academic year.
+
+    Returns:
+        pandas.DataFrame: A DataFrame indexed by HE provider name with the
+        provider as a html link, its region and a column for each category.
+    """
+    # Keep the categories in the order they appear in the data
+    category_order = [category for category in data_df['Category'].unique().tolist()
+                      if category not in RANKING_EXCLUDED_CATEGORIES]
+    pivot_df = data_df.pivot_table(
+        index='HE Provider', columns='Category', values='Value', observed=True)
+    pivot_df = pivot_df[[category for category in category_order if category in pivot_df.columns]]
+    pivot_df.columns = pd.Index(pivot_df.columns.tolist())
+    pivot_df.index = pd.Index(pivot_df.index.tolist())
+    regions = data_df.groupby('HE Provider', observed=True)['Region of HE provider'].first()
+    pivot_df.insert(0, 'Region of HE provider', regions.reindex(pivot_df.index).to_numpy())
+    # Change the HE Provider column to a hyperlink in html format
+    pivot_df.insert(0, 'HE Provider', [f"<a href=/university/{quote(name)}>{name}</a>"
+                                       for name in pivot_df.index])
+    return pivot_df
+
+
+@timed()
+def build_ranking_pivots(data_df):
+    """
+    Build the ranking table pivot for every combination of class and academic year.
+
+    Args:
+        data_df (pandas.DataFrame): The prepared dataset with a numeric 'Value' column.
+
+    Returns:
+        dict: A dictionary mapping each (class, academic year) pair to its pivot.
+    """
+    data_df = data_df[RANKING_COLUMNS]
+    return {key: pivot_ranking_data(group_df)
+            for key, group_df in data_df.groupby(['Class', 'Academic Year'], sort=False, observed=True)}
+
+
+@timed()
+def get_ranking_pivot(ClassName, academic_year, selected_regions=None):
+    """
+    Return the ranking table data for a class, academic year and selected regions.
+
+    Args:
+        ClassName (str): The class name.
+        academic_year (str): The academic year.
+        selected_regions (list, optional): The list of regions to include. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The 'HE Provider' link column followed by a column for
+        each category that has values for the selected providers.
+    """
+    pivots = dataset_store.derive(
+        'ranking_pivots', [data_path('dataset_prepared.csv')], build_ranking_pivots)
+    pivot_df = pivots.get((ClassName, academic_year))
+    if pivot_df is None:
+        return pd.DataFrame(columns=['HE Provider'])
+    if selected_regions:
+        pivot_df = pivot_df[column_mask(pivot_df['Region of HE provider'], selected_regions)]
+    # Only keep the categories that have values for the selected providers
+    category_columns = [column for column in pivot_df.columns[2:]
+                        if pivot_df[column].notna().any()]
+    return pivot_df[['HE Provider'] + category_columns]
+
+
+def parse_filter_query(filter_query):
+    """
+    Parse a DataTable filter query into a list of column filters.
+
+    The query is the one built by a DataTable with filter_action='custom', e.g.
+    '{HE Provider} icontains "bath" && {Total income (£)} > 1000000'.
+
+    Args:
+        filter_query (str): The filter query.
+
+    Returns:
+        list: A list of (column, op_name, value, case_sensitive) tuples. The
+        value is None for the 'is blank' style operators.
+
+    Raises:
+        ValueError: If the filter query cannot be parsed.
+    """
+    filters = []
+    position = 0
+    filter_query = (filter_query or '').strip()
+    while position < len(filter_query):
+        match = FILTER_CLAUSE.match(filter_query, position)
+        if match is None:
+            raise ValueError(f"Cannot parse filter query: {filter_query}")
+        op_name = ' '.join(match['operator'].split()) if match['operator'] else match['comparison']
+        value = match['value']
+        if value is not None and value[0] in '"\'`':
+            # Remove the quotes and any escape characters
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        if value is None and not op_name.startswith('is '):
+            raise ValueError(f"Missing value for '{op_name}' in filter query: {filter_query}")
+        filters.append((match['column'], op_name, value, match['case'] != 'i'))
+        position = match.end()
+    return filters
+
+
+def filter_mask(series, op_name, value, case_sensitive=True):
+    """
+    Return a boolean mask of the rows of a column that match a DataTable filter.
+
+    Args:
+        series (pandas.Series): The column to filter.
+        op_name (str): The DataTable filter operator, e.g. '>', 'contains' or 'is blank'.
+        value (str): The value to compare against, or None for 'is' operators.
+        case_sensitive (bool, optional): Whether text comparisons are case sensitive. Defaults to True.
+
+    Returns:
+        numpy.ndarray: The boolean mask.
+    """
+    is_numeric = pd.api.types.is_numeric_dtype(series)
+    if op_name.startswith('is '):
+        checks = {'is blank': lambda: series.isna() | (series.astype(str).str.strip() == ''),
+                  'is nil': series.isna,
+                  'is num': lambda: series.notna() if is_numeric else pd.to_numeric(series, errors='coerce').notna(),
+                  'is str': lambda: series.notna() & (not is_numeric)}
+        return checks[op_name]().to_numpy(dtype=bool)
+    if op_name in ('contains', 'datestartswith'):
+        text = series.astype(str)
+        if op_name == 'contains':
+            mask = text.str.contains(value, case=case_sensitive, regex=False)
+        else:
+            mask = text.str.startswith(value)
+        return (mask & series.notna()).to_numpy(dtype=bool)
+    compare = FILTER_OPERATORS[op_name]
+    if is_numeric:
+        number = pd.to_numeric(value, errors='coerce')
+        if pd.isna(number):
+            return np.zeros(len(series), dtype=bool)
+        return compare(series, number).to_numpy(dtype=bool)
+    text = series.astype(str)
+    if not case_sensitive:
+        text, value = text.str.lower(), value.lower()
+    return (compare(text, value) & series.notna()).to_numpy(dtype=bool)
+
+
+@timed()
+def query_dataframe(data_df, filter_query=None, sort_by=None):
+    """
+    Apply a DataTable filter query and sort order to a DataFrame.
+
+    Args:
+        data_df (pandas.DataFrame): The DataFrame to query.
+        filter_query (str, optional): The DataTable filter query. Defaults to None.
+        sort_by (list, optional): The DataTable sort_by property, a list of
+        dictionaries with 'column_id' and 'direction' keys. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The filtered and sorted DataFrame.
+
+    Raises:
+        ValueError: If the filter query cannot be parsed.
+    """
+    mask = np.ones(len(data_df), dtype=bool)
+    for column, op_name, value, case_sensitive in parse_filter_query(filter_query):
+        if column not in data_df.columns:
+            return data_df.iloc[:0]
+        mask &= filter_mask(data_df[column], op_name, value, case_sensitive)
+    data_df = data_df[mask]
+    sort_by = [sort for sort in sort_by or [] if sort['column_id'] in data_df.columns]
+    if sort_by:
+        data_df = data_df.sort_values(by=[sort['column_id'] for sort in sort_by],
+                                      ascending=[sort['direction'] == 'asc' for sort in sort_by],
+                                      kind='stable', na_position='last')
+    return data_df
+
+
+def query_ranking_pivot(pivot_df, filter_query=None, sort_by=None):
+    """
+    Apply a DataTable filter query and sort order to a ranking table pivot.
+
+    The filter and sort use the plain HE provider names rather than the html links.
+
+    Args:
+        pivot_df (pandas.DataFrame): The pivot returned by get_ranking_pivot.
+        filter_query (str, optional): The DataTable filter query. Defaults to None.
+        sort_by (list, optional): The DataTable sort_by property. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The filtered and sorted pivot, with the plain HE
+        provider names in the 'HE Provider' column.
+    """
+    data_df = pivot_df.assign(**{'HE Provider': pivot_df.index.to_numpy()})
+    return query_dataframe(data_df, filter_query, sort_by)
+
+
+def paginate_ranking_pivot(pivot_df, page_current=0, page_size=RANKING_PAGE_SIZE, filter_query=None,
+                           sort_by=None):
+    """
+    Return one page of a ranking table pivot after applying the DataTable filter and sort.
+
+    Args:
+        pivot_df (pandas.DataFrame): The pivot returned by get_ranking_pivot.
+        page_current (int, optional): The index of the page to return. Defaults to 0.
+        page_size (int, optional): The number of rows on a page. Defaults to RANKING_PAGE_SIZE.
+        filter_query (str, optional): The DataTable filter query. Defaults to None.
+        sort_by (list, optional): The DataTable sort_by property. Defaults to None.
+
+    Returns:
+        tuple: The rows of the page as a list of records and the number of pages.
+    """
+    with stage('query') as timing:
+        data_df = query_ranking_pivot(pivot_df, filter_query, sort_by)
+        timing.rows = len(data_df)
+    page_count = max(1, math.ceil(len(data_df) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    with stage('records') as timing:
+        page_df = data_df.iloc[page_current * page_size:(page_current + 1) * page_size]
+        # Put the html links back for the rows on the page
+        page_df = page_df.assign(
+            **{'HE Provider': pivot_df.loc[page_df.index, 'HE Provider'].to_numpy()})
+        records = page_df.to_dict('records')
+        timing.rows = len(records)
+    return records, page_count
+
+
+@timed()
+def get_ranking_page(ClassName, academic_year, selected_regions=None, page_current=0,
+                     page_size=RANKING_PAGE_SIZE, filter_query=None, sort_by=None):
+    """
+    Return one page of the ranking table after applying the DataTable filter and sort.
+
+    Args:
+        ClassName (str): The class name.
+        academic_year (str): The academic year.
+        selected_regions (list, optional): The list of regions to include. Defaults to None.
+        page_current (int, optional): The index of the page to return. Defaults to 0.
+        page_size (int, optional): The number of rows on a page. Defaults to RANKING_PAGE_SIZE.
+        filter_query (str, optional): The DataTable filter query. Defaults to None.
+        sort_by (list, optional): The DataTable sort_by property. Defaults to None.
+
+    Returns:
+        tuple: The rows of the page as a list of records and the number of pages.
+    """
+    with stage('pivot') as timing:
+        pivot_df = get_ranking_pivot(ClassName, academic_year, selected_regions)
+        timing.rows = len(pivot_df)
+    return paginate_ranking_pivot(pivot_df, page_current, page_size, filter_query, sort_by)
+
+
+@timed()
 def create_ranking_table(ClassName=None, academic_year=None, selected_regions=None):
     """
     Create a ranking table for HE providers based on the given parameters.
@@ -350,44 +1217,94 @@ def create_ranking_table(ClassName=None, academic_year=None, selected_regions=No
         dash_table.DataTable: The ranking table as a Dash DataTable
         object.
     """
-    data_path = Path(__file__).parent.parent.joinpath(
-        'data', 'dataset_prepared.csv')
-    data_df = load_data(data_path, [
-                        'HE Provider', 'Region of HE provider', 'Academic Year', 'Class', 'Category', 'Value'])
-    # Filter data based on the given parameters
-    data_df = filter_data_for_table(
-        data_df, ClassName, academic_year, selected_regions)
-    data_df['Value'] = pd.to_numeric(data_df['Value'], errors='coerce')
-    # Pivot the data to create the ranking table
-    category_order = data_df['Category'].unique().tolist()
-    new_category_order = list(filter(
-        lambda x: x != 'Environmental management system external verification', category_order))
-    pivot_df = data_df.pivot_table(index='HE Provider', columns='Category', values='Value').reset_index()[
-        ['HE Provider'] + new_category_order]
-    # Sort the columns based on the category order
-    pivot_df.columns.name = None
-    # Change the HE Provider column to a hyperlink in html format
-    pivot_df['HE Provider'] = pivot_df['HE Provider'].apply(
-        lambda x: f"<a href=/university/{quote(x)}>{x}</a>")
+    # Look up the precomputed pivot for the class and year, filtered to the selected regions
+    pivot_df = get_ranking_pivot(ClassName, academic_year, selected_regions)
+    # Only the first page is sent to the browser, the other pages are fetched by
+    # the paging callback of the ranking table page
+    data, page_count = paginate_ranking_pivot(pivot_df)
     # Create the ranking table
     table = dash_table.DataTable(
         id='ranking-table',
         columns=[{'name': col, 'id': col, 'presentation': "markdown"}
                  for col in pivot_df.columns],
-        data=pivot_df.to_dict('records'),
+        data=data,
         style_table={'overflowX': 'auto'},
         style_header={
             'backgroundColor': 'rgb(204, 255, 221)', 'fontWeight': 'bold'},
         style_data_conditional=[
             {'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
-        export_format='csv',
-        sort_action='native',
-        filter_action='native',
+        page_action='custom',
+        page_current=0,
+        page_size=RANKING_PAGE_SIZE,
+        page_count=page_count,
+        sort_action='custom',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
         markdown_options={'html': True}
     )
     return table
 
 
+def group_unique_values(data_df, key, column):
+    """
+    Map each value of a key column to the unique values of another column in its rows.
+
+    Args:
+        data_df (pandas.DataFrame): The data to group.
+        key (str): The column to group by.
+        column (str): The column to collect the values of.
+
+    Returns:
+        dict: The unique values for each key, in the order they first appear.
+    """
+    pairs = data_df[[key, column]].dropna().drop_duplicates()
+    return {name: group[column].tolist()
+            for name, group in pairs.groupby(key, sort=False, observed=True)}
+
+
+@timed()
+def build_metadata_catalog(entry_data_df, hei_data_df):
+    """
+    Build the lookups used to fill the dropdowns and sidebar of the pages.
+
+    Args:
+        entry_data_df (pandas.DataFrame): The entry data.
+        hei_data_df (pandas.DataFrame): The HEI data.
+
+    Returns:
+        dict: A dictionary with the following keys:
+        - 'class_markers': The category markers of each class.
+        - 'marker_categories': The categories of each category marker.
+        - 'providers': The HE providers, in the order of the HEI data.
+        - 'regions': The regions of the HE providers.
+        - 'region_providers': The HE providers in each region.
+        - 'ukprn_names': The name of the HE provider for each UKPRN.
+    """
+    return {
+        'class_markers': group_unique_values(entry_data_df, 'Class', 'Category marker'),
+        'marker_categories': group_unique_values(entry_data_df, 'Category marker', 'Category'),
+        'providers': hei_data_df['HE Provider'].tolist(),
+        'regions': hei_data_df['Region of HE provider'].unique().tolist(),
+        'region_providers': group_unique_values(hei_data_df, 'Region of HE provider', 'HE Provider'),
+        'ukprn_names': dict(zip(hei_data_df['UKPRN'].tolist(), hei_data_df['HE Provider'].tolist())),
+    }
+
+
+def get_metadata_catalog():
+    """
+    Return the metadata catalog, building it when the data files are first loaded or change.
+
+    Returns:
+        dict: The lookups described in build_metadata_catalog. They are shared
+        by all callers and must not be modified.
+    """
+    return dataset_store.derive(
+        'metadata_catalog', [data_path('entry_data.csv'), data_path('hei_data.csv')],
+        build_metadata_catalog)
+
+
+@timed()
 def create_category_marker_options(class_name):
     """
     Create a list of category marker options for a given class name.
@@ -398,16 +1315,10 @@ def create_category_marker_options(class_name):
     Returns:
         list: A list of category marker options for the given class name.
     """
-    data_path = Path(__file__).parent.parent.joinpath('data', 'entry_data.csv')
-    # Load 'Class' and 'Category marker' columns
-    data_df = load_data(data_path, ['Class', 'Category marker'])
-    if 'Class' in data_df.columns:  # Check if 'Class' column exists
-        data_df = data_df[data_df['Class'] == class_name]
-        return create_options_from_data(data_df, 'Category marker')
-    else:
-        return []  # Return empty list if 'Class' column does not exist
+    return list(get_metadata_catalog()['class_markers'].get(class_name, []))
 
 
+@timed()
 def create_category_options(category_marker):
     """
     Create a list of category options based on the given category marker.
@@ -419,7 +1330,146 @@ def create_category_options(category_marker):
     - list: A list of category options.
 
     """
-    data_path = Path(__file__).parent.parent.joinpath('data', 'entry_data.csv')
-    data_df = load_data(data_path, ['Category', 'Category marker'])
-    data_df = data_df[data_df['Category marker'] == category_marker]
-    return create_options_from_data(data_df, 'Category')
+    return list(get_metadata_catalog()['marker_categories'].get(category_marker, []))
+
+
+def normalize_argument(argument):
+    """
+    Normalize a callback argument so equivalent selections give the same cache key.
+
+    Lists such as selected regions or years are order-insensitive, so they are
+    sorted. Empty selections are treated the same as no selection.
+
+    Args:
+        argument: The argument passed to a figure builder.
+
+    Returns:
+        A hashable version of the argument.
+    """
+    if isinstance(argument, (list, tuple)):
+        return tuple(sorted(argument)) or None
+    return argument
+
+
+def serialize_output(output):
+    """
+    Convert a figure into the dictionary that Dash sends to the browser.
+
+    Dash components, such as the ranking table, are returned unchanged.
+
+    Args:
+        output: The figure or component returned by a figure builder.
+
+    Returns:
+        The serialized figure, or the component.
+    """
+    if isinstance(output, go.Figure):
+        return output.to_plotly_json()
+    return output
+
+
+class FigureCache:
+    """
+    A bounded least-recently-used cache of the figures and tables returned by the builders.
+
+    Entries are keyed on the builder, its normalized arguments and the version of
+    the data files. The cache is cleared whenever the dataset store reloads a data
+    file, and when a lookup finds that a data file has changed on disk, so an
+    entry is never served from an older version of the data.
+    """
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE, version=None):
+        """
+        Create an empty figure cache.
+
+        Args:
+            maxsize (int, optional): The maximum number of entries to keep.
+            Defaults to FIGURE_CACHE_SIZE.
+            version (callable, optional): A function that returns the version of
+            the data the entries are built from. Defaults to None, for entries
+            that do not depend on a version.
+        """
+        self.maxsize = maxsize
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, builder, *args, **kwargs):
+        """
+        Return the serialized output of a builder, building it if it is not cached.
+
+        Args:
+            builder (callable): The figure builder, e.g. create_ranking_table.
+            *args: The positional arguments for the builder.
+            **kwargs: The keyword arguments for the builder.
+
+        Returns:
+            The serialized figure, or the component returned by the builder.
+        """
+        version = self.version() if self.version else None
+        key = (builder.__name__, tuple(normalize_argument(arg) for arg in args),
+               tuple(sorted((name, normalize_argument(arg)) for name, arg in kwargs.items())), version)
+        with self._lock:
+            if version != self._version:
+                # The entries were built from an older version of the data
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        output = serialize_output(builder(*args, **kwargs))
+        with self._lock:
+            self._entries[key] = output
+            self._entries.move_to_end(key)
+            # Remove the least recently used entries
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return output
+
+    def clear(self):
+        """
+        Remove all the entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """
+        Return the cache statistics.
+
+        Returns:
+            dict: The number of hits, misses and entries, and the maximum size.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+# The figure cache shared by the page callbacks, cleared when the data files change
+figure_cache = FigureCache(
+    version=lambda: dataset_store.version([data_path(file_name) for file_name in DATASET_FILES]))
+dataset_store.add_reload_listener(figure_cache.clear)
+
+
+@timed()
+def preload_indexes():
+    """
+    Build the indexes, lookups and default figures derived from the data files.
+
+    This is called before the workers of a WSGI server are forked, so every
+    worker shares them instead of building its own copy on its first requests.
+    """
+    get_metadata_catalog()
+    get_map_data()
+    get_bar_chart_index()
+    # Looking up a missing key builds the index
+    get_card_metrics(None)
+    get_line_chart_index()
+    get_ranking_pivot(None, None)
+    figure_cache.get(create_scatter_mapbox)
+    # The arguments of the table shown when the ranking table page is opened
+    figure_cache.get(create_ranking_table, RANKING_DEFAULT_CLASS, RANKING_DEFAULT_YEAR, None)
@@ -0,0 +1,175 @@
+"""
+This module adds ETags to the responses of the Dash app that only depend on the data files.
+
+The page layouts, the exported files and the callbacks that build figures,
+tables and dropdown options from the data always return the same response for
+the same request while the data files and the app code are unchanged. Their
+responses get an ETag built from the request, the version of the data files and
+the version of the app code, which includes the settings that change the
+callbacks and layouts. When a browser or a reverse proxy sends the ETag back in
+an If-None-Match header of a GET or HEAD request, the server answers 304 Not
+Modified without building the page or the file.
+
+Callback requests are POST requests, which are never answered with 304 (RFC
+7232 only allows it for GET and HEAD, and browsers do not send If-None-Match
+with them). Their responses still carry the ETag, so a reverse proxy that
+includes the request body in its cache key can tell whether two responses are
+the same.
+
+Functions:
+- code_version(folder): Returns a value that changes whenever a file of the app code changes.
+- callback_outputs(body): Returns the outputs of a Dash callback request.
+- is_cacheable(): Checks whether the response to the current request can be given an ETag.
+- request_etag(data_version, app_version): Returns the ETag of the response to the current request.
+- register_http_caching(server): Adds the ETag handling to the Flask server.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from flask import g, request
+
+from data_store import DATASET_FILES, data_path, dataset_store
+
+# The callback outputs that are built only from the data files and the request
+CACHEABLE_OUTPUTS = {
+    'hei-dropdown-map.options', 'england_map.figure', 'card.children',
+    'category-marker-dropdown-comparison.options', 'category-marker-dropdown-comparison.value',
+    'category-dropdown-comparison.options', 'category-dropdown-comparison.value',
+    'bar_chart.figure', 'bar-chart-state.data',
+    'sidebar-nav.children', 'category-marker-dropdown.options', 'category-marker-dropdown.value',
+    'overview_line_chart.figure', 'ranking-table-div.children', 'ranking-table.data', 'ranking-table.page_count',
+    '_pages_content.children', '_pages_store.data',
+}
+
+# The GET routes whose responses are built only from the data files and the request
+CACHEABLE_PATHS = ('/_dash-layout', '/_dash-dependencies', '/export/')
+
+CALLBACK_PATH = '/_dash-update-component'
+
+# The environment variables that change the callbacks or the layouts of the app
+APP_SETTINGS = ['HEI_CLIENTSIDE_CALLBACKS', 'HEI_METRICS']
+
+# The request methods that can be answered with 304 Not Modified
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def code_version(folder=Path(__file__).parent):
+    """
+    Return a value that changes whenever a file of the app code or a setting in APP_SETTINGS changes.
+
+    Args:
+        folder (pathlib.Path, optional): The folder of the app code. Defaults to the src folder.
+
+    Returns:
+        str: A hexadecimal digest of the modification times and sizes of the
+        files and of the values of the settings.
+    """
+    stamps = sorted((str(path.relative_to(folder)), path.stat().st_mtime_ns, path.stat().st_size)
+                    for path in folder.rglob('*') if path.is_file() and '__pycache__' not in path.parts)
+    settings = [(name, os.environ.get(name)) for name in APP_SETTINGS]
+    return hashlib.sha1(repr((stamps, settings)).encode()).hexdigest()
+
+
+def callback_outputs(body):
+    """
+    Return the outputs of a Dash callback request.
+
+    Args:
+        body (dict): The JSON body of the callback request.
+
+    Returns:
+        list: The outputs as 'id.property' strings.
+    """
+    output = body.get('output', '')
+    # Callbacks with several outputs join them as '..first...second..'
+    if output.startswith('..') and output.endswith('..'):
+        return output[2:-2].split('...')
+    return [output]
+
+
+def is_cacheable():
+    """
+    Check whether the response to the current request can be given an ETag.
+
+    Returns:
+        bool: True for GET and HEAD requests to a cacheable route and for
+        callback requests whose outputs are all in CACHEABLE_OUTPUTS.
+    """
+    if request.method in CONDITIONAL_METHODS:
+        return request.path.startswith(CACHEABLE_PATHS)
+    if request.method == 'POST' and request.path.endswith(CALLBACK_PATH):
+        body = request.get_json(silent=True)
+        return isinstance(body, dict) and all(output in CACHEABLE_OUTPUTS for output in callback_outputs(body))
+    return False
+
+
+def request_etag(data_version, app_version):
+    """
+    Return the ETag of the response to the current request.
+
+    Args:
+        data_version (str): The version of the data files.
+        app_version (str): The version of the app code.
+
+    Returns:
+        str: The ETag, without quotes.
+    """
+    digest = hashlib.sha1()
+    # A HEAD request gets the ETag of the GET request it stands for
+    method = 'GET' if request.method == 'HEAD' else request.method
+    for part in (data_version, app_version, method, request.full_path):
+        digest.update(part.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def register_http_caching(server):
+    """
+    Add the ETag handling to the Flask server of the Dash app.
+
+    Args:
+        server (flask.Flask): The Flask server of the Dash app.
+    """
+    app_version = code_version()
+    file_paths = [data_path(file_name) for file_name in DATASET_FILES]
+
+    @server.before_request
+    def check_etag():
+        """
+        Answer 304 Not Modified if the client already has the response to a GET or HEAD request.
+
+        Returns:
+            flask.Response: An empty 304 response, or None to handle the request.
+        """
+        if not is_cacheable():
+            return None
+        try:
+            g.etag = request_etag(dataset_store.version(file_paths), app_version)
+        except OSError:
+            # A missing data file is reported by the request itself
+            return None
+        if request.method in CONDITIONAL_METHODS and g.etag in request.if_none_match:
+            response = server.make_response(('', 304))
+            response.set_etag(g.etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return None
+
+    @server.after_request
+    def add_etag(response):
+        """
+        Add the ETag to a successful response to a cacheable request.
+
+        Args:
+            response (flask.Response): The response.
+
+        Returns:
+            flask.Response: The response with the ETag and Cache-Control headers.
+        """
+        if response.status_code == 200 and 'etag' in g:
+            response.set_etag(g.etag)
+            # Stored copies must be checked with the server before they are used
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
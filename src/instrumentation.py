@@ -0,0 +1,260 @@
+"""
+This module contains the timing instrumentation of the figure builders and page callbacks.
+
+Instrumentation is turned on by setting the HEI_METRICS environment variable to 1
+before the app starts. When it is off, the timed decorator returns the function
+unchanged and stage returns a shared object that does nothing, so the
+instrumented code runs at full speed.
+
+When it is on, every call of a timed function records its duration, and the
+stages inside it record their own durations and row counts. The totals are kept
+in memory and served as JSON by the /metrics route, and each call is written as
+a JSON log line to the 'hei.metrics' logger. The logger writes the lines to
+standard error at INFO level, unless the logging configuration of the server
+has already given it a handler, which is then used instead.
+
+Classes:
+- MetricsRegistry: Keeps the call count, total and maximum duration and row
+count of each timed function and stage.
+- Stage: Times a stage of a timed function.
+
+Functions:
+- timed(name): A decorator that times each call of a function.
+- stage(name): Returns a context manager that times a stage of a timed function.
+- configure_metrics_logger(stream): Makes the 'hei.metrics' logger write the timing lines.
+- register_metrics_route(server, extra): Adds the /metrics route to the Flask server.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+from flask import jsonify
+
+# Whether the timings are recorded
+METRICS_ENABLED = os.environ.get('HEI_METRICS', '0') == '1'
+
+logger = logging.getLogger('hei.metrics')
+
+# The stages recorded by the timed call that is running, in each thread or request
+_current_call = contextvars.ContextVar('current_call', default=None)
+
+
+class MetricsRegistry:
+    """
+    Keeps the call count, total and maximum duration and row count of each timed function and stage.
+    """
+
+    def __init__(self):
+        """
+        Create an empty registry.
+        """
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration, rows=None):
+        """
+        Add the duration of a call or stage to its totals.
+
+        Args:
+            name (str): The name of the function or stage.
+            duration (float): The duration in seconds.
+            rows (int, optional): The number of rows processed. Defaults to None.
+        """
+        with self._lock:
+            metric = self._metrics.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+            metric['count'] += 1
+            metric['total_ms'] += duration * 1000
+            metric['max_ms'] = max(metric['max_ms'], duration * 1000)
+            if rows is not None:
+                metric['rows'] += rows
+
+    def snapshot(self):
+        """
+        Return a copy of the totals with the mean duration of each function and stage.
+
+        Returns:
+            dict: The totals keyed by name, sorted by total duration, longest first.
+        """
+        with self._lock:
+            metrics = {name: dict(metric, mean_ms=metric['total_ms'] / metric['count'])
+                       for name, metric in self._metrics.items()}
+        return dict(sorted(metrics.items(), key=lambda item: item[1]['total_ms'], reverse=True))
+
+    def clear(self):
+        """
+        Remove all the totals.
+        """
+        with self._lock:
+            self._metrics.clear()
+
+
+# The registry shared by the whole process
+metrics_registry = MetricsRegistry()
+
+
+class Stage:
+    """
+    Times a stage of a timed function.
+
+    Set the rows attribute inside the with block to record the number of rows
+    the stage processed.
+    """
+
+    __slots__ = ('name', 'rows', '_start')
+
+    def __init__(self, name):
+        """
+        Create a stage.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        self.name = name
+        self.rows = None
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self._start
+        call = _current_call.get()
+        name = f"{call['name']}.{self.name}" if call else self.name
+        metrics_registry.record(name, duration, self.rows)
+        if call:
+            call['stages'][self.name] = {'ms': round(duration * 1000, 3), 'rows': self.rows}
+        return False
+
+
+class _NullStage:
+    """
+    A stage that records nothing, used when instrumentation is off.
+    """
+
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """
+    Return a context manager that times a stage of a timed function.
+
+    Args:
+        name (str): The name of the stage, recorded as '<function>.<stage>'.
+
+    Returns:
+        Stage: The stage, or a shared stage that records nothing when instrumentation is off.
+    """
+    if not METRICS_ENABLED:
+        return _NULL_STAGE
+    return Stage(name)
+
+
+def timed(name=None):
+    """
+    A decorator that times each call of a function.
+
+    The number of rows is recorded for functions that return a DataFrame.
+
+    Args:
+        name (str, optional): The name to record the calls under. Defaults to
+        '<module>.<function>'.
+
+    Returns:
+        callable: The decorator. It returns the function unchanged when instrumentation is off.
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+        metric_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            call = {'name': metric_name, 'stages': {}}
+            token = _current_call.set(call)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                duration = time.perf_counter() - start
+                _current_call.reset(token)
+                rows = len(result) if isinstance(result, pd.DataFrame) else None
+                metrics_registry.record(metric_name, duration, rows)
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(json.dumps({'event': 'timing', 'name': metric_name,
+                                            'ms': round(duration * 1000, 3), 'rows': rows,
+                                            'stages': call['stages']}))
+        return wrapper
+    return decorator
+
+
+def configure_metrics_logger(stream=None):
+    """
+    Make the 'hei.metrics' logger write the timing lines at INFO level.
+
+    Python's root logger only passes on warnings and errors, so without this
+    the timing lines would never be written.
+
+    Args:
+        stream (file, optional): The stream to write the lines to, if the logger
+        has no handler yet. Defaults to sys.stderr.
+
+    Returns:
+        logging.Handler: The handler that writes the lines.
+    """
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        # The lines are written by this handler only, not again by the root logger
+        logger.propagate = False
+    return logger.handlers[0]
+
+
+if METRICS_ENABLED:
+    configure_metrics_logger()
+
+
+def register_metrics_route(server, extra=None):
+    """
+    Add the /metrics route to the Flask server of the Dash app when instrumentation is on.
+
+    Args:
+        server (flask.Flask): The Flask server of the Dash app.
+        extra (dict, optional): Functions that return more statistics to include
+        in the response, keyed by the name to show them under. Defaults to None.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    @server.route('/metrics')
+    def metrics():
+        """
+        Return the timings recorded by this process.
+
+        Returns:
+            flask.Response: The timings and the extra statistics, as JSON.
+        """
+        response = {'pid': os.getpid(), 'timings': metrics_registry.snapshot()}
+        for key, get_statistics in (extra or {}).items():
+            response[key] = get_statistics()
+        return jsonify(response)
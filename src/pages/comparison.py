@@ -13,8 +13,13 @@ The module defines the following components:
 - category_marker_dropdown: A dropdown component for selecting
 the category marker.
 - category_dropdown: A dropdown component for selecting the category.
-- hei_dropdown: A dropdown component for selecting the HEIs to compare.
-- layout: The layout of the page.
+- create_hei_dropdown: A function to create the dropdown component for
+selecting the HEIs to compare.
+- export_button: A button that downloads the bar chart data as a CSV file.
+- bar_chart_state: A store that holds the selection and the bars shown on the
+bar chart, so HEIs can be added to or removed from the chart without rebuilding it.
+- layout: A function that returns the layout of the page. The HEI dropdown
+is built from the data when the page is first requested, not when the module is imported.
 
 The module also defines the following callback functions:
 - update_category_marker_dropdown_comparison: A callback function
@@ -22,15 +27,19 @@ to update the category marker dropdown based on the selected class.
 - update_category_dropdown_comparison: A callback function to
 update the category dropdown based on the selected category marker.
 - update_bar_chart: A callback function to update the bar chart
-based on the selected HEIs, year(s), and category.
+based on the selected HEIs, year(s), and category. When only the selected
+HEIs change, it adds or removes their bars on the chart shown in the browser.
+- update_export_link: A callback function that points the export button
+at the bar chart data for the selected HEIs, year(s), and category.
 """
 
-from pathlib import Path
-from dash import html, register_page, dcc, callback, Output, Input
+from urllib.parse import urlencode
+from dash import html, register_page, dcc, callback, Output, Input, State
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import pandas as pd
-from figures import create_category_marker_options, create_category_options, create_bar_chart
+from figures import (create_category_marker_options, create_category_options, create_bar_chart,
+                     create_bar_chart_patch, figure_cache, get_bar_chart_traces, get_metadata_catalog)
+from instrumentation import timed
 
 # Register the page with the Dash app
 register_page(__name__, name="HEI Comparison", path='/comparison')
@@ -109,12 +118,8 @@ def create_hei_dropdown():
     Returns:
         A dropdown component with options to select HEI(s) for comparison.
     """
-    # Load the dataset
-    data_path = Path(__file__).parent.parent.parent.joinpath(
-        'data', 'hei_data.csv')
-    data_df = pd.read_csv(data_path)
     hei_providers = [{"label": provider, "value": provider}
-                     for provider in data_df['HE Provider']]
+                     for provider in get_metadata_catalog()['providers']]
     return create_dropdown(
         "hei-dropdown-comparison",
         options=hei_providers,
@@ -123,7 +128,10 @@ def create_hei_dropdown():
     )
 
 
-hei_dropdown = create_hei_dropdown()
+export_button = dbc.Button("Export CSV", id="comparison-export-link", color="primary",
+                           href="/export/comparison.csv", external_link=True, className="mt-2")
+
+bar_chart_state = dcc.Store(id="bar-chart-state")
 
 row_one = dbc.Row([
     dbc.Col([html.H1("HEI Comparison")], width=12)
@@ -133,16 +141,29 @@ row_two = dbc.Row([
     dbc.Col([html.P("To see a bar chart, you need to select one or more academic years from the dropdown. You will then need to choose a category marker and then select a category. You will then need to choose one or more HEIs to see how they perform in that category metric.")], width=12)
 ])
 
-row_three = dbc.Row([
-    dbc.Col(children=[
-        html.P(children=["Year", year_dropdown]),
-        html.P(children=["Class", class_dropdown]),
-        html.P(children=["Category Marker", category_marker_dropdown]),
-        html.P(children=["Category", category_dropdown]),
-        html.P(children=["HEI", hei_dropdown])
-    ], width=4),
-    dbc.Col(children=[dcc.Graph(id='bar_chart')], width=8),
-    html.Script('''
+
+@timed()
+def layout(**_query):
+    """
+    Generates the layout for the comparison page.
+
+    Args:
+        **_query: The query string parameters of the URL, which Dash passes to
+        the layout. They are not used by the page.
+
+    Returns:
+        dbc.Container: The layout for the comparison page.
+    """
+    row_three = dbc.Row([
+        dbc.Col(children=[
+            html.P(children=["Year", year_dropdown]),
+            html.P(children=["Class", class_dropdown]),
+            html.P(children=["Category Marker", category_marker_dropdown]),
+            html.P(children=["Category", category_dropdown]),
+            html.P(children=["HEI", figure_cache.get(create_hei_dropdown)])
+        ], width=4),
+        dbc.Col(children=[dcc.Graph(id='bar_chart'), export_button, bar_chart_state], width=8),
+        html.Script('''
         // Get the dropdown menu element
         var dropdownMenu = document.getElementById('Select-menu-outer');
 
@@ -151,13 +172,13 @@ row_three = dbc.Row([
             event.stopPropagation();
         });
     ''')
-])
+    ])
 
-layout = dbc.Container([
-    row_one,
-    row_two,
-    row_three
-])
+    return dbc.Container([
+        row_one,
+        row_two,
+        row_three
+    ])
 
 
 @callback(
@@ -165,6 +186,7 @@ layout = dbc.Container([
     Output("category-marker-dropdown-comparison", "value"),
     Input("class-dropdown-comparison", "value")
 )
+@timed()
 def update_category_marker_dropdown_comparison(class_name):
     """
     Updates the category marker dropdown in the comparison page.
@@ -189,6 +211,7 @@ def update_category_marker_dropdown_comparison(class_name):
     Output("category-dropdown-comparison", "value"),
     Input("category-marker-dropdown-comparison", "value"),
 )
+@timed()
 def update_category_dropdown_comparison(category_marker):
     """
     Updates the category dropdown options based on the selected category marker.
@@ -210,25 +233,64 @@ def update_category_dropdown_comparison(category_marker):
 
 @callback(
     Output('bar_chart', 'figure'),
+    Output('bar-chart-state', 'data'),
     Input('hei-dropdown-comparison', 'value'),
     Input('year-dropdown-comparison', 'value'),
-    Input('category-dropdown-comparison', 'value')
+    Input('category-dropdown-comparison', 'value'),
+    State('bar-chart-state', 'data')
 )
-def update_bar_chart(hei, year, category):
+@timed()
+def update_bar_chart(hei, year, category, chart_state):
     """
     Update the bar chart based on the selected height, year, and category.
 
+    When only the selected HEIs have changed, the bars of the added and removed
+    HEIs are changed on the chart shown in the browser instead of sending a new chart.
+
     Parameters:
     hei (float): The height value for the bar chart.
     year (int): The year value for the bar chart.
     category (str): The category value for the bar chart.
+    chart_state (dict): The selection and bars shown on the current chart.
 
     Returns:
-    fig: A plotly express bar chart figure object.
+    tuple: A plotly express bar chart figure object, or the changes to the
+    current chart, and the new chart state.
 
     Raises:
     PreventUpdate: If any of the input parameters are missing or empty.
     """
     if not hei or not year or not category:
         raise PreventUpdate
-    return create_bar_chart(hei, year, category)
+    if chart_state and chart_state['category'] == category and sorted(chart_state['year']) == sorted(year):
+        added_heis = [provider for provider in hei if provider not in chart_state['hei']]
+        removed_heis = [provider for provider in chart_state['hei'] if provider not in hei]
+        update = create_bar_chart_patch(chart_state['traces'], added_heis, removed_heis, year, category)
+        if update is not None:
+            patch, traces = update
+            return patch, {'hei': hei, 'year': year, 'category': category, 'traces': traces}
+    figure = figure_cache.get(create_bar_chart, hei, year, category)
+    return figure, {'hei': hei, 'year': year, 'category': category, 'traces': get_bar_chart_traces(figure)}
+
+
+@callback(
+    Output('comparison-export-link', 'href'),
+    Input('hei-dropdown-comparison', 'value'),
+    Input('year-dropdown-comparison', 'value'),
+    Input('category-dropdown-comparison', 'value')
+)
+@timed()
+def update_export_link(hei, year, category):
+    """
+    Point the export button at the bar chart data for the selected HEIs, years and category.
+
+    Parameters:
+    hei (list): The selected HEIs.
+    year (list): The selected academic years.
+    category (str): The selected category.
+
+    Returns:
+    str: The URL of the CSV export.
+    """
+    query = {'hei': hei or [], 'year': year or [], 'category': category or ''}
+    return f"/export/comparison.csv?{urlencode(query, doseq=True)}"
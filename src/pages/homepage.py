@@ -4,20 +4,25 @@ This module contains the code for the homepage of the England HEI Environmental
 The homepage displays a map of Higher Education Institutions (HEIs) in England and provides options to filter the HEIs by region and view additional information about each HEI.
 
 The module defines functions for creating buttons, dropdowns, rows, and the overall layout of the homepage. It also includes callback functions for updating the map and displaying information cards based on user interactions.
+
+By default the callbacks run in the browser, using the clientside callbacks in
+src/assets/homepage.js and a compact copy of the map data held in a dcc.Store,
+so hovering over the map does not make a request to the server. Set the
+HEI_CLIENTSIDE_CALLBACKS environment variable to 0 to run the callbacks defined
+in this module on the server instead.
 """
 
-from pathlib import Path
-from dash import html, register_page, dcc, callback, Output, Input, callback_context
+import os
+from dash import html, register_page, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State, callback_context
 import dash_bootstrap_components as dbc
-import pandas as pd
-from figures import create_scatter_mapbox, create_card
+from figures import create_scatter_mapbox, create_map_patch, create_card, figure_cache, get_map_data, get_metadata_catalog
+from instrumentation import timed
 
 # Register the page with the Dash app
 register_page(__name__, name="Homepage", path='/')
 
-# Load the data
-raw_data = Path(__file__).parent.parent.parent.joinpath('data', 'hei_data.csv')
-data_df = pd.read_csv(raw_data)
+# Whether the homepage callbacks run in the browser instead of on the server
+CLIENTSIDE_CALLBACKS = os.environ.get('HEI_CLIENTSIDE_CALLBACKS', '1') != '0'
 
 
 def create_button(text, href):
@@ -87,6 +92,7 @@ def create_row(content):
     return dbc.Row(content, style={"padding-top": "20px"})
 
 
+@timed()
 def layout():
     """
     Create the layout for the homepage.
@@ -95,10 +101,11 @@ def layout():
         dbc.Container: The container component containing the homepage layout.
     """
     # Create the options for the dropdowns
+    catalog = get_metadata_catalog()
     regions = [{'label': region, 'value': region}
-               for region in data_df['Region of HE provider'].unique()]
+               for region in catalog['regions']]
     heis = [{'label': hei, 'value': hei}
-            for hei in data_df['HE Provider'].unique()]
+            for hei in catalog['providers']]
 
     # Create the buttons
     button1 = create_button("Ranking Table", "/ranking_table")
@@ -129,18 +136,18 @@ def layout():
             # filters on the left
             html.P(["Filter HEIs", hei_dropdown], style={"background-color": "lightgrey"})], width=2),
         dbc.Col(children=[dcc.Graph(
-            figure=create_scatter_mapbox(), id='england_map')], width=8),  # map in the middle
+            figure=figure_cache.get(create_scatter_mapbox), id='england_map')], width=8),  # map in the middle
         dbc.Col(children=[html.Div(id='card')], width=2)  # card on the right
     ])
 
     layout_page = dbc.Container([row_one, row_two, row_three, row_four])
+    if CLIENTSIDE_CALLBACKS:
+        # Send the map data once, for the clientside callbacks
+        layout_page.children.append(dcc.Store(id='map-data', data=get_map_data()))
     return layout_page
 
 
-@callback(
-    Output('hei-dropdown-map', 'options'),
-    Input('region-dropdown-map', 'value')
-)
+@timed()
 def update_hei_options(selected_regions):
     """
     Update the options of the HEI dropdown based on the selected regions.
@@ -151,33 +158,31 @@ def update_hei_options(selected_regions):
     Returns:
         list: The updated options for the HEI dropdown.
     """
+    catalog = get_metadata_catalog()
     if selected_regions:  # if regions are selected, show only HEIs in those regions
-        heis_in_selected_regions = data_df[data_df['Region of HE provider'].isin(
-            selected_regions)]['HE Provider']
+        region_providers = catalog['region_providers']
         hei_options = [{'label': hei, 'value': hei}
-                       for hei in heis_in_selected_regions]
+                       for region in selected_regions for hei in region_providers.get(region, [])]
     else:  # if no regions are selected, show all HEIs
         hei_options = [{'label': hei, 'value': hei}
-                       for hei in data_df['HE Provider']]
+                       for hei in catalog['providers']]
 
     return hei_options
 
 
-@callback(
-    Output('england_map', 'figure'),
-    [Input('region-dropdown-map', 'value'),
-     Input('hei-dropdown-map', 'value')]
-)
+@timed()
 def update_map(selected_regions, selected_heis):
     """
     Update the map figure based on the selected regions and HEIs.
 
+    The full map is sent with the page, so only the changes that filter it are returned.
+
     Args:
         selected_regions (list): The list of selected regions.
         selected_heis (list): The list of selected HEIs.
 
     Returns:
-          go.Figure: the updated Plotly graph objects Scatter mapbox plot with the filters applied if applicable.
+          dash.Patch: the changes to the Plotly graph objects Scatter mapbox plot with the filters applied if applicable.
     """
     ctx = callback_context  # get the context of the callback
     if ctx.triggered:  # if the callback was triggered
@@ -185,17 +190,14 @@ def update_map(selected_regions, selected_heis):
         # check which dropdown was changed
         # if the region dropdown was changed, update the map with the selected regions
         if prop_id == 'region-dropdown-map.value':
-            return create_scatter_mapbox(region=selected_regions)
+            return create_map_patch(region=selected_regions)
         # if the HEI dropdown was changed, update the map with the selected HEIs
         elif prop_id == 'hei-dropdown-map.value':
-            return create_scatter_mapbox(hei=selected_heis)
-    return create_scatter_mapbox()  # default to showing all data
+            return create_map_patch(hei=selected_heis)
+    return create_map_patch()  # default to showing all data
 
 
-@callback(
-    Output('card', 'children'),
-    Input('england_map', 'hoverData')
-)
+@timed()
 def display_card(hover_data):
     """
     Display the card with information about the selected HEI.
@@ -208,6 +210,43 @@ def display_card(hover_data):
     """
     # if a point is hovered over, get the UKPRN and create a card for that HEI
     if hover_data is not None:
-        ukprn = hover_data['points'][0]['customdata']
+        ukprn = hover_data['points'][0].get('customdata')
         if ukprn is not None:
             return create_card(ukprn)
+
+
+if CLIENTSIDE_CALLBACKS:
+    clientside_callback(
+        ClientsideFunction(namespace='homepage', function_name='update_hei_options'),
+        Output('hei-dropdown-map', 'options'),
+        Input('region-dropdown-map', 'value'),
+        State('map-data', 'data')
+    )
+    clientside_callback(
+        ClientsideFunction(namespace='homepage', function_name='update_map'),
+        Output('england_map', 'figure'),
+        Input('region-dropdown-map', 'value'),
+        Input('hei-dropdown-map', 'value'),
+        State('map-data', 'data'),
+        State('england_map', 'figure')
+    )
+    clientside_callback(
+        ClientsideFunction(namespace='homepage', function_name='display_card'),
+        Output('card', 'children'),
+        Input('england_map', 'hoverData'),
+        State('map-data', 'data')
+    )
+else:
+    callback(
+        Output('hei-dropdown-map', 'options'),
+        Input('region-dropdown-map', 'value')
+    )(update_hei_options)
+    callback(
+        Output('england_map', 'figure'),
+        [Input('region-dropdown-map', 'value'),
+         Input('hei-dropdown-map', 'value')]
+    )(update_map)
+    callback(
+        Output('card', 'children'),
+        Input('england_map', 'hoverData')
+    )(display_card)
@@ -4,31 +4,64 @@ The overview page is where users can see how a specific university has
 performed between 2018/19 - 2021/22 in various environmental categories.
 Users can also analyse other universities using the sidebar.
 
+The sidebar and the set of university names are built once from the HEI data
+and reused by every page, and the layout of each university's page is kept in
+a cache of its own, so moving between universities costs almost no server time.
+Every unknown university shares the one 'University not found' layout, so
+made-up URLs cannot fill the cache.
+
+By default the line chart is drawn in the browser, by the clientside callback in
+src/assets/overview.js, from every series of the university sent with the page
+in a dcc.Store, so choosing a class or category marker does not need a request
+to the server. Set the HEI_CLIENTSIDE_CALLBACKS environment variable to 0 to
+draw it with the update_line_chart callback on the server instead.
+
 The module defines the following components:
 - create_sidebar: A function to create the sidebar with links to different universities.
+- build_sidebar_data: A function to build the sidebar and the set of university names.
+- get_sidebar_data: A function to return the sidebar and the set of university names.
+- build_layout: A function to build the layout of the page for a university.
 - create_nav_links: A function to create navigation links for the sidebar.
 - class_dropdown: A dropdown component for selecting the class.
 - category_marker_dropdown: A dropdown component for selecting the category marker.
-- line_chart: A line chart component for displaying the data.
 - layout: The layout of the page.
 
 The module also defines the following callback functions:
 - toggle_collapse: A callback function to toggle the sidebar.
 - update_nav: A callback function to update the sidebar navigation links based on the search input.
+The search input is debounced, so the callback runs once the user stops typing, and
+the matching HE providers are found with the prebuilt index of search_index.py.
 - update_category_marker_dropdown_overview: A callback function to
 update the category marker dropdown based on the selected class.
 - update_line_chart: A callback function to update the line
 chart based on the selected class and category marker.
 """
 
+import os
 from urllib.parse import unquote
-from pathlib import Path
 
-from dash import html, register_page, dcc, callback, Output, Input, State
+from dash import html, register_page, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import pandas as pd
-from figures import create_line_chart, create_category_marker_options
+from data_store import data_path, dataset_store
+from figures import (FigureCache, create_line_chart, create_category_marker_options, figure_cache,
+                     get_line_chart_series, get_metadata_catalog)
+from instrumentation import timed
+from search_index import get_search_index
+
+# The time in seconds the user must stop typing for before the sidebar is searched
+SEARCH_DEBOUNCE_SECONDS = 0.3
+
+# Whether the line chart is drawn in the browser instead of on the server
+CLIENTSIDE_CALLBACKS = os.environ.get('HEI_CLIENTSIDE_CALLBACKS', '1') != '0'
+
+# The maximum number of university page layouts to keep
+LAYOUT_CACHE_SIZE = 256
+
+# The layouts of the university pages, kept apart from the figure cache so that
+# visiting many universities does not remove the figures of the other pages
+layout_cache = FigureCache(LAYOUT_CACHE_SIZE, version=figure_cache.version)
+dataset_store.add_reload_listener(layout_cache.clear)
 
 
 def title(he_provider=None):
@@ -48,10 +81,14 @@ def title(he_provider=None):
 register_page(__name__, path_template="/university/<he_provider>", title=title)
 
 
-def generate_sidebar_links():
+def generate_sidebar_links(universities=None):
     """
     Generates sidebar links for universities.
 
+    Args:
+        universities (list, optional): The names of the universities to link to.
+        Defaults to None, for all the universities.
+
     Returns:
         A list of dictionaries, where each dictionary represents a sidebar link.
         Each dictionary has the following keys:
@@ -59,22 +96,27 @@ def generate_sidebar_links():
         - "href": The URL for the university's page.
         - "active": The active state of the link (e.g., "exact" for exact match).
     """
-    data = Path(__file__).parent.parent.parent.joinpath('data', 'hei_data.csv')
-    universities = pd.read_csv(data)['HE Provider']
+    if universities is None:
+        universities = get_metadata_catalog()['providers']
     return [{"children": uni, "href": f"/university/{uni}", "active": "exact"} for uni in universities]
 
-def create_sidebar():
+
+def create_sidebar(universities=None):
     """
     Creates a sidebar component for the overview page.
 
+    Args:
+        universities (list, optional): The names of the universities to link to.
+        Defaults to None, for all the universities.
+
     Returns:
         dbc.Nav: The sidebar component.
     """
-    universities = generate_sidebar_links()
+    universities = generate_sidebar_links(universities)
     instructions = html.P("Click on a HEI to go to its overview page.", className="lead", style={
                           "font-size": 15, "padding": 10, "font-weight": "bold"})
-    search_bar = dbc.Input(id="search_input", type="search",
-                           placeholder="Search for a HEI", className="mb-3", style={"padding": 10})
+    search_bar = dcc.Input(id="search_input", type="search", debounce=SEARCH_DEBOUNCE_SECONDS,
+                           placeholder="Search for a HEI", className="form-control mb-3", style={"padding": 10})
     collapse = dbc.Collapse(children=[search_bar, dbc.Nav(create_nav_links(
         universities), vertical=True, id="sidebar-nav")], id="collapse")
     toggle_button = dbc.Button(
@@ -106,24 +148,56 @@ class_dropdown = dbc.Select(id="class-dropdown", options=[{"label": cls, "value"
 category_marker_dropdown = dbc.Select(
     id="category-marker-dropdown", options=[], placeholder="Choose a category marker to see a graph")
 
-line_chart = create_line_chart(None, None, None)
+
+@timed()
+def build_sidebar_data(hei_data_df):
+    """
+    Builds the sidebar and the set of university names.
+
+    Args:
+        hei_data_df (pandas.DataFrame): The HEI data.
+
+    Returns:
+        dict: A dictionary with the following keys:
+        - 'sidebar': The sidebar component, shared by the layouts of every university.
+        - 'universities': The set of university names, to check that a university exists.
+    """
+    universities = hei_data_df['HE Provider'].tolist()
+    return {'sidebar': create_sidebar(universities), 'universities': frozenset(universities)}
+
+
+def get_sidebar_data():
+    """
+    Returns the sidebar and the set of university names, building them when the HEI data file is first loaded or changes.
+
+    Returns:
+        dict: The values described in build_sidebar_data.
+    """
+    return dataset_store.derive('overview_sidebar', [data_path('hei_data.csv')], build_sidebar_data)
+
 
 # Define the layout of the page
 
 
-def layout(he_provider=None):
+def build_layout(decoded_he_provider, university_exists):
     """
-    Generates the layout for the overview page.
+    Builds the layout of the overview page for a university.
 
     Args:
-        he_provider (str): The higher education provider.
+        decoded_he_provider (str): The decoded higher education provider name,
+        or None if the university is not in the HEI data.
+        university_exists (bool): Whether the university is in the HEI data.
 
     Returns:
         dbc.Container: The layout for the overview page.
     """
-    decoded_he_provider = unquote(he_provider)
-    universities = generate_sidebar_links()
-    universities_list = [uni["children"] for uni in universities]
+    sidebar = get_sidebar_data()['sidebar']
+
+    # If the university does not exist in the database, display a message
+    # to the user
+    if not university_exists:
+        return dbc.Container([dbc.Row([dbc.Col(sidebar, width=2), dbc.Col([html.H1("University not found"), html.P(
+            "The university you are looking for does not exist in our database."), html.P("Please edit the url to choose a different university or click on a university from the sidebar.")], width=10)])])
 
     # The standard rows for the overview page
     row_one = dbc.Row([dbc.Col([html.H1(f"{decoded_he_provider}")], width=12)])
@@ -132,22 +206,39 @@ def layout(he_provider=None):
     row_three = dbc.Row([dbc.Col([html.P(children=["Class", class_dropdown], style={"font-size": 20})], width=6), dbc.Col(
         [html.P(children=["Category Marker", category_marker_dropdown], style={"font-size": 20})], width=6)])
     row_four = dbc.Row([dbc.Col(
-        children=[dcc.Graph(figure=line_chart, id='overview_line_chart')], width=12)])
+        children=[dcc.Graph(figure=figure_cache.get(create_line_chart), id='overview_line_chart')], width=12)])
 
     # The standard layout for the page
-    page_layout = dbc.Container([dbc.Row([dbc.Col(create_sidebar(), width=2), dbc.Col(
+    page_layout = dbc.Container([dbc.Row([dbc.Col(sidebar, width=2), dbc.Col(
         [row_one, row_two, row_three, row_four], width=10)])])
+    if CLIENTSIDE_CALLBACKS:
+        # Send every series of the university with the page, for the clientside callback
+        page_layout.children.append(dcc.Store(id='overview-line-data', data=get_line_chart_series(decoded_he_provider)))
+    return page_layout
 
-    # If the university does not exist in the database, display a message
-    # to the user
-    non_existent_uni_layout = dbc.Container([dbc.Row([dbc.Col(create_sidebar(), width=2), dbc.Col([html.H1("University not found"), html.P(
-        "The university you are looking for does not exist in our database."), html.P("Please edit the url to choose a different university or click on a university from the sidebar.")], width=10)])])
 
-    # Return the standard layout for the university if it exists, otherwise return a message
-    return non_existent_uni_layout if decoded_he_provider not in universities_list else page_layout
+@timed()
+def layout(he_provider=None):
+    """
+    Generates the layout for the overview page.
+
+    Args:
+        he_provider (str): The higher education provider.
+
+    Returns:
+        dbc.Container: The layout for the overview page.
+    """
+    decoded_he_provider = unquote(he_provider)
+    # Getting the sidebar data reloads the HEI data if it has changed, which clears the cached layouts
+    universities = get_sidebar_data()['universities']
+    if decoded_he_provider not in universities:
+        # Only the layouts of known universities are cached under their name
+        return layout_cache.get(build_layout, None, False)
+    return layout_cache.get(build_layout, decoded_he_provider, True)
 
 
 @callback(Output("collapse", "is_open"), [Input("toggle", "n_clicks")], [State("collapse", "is_open")])
+@timed()
 def toggle_collapse(n, is_open):
     """
     Toggles the collapse state based on the value of `n`.
@@ -163,6 +254,7 @@ def toggle_collapse(n, is_open):
 
 
 @callback(Output("sidebar-nav", "children"), [Input("search_input", "value")])
+@timed()
 def update_nav(search_value):
     """
     Update the navigation links based on the search value.
@@ -171,15 +263,15 @@ def update_nav(search_value):
         search_value (str): The search value to filter the navigation links.
 
     Returns:
-        list: The updated navigation links.
+        list: The navigation links of the matching universities, best matches first.
     """
-    universities = generate_sidebar_links()
-    links = universities if not search_value else [
-        uni for uni in universities if search_value.lower() in uni["children"].lower()]
-    return create_nav_links(links)
+    if not search_value:
+        return create_nav_links(generate_sidebar_links())
+    return create_nav_links(generate_sidebar_links(get_search_index().search(search_value)))
 
 
 @callback(Output('category-marker-dropdown', 'options'), Output('category-marker-dropdown', 'value'), Input('class-dropdown', 'value'))
+@timed()
 def update_category_marker_dropdown_overview(class_name):
     """
     Updates the category marker dropdown in the overview page.
@@ -197,7 +289,7 @@ def update_category_marker_dropdown_overview(class_name):
     return options, None
 
 
-@callback(Output('overview_line_chart', 'figure'), Input('class-dropdown', 'value'), Input('category-marker-dropdown', 'value'), Input('url', 'pathname'))
+@timed()
 def update_line_chart(class_name, category_marker, pathname):
     """
     Update the line chart based on the selected class name, category marker, and pathname.
@@ -215,4 +307,22 @@ def update_line_chart(class_name, category_marker, pathname):
         raise PreventUpdate
     # Decode the HE provider name from the pathname and create the line chart
     decoded_he_provider = unquote(pathname.split('/')[-1])
-    return create_line_chart(decoded_he_provider, class_name, category_marker)
+    return figure_cache.get(create_line_chart, decoded_he_provider, class_name, category_marker)
+
+
+if CLIENTSIDE_CALLBACKS:
+    clientside_callback(
+        ClientsideFunction(namespace='overview', function_name='update_line_chart'),
+        Output('overview_line_chart', 'figure'),
+        Input('class-dropdown', 'value'),
+        Input('category-marker-dropdown', 'value'),
+        State('overview-line-data', 'data'),
+        State('overview_line_chart', 'figure')
+    )
+else:
+    callback(
+        Output('overview_line_chart', 'figure'),
+        Input('class-dropdown', 'value'),
+        Input('category-marker-dropdown', 'value'),
+        Input('url', 'pathname')
+    )(update_line_chart)
@@ -1,22 +1,36 @@
 """
 This module contains the code for the "Ranking Table" page of the Dash app.
 
-The page displays a ranking table that shows how universities have performed in various environmental categories between 2018/19 - 2021/22. Users can filter the table by class, year, and region. The table is interactive, allowing users to search each column for specific values and sort by ascending or descending order.
+The page displays a ranking table that shows how universities have performed in various environmental categories between 2018/19 - 2021/22. Users can filter the table by class, year, and region. The table is interactive, allowing users to search each column for specific values and sort by ascending or descending order. Paging, sorting and searching are done on the server, so only the rows on the current page are sent to the browser.
 
 The module defines the following components:
 - class_dropdown: A dropdown component for selecting the class.
 - year_dropdown: A dropdown component for selecting the year.
 - region_dropdown: A dropdown component for filtering regions.
-- table: The ranking table.
-- layout: The layout of the page.
-
-The module also defines an update_table callback function that updates the ranking table based on the selected parameters.
+- export_button: A button that downloads the full ranking table as a CSV file.
+- layout: A function that returns the layout of the page. The ranking table
+for the default class and year is built from the data when the page is first
+requested (or by preload_indexes before the workers of a WSGI server are
+forked), not when the module is imported.
+
+The module also defines the following callback functions:
+- update_table: A callback function that updates the ranking table based on the selected parameters.
+- update_table_page: A callback function that returns the rows of the current
+page after applying the search and sort order of the table.
+- update_export_link: A callback function that points the export button at the
+full table for the selected parameters.
 
 """
 
-from dash import html, register_page, callback, Output, Input, dcc
+import json
+from urllib.parse import urlencode
+
+from dash import html, register_page, callback, Output, Input, State, dcc
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-from figures import create_ranking_table
+from figures import (RANKING_DEFAULT_CLASS, RANKING_DEFAULT_YEAR, create_ranking_table, figure_cache,
+                     get_ranking_page)
+from instrumentation import timed
 
 # Register the page with the Dash app
 register_page(__name__, name="Ranking Table", path='/ranking_table')
@@ -27,14 +41,14 @@ class_dropdown = dbc.Select(
     options=["Building and spaces", "Energy", "Emissions and waste",
              "Transport and environment", "Finances and people"],
     # Set the default value to "Building and spaces"
-    value="Building and spaces"
+    value=RANKING_DEFAULT_CLASS
 )
 
 year_dropdown = dbc.Select(
     id="year-dropdown-rank",
     options=["2018/19", "2019/20", "2020/21", "2021/22"],
     # Set the default value to "2021/22"
-    value="2021/22"
+    value=RANKING_DEFAULT_YEAR
 )
 
 region_dropdown = dcc.Dropdown(
@@ -45,7 +59,8 @@ region_dropdown = dcc.Dropdown(
                                                                "North East", "North West", "South East", "South West", "West Midlands", "Yorkshire and The Humber"]]
 )
 
-table = create_ranking_table()
+export_button = dbc.Button("Export CSV", id="ranking-export-link", color="primary",
+                           href="/export/ranking.csv", external_link=True, className="mt-2")
 
 row_one = dbc.Row([
     dbc.Col([html.H1("Ranking Table")], width=12)
@@ -68,17 +83,33 @@ row_three = dbc.Row([
             style={"font-size": 20})], width=4)
 ])
 
-row_four = dbc.Row([
-    dbc.Col(children=table, width=12,
-            id="ranking-table-div", style={'width': '100%'})
-])
 
-layout = dbc.Container([
-    row_one,
-    row_two,
-    row_three,
-    row_four
-])
+@timed()
+def layout(**_query):
+    """
+    Generates the layout for the ranking table page.
+
+    Args:
+        **_query: The query string parameters of the URL, which Dash passes to
+        the layout. They are not used by the page.
+
+    Returns:
+        dbc.Container: The layout for the ranking table page.
+    """
+    # The table for the default class and year, which the figure cache shares with update_table
+    default_table = figure_cache.get(create_ranking_table, RANKING_DEFAULT_CLASS, RANKING_DEFAULT_YEAR, None)
+    row_four = dbc.Row([
+        dbc.Col(children=default_table, width=12,
+                id="ranking-table-div", style={'width': '100%'}),
+        dbc.Col(children=export_button, width=12)
+    ])
+
+    return dbc.Container([
+        row_one,
+        row_two,
+        row_three,
+        row_four
+    ])
 
 
 @callback(
@@ -87,6 +118,7 @@ layout = dbc.Container([
     Input('year-dropdown-rank', 'value'),
     Input('region-dropdown-map', 'value')
 )
+@timed()
 def update_table(class_name, academic_year, selected_regions):
     """
     Updates the ranking table for a given class, academic year, and selected regions.
@@ -99,7 +131,74 @@ def update_table(class_name, academic_year, selected_regions):
     Returns:
     - table_created (dash_table.DataTable): The ranking table according to the selected parameters.
     """
-    table_created = create_ranking_table(
-        class_name, academic_year, selected_regions)
+    table_created = figure_cache.get(
+        create_ranking_table, class_name, academic_year, selected_regions)
 
     return table_created
+
+
+@callback(
+    Output('ranking-table', 'data'),
+    Output('ranking-table', 'page_count'),
+    Input('ranking-table', 'page_current'),
+    Input('ranking-table', 'page_size'),
+    Input('ranking-table', 'sort_by'),
+    Input('ranking-table', 'filter_query'),
+    State('class-dropdown-rank', 'value'),
+    State('year-dropdown-rank', 'value'),
+    State('region-dropdown-map', 'value'),
+    prevent_initial_call=True
+)
+@timed()
+def update_table_page(page_current, page_size, sort_by, filter_query, class_name, academic_year, selected_regions):
+    """
+    Returns the rows of the current page of the ranking table.
+
+    Parameters:
+    - page_current (int): The index of the current page.
+    - page_size (int): The number of rows on a page.
+    - sort_by (list): The columns to sort by and their direction.
+    - filter_query (str): The search typed into the columns of the table.
+    - class_name (str): The name of the class.
+    - academic_year (str): The academic year.
+    - selected_regions (list): A list of selected regions.
+
+    Returns:
+    - tuple: The rows of the current page and the number of pages.
+
+    Raises:
+    - PreventUpdate: If the search cannot be understood.
+    """
+    try:
+        return get_ranking_page(class_name, academic_year, selected_regions,
+                                page_current, page_size, filter_query, sort_by)
+    except ValueError as error:
+        raise PreventUpdate from error
+
+
+@callback(
+    Output('ranking-export-link', 'href'),
+    Input('class-dropdown-rank', 'value'),
+    Input('year-dropdown-rank', 'value'),
+    Input('region-dropdown-map', 'value'),
+    Input('ranking-table', 'filter_query'),
+    Input('ranking-table', 'sort_by')
+)
+@timed()
+def update_export_link(class_name, academic_year, selected_regions, filter_query, sort_by):
+    """
+    Points the export button at the full ranking table for the selected parameters.
+
+    Parameters:
+    - class_name (str): The name of the class.
+    - academic_year (str): The academic year.
+    - selected_regions (list): A list of selected regions.
+    - filter_query (str): The search typed into the columns of the table.
+    - sort_by (list): The columns to sort by and their direction.
+
+    Returns:
+    - str: The URL of the CSV export.
+    """
+    query = {'class': class_name, 'year': academic_year, 'region': selected_regions or [],
+             'filter': filter_query or '', 'sort': json.dumps(sort_by or [])}
+    return f"/export/ranking.csv?{urlencode(query, doseq=True)}"
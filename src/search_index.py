@@ -0,0 +1,239 @@
+"""
+This module contains the search index of the HE provider names used by the overview sidebar.
+
+The index is built once from the HEI data, over the name and the alternative
+name of each HE provider, and rebuilt only when the HEI data file changes. Each
+name is normalised to lower case words without accents or punctuation, and
+split into words and into n-grams of up to three characters. A search looks up
+the n-grams of the query instead of scanning every name, and returns the
+matching HE providers ranked as follows:
+1. The name is the query.
+2. The name starts with the query.
+3. Every word of the query starts a word of the name.
+4. The name contains the query.
+5. Every word of the query is close to a word of the name, which catches typos.
+Within a rank, names that contain the words of the query as whole words come
+first and fuzzy matches are listed from the closest. Other HE providers in the
+same rank keep the order of the HEI data.
+
+Classes:
+- SearchIndex: An n-gram index of HE provider names.
+
+Functions:
+- normalize_text(text): Returns text in lower case without accents, punctuation or repeated spaces.
+- text_ngrams(text, size): Returns the n-grams of a text.
+- build_search_index(hei_data_df): Builds the search index of the HE providers.
+- get_search_index(): Returns the search index of the HE providers in the HEI data file.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+from data_store import data_path, dataset_store
+from instrumentation import timed
+
+# The longest n-grams in the index
+NGRAM_SIZE = 3
+
+# How similar a word of the query must be to a word of a name to be a fuzzy match, from 0 to 1
+FUZZY_CUTOFF = 0.75
+
+# Shorter words of the query must start a word of a name to be a fuzzy match
+FUZZY_MIN_LENGTH = 4
+
+APOSTROPHES = re.compile(r"['\u2019]")
+NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text):
+    """
+    Return text in lower case without accents, punctuation or repeated spaces.
+
+    Args:
+        text (str): The text to normalise.
+
+    Returns:
+        str: The normalised text, e.g. "King's College, London" becomes 'kings college london'.
+    """
+    text = unicodedata.normalize('NFKD', APOSTROPHES.sub('', str(text))).encode('ascii', 'ignore').decode()
+    return NON_ALPHANUMERIC.sub(' ', text.casefold()).strip()
+
+
+def text_ngrams(text, size):
+    """
+    Return the n-grams of a text.
+
+    Args:
+        text (str): The normalised text.
+        size (int): The number of characters in each n-gram.
+
+    Returns:
+        set: The n-grams. A text shorter than the size is its only n-gram.
+    """
+    if len(text) <= size:
+        return {text}
+    return {text[start:start + size] for start in range(len(text) - size + 1)}
+
+
+class SearchIndex:
+    """
+    An n-gram index of HE provider names.
+    """
+
+    def __init__(self, providers, alternative_names=None):
+        """
+        Build the index.
+
+        Args:
+            providers (list): The HE provider names, in the order results should be listed.
+            alternative_names (dict, optional): Other names to search for each HE
+            provider, keyed by HE provider name. Defaults to None.
+        """
+        self.providers = list(providers)
+        alternative_names = alternative_names or {}
+        # Each searchable name, with the position of its HE provider
+        self._names = []
+        for position, provider in enumerate(self.providers):
+            names = {normalize_text(provider), normalize_text(alternative_names.get(provider) or provider)}
+            self._names.extend((name, position) for name in sorted(names) if name)
+        self._ngrams = {}
+        for name_id, (name, _) in enumerate(self._names):
+            for size in range(1, NGRAM_SIZE + 1):
+                for ngram in text_ngrams(name, size):
+                    self._ngrams.setdefault(ngram, set()).add(name_id)
+        # The words of the names, sorted so the words starting with a prefix can be found by bisection
+        self._words = sorted({(word, name_id) for name_id, (name, _) in enumerate(self._names)
+                              for word in name.split()})
+        self._word_names = {}
+        for word, name_id in self._words:
+            self._word_names.setdefault(word, set()).add(name_id)
+        self._vocabulary = list(self._word_names)
+
+    def _word_prefix_matches(self, prefix):
+        """
+        Return the names with a word that starts with a prefix.
+
+        Args:
+            prefix (str): The normalised prefix.
+
+        Returns:
+            set: The ids of the names.
+        """
+        matches = set()
+        for word, name_id in self._words[bisect_left(self._words, (prefix,)):]:
+            if not word.startswith(prefix):
+                break
+            matches.add(name_id)
+        return matches
+
+    def _substring_matches(self, query):
+        """
+        Return the names that contain the query.
+
+        Args:
+            query (str): The normalised query.
+
+        Returns:
+            set: The ids of the names.
+        """
+        postings = [self._ngrams.get(ngram, set()) for ngram in text_ngrams(query, min(len(query), NGRAM_SIZE))]
+        candidates = set.intersection(*postings) if postings else set()
+        return {name_id for name_id in candidates if query in self._names[name_id][0]}
+
+    def _fuzzy_matches(self, query_words):
+        """
+        Return the names with a word close to each word of the query.
+
+        Args:
+            query_words (list): The words of the normalised query.
+
+        Returns:
+            dict: The similarity of each matching name to the query, from 0 to 1,
+            keyed by the id of the name. It is the similarity of the least similar word.
+        """
+        scores = None
+        for word in query_words:
+            word_scores = dict.fromkeys(self._word_prefix_matches(word), 1.0)
+            if len(word) >= FUZZY_MIN_LENGTH:
+                matcher = SequenceMatcher(b=word)
+                for vocabulary_word in self._vocabulary:
+                    matcher.set_seq1(vocabulary_word)
+                    # The quick ratios are upper bounds of the ratio, so most words are skipped cheaply
+                    if matcher.real_quick_ratio() < FUZZY_CUTOFF or matcher.quick_ratio() < FUZZY_CUTOFF:
+                        continue
+                    ratio = matcher.ratio()
+                    if ratio >= FUZZY_CUTOFF:
+                        for name_id in self._word_names[vocabulary_word]:
+                            word_scores[name_id] = max(ratio, word_scores.get(name_id, 0))
+            scores = word_scores if scores is None else {
+                name_id: min(score, word_scores[name_id]) for name_id, score in scores.items() if name_id in word_scores}
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Find the HE providers whose names match a query.
+
+        Args:
+            query (str): The text typed by the user.
+            limit (int, optional): The maximum number of results. Defaults to None, for all results.
+
+        Returns:
+            list: The names of the matching HE providers, best matches first. All
+            the HE providers are returned if the query is empty.
+        """
+        query = normalize_text(query or '')
+        if not query:
+            return self.providers[:limit]
+
+        substring_ids = self._substring_matches(query)
+        query_words = query.split()
+        word_ids = set.intersection(*(self._word_prefix_matches(word) for word in query_words))
+        fuzzy_scores = self._fuzzy_matches(query_words) if len(query) >= FUZZY_MIN_LENGTH else {}
+
+        ranks = {}
+        for name_id in substring_ids | word_ids | fuzzy_scores.keys():
+            name, position = self._names[name_id]
+            # Names with every word of the query as a whole word come first within a rank
+            partial = 0 if set(query_words) <= set(name.split()) else 1
+            if name == query:
+                rank = (0, 0)
+            elif name.startswith(query):
+                rank = (1, partial)
+            elif name_id in word_ids:
+                rank = (2, partial)
+            elif name_id in substring_ids:
+                rank = (3, partial)
+            else:
+                rank = (4, -fuzzy_scores[name_id])
+            ranks[position] = min(rank, ranks.get(position, rank))
+        ordered = sorted(ranks, key=lambda position: (ranks[position], position))
+        return [self.providers[position] for position in ordered[:limit]]
+
+
+@timed()
+def build_search_index(hei_data_df):
+    """
+    Build the search index of the HE providers.
+
+    Args:
+        hei_data_df (pandas.DataFrame): The HEI data.
+
+    Returns:
+        SearchIndex: The index of the 'HE Provider' and 'Alternative Name' of each HE provider.
+    """
+    alternative_names = {}
+    if 'Alternative Name' in hei_data_df:
+        alternative_names = dict(zip(hei_data_df['HE Provider'].tolist(), hei_data_df['Alternative Name'].tolist()))
+    return SearchIndex(hei_data_df['HE Provider'].tolist(), alternative_names)
+
+
+def get_search_index():
+    """
+    Return the search index of the HE providers, building it when the HEI data file is first loaded or changes.
+
+    Returns:
+        SearchIndex: The search index, shared by all callers.
+    """
+    return dataset_store.derive('search_index', [data_path('hei_data.csv')], build_search_index)
@@ -0,0 +1,50 @@
+"""
+This module is the production entry point of the Dash app, for a multi-worker WSGI server such as gunicorn.
+
+Importing the module loads the data files and builds the indexes and default
+figures derived from them. When the WSGI server imports the app before forking
+its workers (preload_app in gunicorn.conf.py), the workers share this memory
+copy-on-write instead of each loading the data.
+
+Run the app with: gunicorn (from the folder that contains gunicorn.conf.py)
+
+Routes:
+- /ready: A readiness check that returns 200 when the data files can be
+served, or 503 with the reason when they cannot.
+"""
+
+import gc
+
+from flask import jsonify
+
+from app import app
+from data_store import DATASET_FILES, data_path, dataset_store
+from figures import preload_indexes
+from search_index import get_search_index
+
+# The Flask server of the Dash app, used by the WSGI server
+server = app.server
+
+preload_indexes()
+get_search_index()
+# Move the objects created so far out of the garbage collector's generations, so
+# collections in the workers do not write to the memory shared with the parent
+gc.freeze()
+
+
+@server.route('/ready')
+def ready():
+    """
+    Check that the data files can be served.
+
+    The data files are reloaded here if they have changed on disk, so a broken
+    release is reported before it reaches a page.
+
+    Returns:
+        flask.Response: The status and the data files, as JSON.
+    """
+    try:
+        dataset_store.preload([data_path(file_name) for file_name in DATASET_FILES])
+    except (OSError, ValueError) as error:
+        return jsonify(status='unavailable', error=str(error)), 503
+    return jsonify(status='ready', datasets=DATASET_FILES)
@@ -0,0 +1,122 @@
+"""
+This module contains tests for the in-memory dataset store.
+
+The tests include:
+- Checking that a data file is only read once while it is unchanged.
+- Checking that a data file is reloaded when it changes on disk.
+- Checking that changes to a returned DataFrame do not affect the cached data.
+- Checking that a derived value is only rebuilt when its data file changes.
+- Checking that an up-to-date Parquet copy is read instead of the CSV file.
+"""
+
+import os
+
+import pytest
+
+from data_store import DatasetStore, encode_categoricals, parquet_path, read_dataset
+
+
+def write_csv(file_path, rows, mtime_ns):
+    """Write a small HESA-shaped CSV file and set its modification time."""
+    lines = ["HE Provider,Value"] + [f"{name},{value}" for name, value in rows]
+    file_path.write_text("\n".join(lines) + "\n")
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+
+def test_dataset_read_once(tmp_path):
+    """
+    GIVEN a dataset store and a data file
+    WHEN the file is requested several times without changing
+    THEN the file should only be read once
+    AND the 'Value' column should be numeric
+    """
+    file_path = tmp_path / "entry_data.csv"
+    write_csv(file_path, [("Aston University", "10"), ("UCL", "Yes")], 1_000_000_000)
+    reads = []
+
+    def counting_reader(path):
+        reads.append(path)
+        return read_dataset(path)
+
+    store = DatasetStore(reader=counting_reader)
+    store.get(file_path)
+    data_df = store.get(file_path, ['Value'])
+
+    assert len(reads) == 1
+    assert data_df['Value'].iloc[0] == 10
+    assert data_df['Value'].isna().iloc[1]
+
+
+def test_dataset_reloaded_when_file_changes(tmp_path):
+    """
+    GIVEN a dataset store that has loaded a data file
+    WHEN the file is replaced with a newer version
+    THEN the store should return the new data
+    """
+    file_path = tmp_path / "entry_data.csv"
+    write_csv(file_path, [("Aston University", "10")], 1_000_000_000)
+    store = DatasetStore()
+    assert store.get(file_path)['Value'].tolist() == [10]
+
+    write_csv(file_path, [("Aston University", "20"), ("UCL", "30")], 2_000_000_000)
+
+    assert store.get(file_path)['Value'].tolist() == [20, 30]
+
+
+def test_dataset_view_does_not_change_cache(tmp_path):
+    """
+    GIVEN a dataset store that has loaded a data file
+    WHEN a column of the returned DataFrame is changed
+    THEN the cached data should not change
+    """
+    file_path = tmp_path / "entry_data.csv"
+    write_csv(file_path, [("Aston University", "10")], 1_000_000_000)
+    store = DatasetStore()
+
+    data_df = store.get(file_path, ['HE Provider', 'Value'])
+    data_df['Value'] = data_df['Value'] * 2
+
+    assert store.get(file_path)['Value'].tolist() == [10]
+
+
+def test_derived_value_rebuilt_when_file_changes(tmp_path):
+    """
+    GIVEN a dataset store with a value derived from a data file
+    WHEN the value is requested again before and after the file changes
+    THEN the value should only be rebuilt after the file changes
+    """
+    file_path = tmp_path / "entry_data.csv"
+    write_csv(file_path, [("Aston University", "10")], 1_000_000_000)
+    store = DatasetStore()
+    builds = []
+
+    def total_value(data_df):
+        builds.append(1)
+        return data_df['Value'].sum()
+
+    assert store.derive('total', [file_path], total_value) == 10
+    assert store.derive('total', [file_path], total_value) == 10
+    write_csv(file_path, [("Aston University", "20"), ("UCL", "30")], 2_000_000_000)
+
+    assert store.derive('total', [file_path], total_value) == 50
+    assert len(builds) == 2
+
+
+def test_parquet_copy_used_when_up_to_date(tmp_path):
+    """
+    GIVEN a data file with a Parquet copy
+    WHEN the CSV file is newer than the Parquet copy
+    THEN the store should read the CSV file, otherwise the Parquet copy
+    """
+    pytest.importorskip("pyarrow")
+    file_path = tmp_path / "entry_data.csv"
+    write_csv(file_path, [("Aston University", "10")], 1_000_000_000)
+    encode_categoricals(read_dataset(file_path)).to_parquet(parquet_path(file_path))
+    os.utime(parquet_path(file_path), ns=(2_000_000_000, 2_000_000_000))
+    store = DatasetStore()
+
+    assert store.get(file_path)['HE Provider'].dtype == 'category'
+
+    write_csv(file_path, [("Aston University", "20")], 3_000_000_000)
+
+    assert store.get(file_path)['Value'].tolist() == [20]
@@ -0,0 +1,41 @@
+"""
+This module contains tests for the query strings of the export routes.
+
+The tests include:
+- Checking that a malformed sort order is rejected.
+- Checking that a comparison export without a category, HEIs or years is rejected.
+"""
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from export import comparison_export_data, parse_sort_by, ranking_export_data
+
+
+def test_malformed_sort_rejected():
+    """
+    GIVEN export query strings with sort orders that are not a DataTable sort_by
+    WHEN the ranking table data is requested
+    THEN a ValueError should be raised, which the route returns as a 400 response
+    AND a valid sort order should be read unchanged
+    """
+    for sort in ['not json', '{"column_id": "HE Provider"}', '[{"column_id": "HE Provider"}]',
+                 '[{"column_id": "HE Provider", "direction": "up"}]', '["HE Provider"]']:
+        with pytest.raises(ValueError):
+            ranking_export_data(MultiDict({'class': 'Energy', 'year': '2021/22', 'sort': sort}))
+    sort_by = [{'column_id': 'HE Provider', 'direction': 'desc'}]
+    assert parse_sort_by('[{"column_id": "HE Provider", "direction": "desc"}]') == sort_by
+    assert parse_sort_by(None) == []
+
+
+def test_comparison_export_requires_selection():
+    """
+    GIVEN export query strings without a category, HEIs or academic years
+    WHEN the comparison data is requested
+    THEN a ValueError should be raised instead of exporting the whole dataset
+    """
+    for args in [{}, {'category': 'Total energy (kWh)', 'year': ['2021/22']},
+                 {'hei': ['Aston University'], 'year': ['2021/22']},
+                 {'hei': ['Aston University'], 'category': 'Total energy (kWh)'}]:
+        with pytest.raises(ValueError, match='Missing query string arguments'):
+            comparison_export_data(MultiDict(args))
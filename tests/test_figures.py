@@ -0,0 +1,368 @@
+"""
+This module contains tests for the data filters and the figure cache used by the page callbacks.
+
+The tests include:
+- Checking that categorical and text columns are filtered the same way.
+- Checking that DataTable filter queries are parsed and applied to a DataFrame.
+- Checking that the ranking pivots are built, filtered by region and paginated.
+- Checking that the metadata catalog maps classes, markers, regions and UKPRNs.
+- Checking that the map card metrics are keyed by UKPRN for the chosen academic year.
+- Checking that the indexed line chart data matches the rows of a boolean filter.
+- Checking that the bar chart traces match those drawn by plotly express.
+- Checking that removing HEIs from the bar chart deletes only their bars.
+- Checking that the bar chart patch can be applied to the serialised bar chart.
+- Checking that list arguments are cached regardless of their order.
+- Checking that the least recently used entry is removed when the cache is full.
+- Checking that the cache is cleared when the dataset store reloads the data.
+- Checking that a figure is built again when the data files change.
+"""
+
+import json
+import math
+
+import pandas as pd
+import plotly
+import plotly.express as px
+import plotly.graph_objects as go
+import pytest
+
+from data_store import DatasetStore
+import figures
+from figures import (FigureCache, build_bar_chart_arrays, build_card_metrics, build_metadata_catalog,
+                     build_line_chart_index, build_ranking_pivots, column_mask, create_bar_chart,
+                     create_bar_chart_patch, create_bar_traces, create_line_chart, get_bar_chart_traces,
+                     get_line_chart_series, get_ranking_pivot, paginate_ranking_pivot, parse_filter_query,
+                     query_dataframe)
+
+
+def create_test_figure(region=None):
+    """Create a small figure whose title shows the regions it was built for."""
+    return go.Figure(layout={'title': {'text': str(region)}})
+
+
+def test_column_mask_on_categorical_codes():
+    """
+    GIVEN a column stored as text and as a categorical
+    WHEN both are filtered on the same values, including one that is not in the column
+    THEN the masks should be the same
+    """
+    regions = pd.Series(['London', 'North East', 'London', 'South West'])
+
+    for values in ['London', ['North East', 'South West', 'Wales'], ['Wales']]:
+        expected = column_mask(regions, values)
+        assert column_mask(regions.astype('category'), values).tolist() == expected.tolist()
+    assert column_mask(regions.astype('category'), 'London').tolist() == [True, False, True, False]
+
+
+def test_query_dataframe_filter_and_sort():
+    """
+    GIVEN a ranking table and a DataTable filter query and sort order
+    WHEN the query is applied
+    THEN only the matching rows should be returned in the requested order
+    """
+    data_df = pd.DataFrame({'HE Provider': ['University of Bath', 'Bath Spa University', 'Aston University'],
+                            'Total income (£)': [3.5e8, 8.0e7, None]})
+    filter_query = '{HE Provider} icontains "bath" && {Total income (£)} > 1e6'
+
+    assert parse_filter_query(filter_query) == [
+        ('HE Provider', 'contains', 'bath', False), ('Total income (£)', '>', '1e6', True)]
+    result = query_dataframe(data_df, filter_query,
+                             [{'column_id': 'Total income (£)', 'direction': 'asc'}])
+
+    assert result['HE Provider'].tolist() == ['Bath Spa University', 'University of Bath']
+
+
+def test_ranking_pivots_filter_and_paginate(monkeypatch):
+    """
+    GIVEN the prepared data of two academic years, with a category only one region reports
+    WHEN the ranking pivots are built and one is filtered to a region and paginated
+    THEN each (class, academic year) pivot should have a link column, the regions and the categories
+    AND the categories with no values in the selected region should be dropped
+    AND a page past the end of the filtered rows should return the last page
+    """
+    data_df = pd.DataFrame({
+        'HE Provider': ['Aston University', 'UCL', "King's College London", 'Aston University', 'UCL',
+                        'Aston University'],
+        'Region of HE provider': ['West Midlands', 'London', 'London', 'West Midlands', 'London',
+                                  'West Midlands'],
+        'Academic Year': ['2021/22', '2021/22', '2021/22', '2021/22', '2021/22', '2020/21'],
+        'Class': 'Energy',
+        'Category': ['Total energy (kWh)', 'Total energy (kWh)', 'Total energy (kWh)',
+                     'Renewable energy (kWh)', 'Environmental management system external verification',
+                     'Total energy (kWh)'],
+        'Value': [10.0, 30.0, 20.0, 5.0, 1.0, 8.0]})
+
+    pivots = build_ranking_pivots(data_df)
+    monkeypatch.setattr(figures.dataset_store, 'derive', lambda name, file_paths, builder: pivots)
+    pivot_df = get_ranking_pivot('Energy', '2021/22', ['London'])
+    records, page_count = paginate_ranking_pivot(
+        pivot_df, page_current=5, page_size=1, filter_query='{HE Provider} icontains "ucl"')
+
+    assert set(pivots) == {('Energy', '2021/22'), ('Energy', '2020/21')}
+    assert pivots[('Energy', '2021/22')].columns.tolist() == [
+        'HE Provider', 'Region of HE provider', 'Total energy (kWh)', 'Renewable energy (kWh)']
+    assert pivots[('Energy', '2021/22')]['HE Provider'].tolist() == [
+        '<a href=/university/Aston%20University>Aston University</a>',
+        "<a href=/university/King%27s%20College%20London>King's College London</a>",
+        '<a href=/university/UCL>UCL</a>']
+    assert pivot_df.columns.tolist() == ['HE Provider', 'Total energy (kWh)']
+    assert pivot_df.index.tolist() == ["King's College London", 'UCL']
+    assert records == [{'HE Provider': '<a href=/university/UCL>UCL</a>', 'Total energy (kWh)': 30.0}]
+    assert page_count == 1
+    assert get_ranking_pivot('Energy', '2019/20').columns.tolist() == ['HE Provider']
+
+
+def test_metadata_catalog_lookups():
+    """
+    GIVEN entry data and HEI data with categorical columns
+    WHEN the metadata catalog is built
+    THEN each lookup should hold the unique values in the order they first appear
+    """
+    entry_data_df = pd.DataFrame({
+        'Class': ['Energy', 'Energy', 'Energy', 'Building and spaces'],
+        'Category marker': ['Energy consumption', 'Energy consumption', 'Carbon emissions', 'Grounds area'],
+        'Category': ['Total energy (kWh)', 'Total energy (kWh)', 'Scope 3 emissions (Kg CO2e)', 'Grounds area (ha)']
+    }).astype('category')
+    hei_data_df = pd.DataFrame({'UKPRN': [10007759, 10007775, 10007792],
+                                'HE Provider': ['Aston University', 'Queen Mary University of London',
+                                                'University of Exeter'],
+                                'Region of HE provider': ['West Midlands', 'London', 'London']})
+
+    catalog = build_metadata_catalog(entry_data_df, hei_data_df)
+
+    assert catalog['class_markers'] == {'Energy': ['Energy consumption', 'Carbon emissions'],
+                                        'Building and spaces': ['Grounds area']}
+    assert catalog['marker_categories']['Energy consumption'] == ['Total energy (kWh)']
+    assert catalog['regions'] == ['West Midlands', 'London']
+    assert catalog['region_providers']['London'] == ['Queen Mary University of London', 'University of Exeter']
+    assert catalog['ukprn_names'][10007759] == 'Aston University'
+
+
+def test_card_metrics_by_ukprn():
+    """
+    GIVEN entry data for two academic years and HEI data
+    WHEN the card metrics are built for one academic year
+    THEN each UKPRN should map to the card categories reported in that year
+    AND a HE provider without data should map to no metrics
+    """
+    entry_data_df = pd.DataFrame({
+        'HE Provider': ['Aston University', 'Aston University', 'Aston University'],
+        'Academic Year': ['2021/22', '2021/22', '2020/21'],
+        'Category': ['Total income (£)', 'Grounds area (ha)', 'Total income (£)'],
+        'Value': [2.5e6, 10.0, 1.5e6]
+    })
+    hei_data_df = pd.DataFrame({'UKPRN': [10007759, 10007775],
+                                'HE Provider': ['Aston University', 'Queen Mary University of London']})
+
+    card_metrics = build_card_metrics(entry_data_df, hei_data_df, '2021/22')
+
+    assert card_metrics == {10007759: {'Total income (£)': 2.5e6}, 10007775: {}}
+
+
+def figure_json(figure):
+    """Serialise a figure to a dictionary, as Dash does before sending it to the browser."""
+    return json.loads(json.dumps(figure.to_plotly_json(), cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def test_line_chart_index_matches_boolean_filter(monkeypatch):
+    """
+    GIVEN entry data with the academic years out of order and a missing value
+    WHEN line charts and series are created from the line chart index
+    THEN they should match those created from the rows selected by a boolean filter
+    AND a class and category marker with no rows for the HEI should give an empty chart
+    AND a HEI missing from the data should give an empty chart and no series
+    """
+    data_df = pd.DataFrame({
+        'Academic Year': ['2021/22', '2019/20', '2020/21', '2021/22', '2019/20', '2020/21'],
+        'HE Provider': ['Aston University', 'Aston University', 'Aston University', 'UCL', 'Aston University',
+                        'UCL'],
+        'Class': 'Energy',
+        'Category marker': ['Energy consumption', 'Energy consumption', 'Energy consumption',
+                            'Carbon emissions', 'Energy consumption', 'Carbon emissions'],
+        'Category': ['Total energy (kWh)', 'Total energy (kWh)', 'Total energy (kWh)',
+                     'Scope 1 emissions (Kg CO2e)', 'Renewable energy (kWh)', 'Scope 1 emissions (Kg CO2e)'],
+        'Value': [3.0, 1.0, None, 7.0, 5.0, 6.0]})
+    text_columns = ['HE Provider', 'Class', 'Category marker', 'Category']
+    data_df = data_df.astype(dict.fromkeys(text_columns, 'category'))
+    index = build_line_chart_index(data_df)
+    monkeypatch.setattr(figures, 'get_line_chart_index', lambda: index)
+
+    for hei, category_marker in [('Aston University', 'Energy consumption'), ('Aston University', 'Carbon emissions'),
+                                 ('SOAS', 'Energy consumption')]:
+        selected_df = data_df[(data_df['HE Provider'] == hei) & (data_df['Class'] == 'Energy') & (
+            data_df['Category marker'] == category_marker)].sort_values(by='Academic Year', kind='stable')
+        expected = px.line(selected_df.astype(dict.fromkeys(text_columns, object)), x='Academic Year', y='Value', color='Category',
+                           markers=True, color_discrete_sequence=px.colors.qualitative.Set3)
+        expected.update_layout(title=f"Trend of '{category_marker}' categories:")
+        assert figure_json(create_line_chart(hei, 'Energy', category_marker)) == figure_json(expected)
+
+    selected_df = data_df[data_df['HE Provider'] == 'Aston University'].sort_values(
+        by='Academic Year', kind='stable')
+    expected_series = [
+        {'class': class_name, 'marker': category_marker, 'category': category,
+         'x': group['Academic Year'].tolist(),
+         'y': [None if math.isnan(value) else value for value in group['Value'].tolist()]}
+        for (class_name, category_marker, category), group in selected_df.groupby(
+            ['Class', 'Category marker', 'Category'], sort=False, observed=True)]
+    assert get_line_chart_series('Aston University')['series'] == expected_series
+    assert [series['x'] for series in expected_series] == [['2019/20', '2020/21', '2021/22'], ['2019/20']]
+    assert get_line_chart_series('SOAS')['series'] == []
+
+
+def test_bar_chart_traces_match_plotly_express():
+    """
+    GIVEN the bar chart rows of a category, with the academic years out of order
+    WHEN the traces are created for some of the HEIs and academic years
+    THEN they should match the traces drawn by px.bar from the same rows
+    AND a missing value should be kept as None
+    """
+    data_df = pd.DataFrame({'Academic Year': ['2021/22', '2019/20', '2021/22', '2020/21', '2019/20', '2020/21'],
+                            'HE Provider': ['UCL', 'UCL', 'Aston University', 'UCL', 'SOAS', 'Aston University'],
+                            'Value': [3.0, 1.0, None, 2.0, 5.0, 4.0]})
+    heis, years = ['UCL', 'Aston University'], ['2020/21', '2021/22']
+
+    traces = create_bar_traces(build_bar_chart_arrays(data_df), heis, years)
+
+    selected_df = data_df[data_df['HE Provider'].isin(heis) & data_df['Academic Year'].isin(years)]
+    expected = px.bar(selected_df, x='HE Provider', y='Value', color='Academic Year', barmode='group',
+                      color_discrete_sequence=px.colors.qualitative.Set3[:len(years)])
+    assert [trace.name for trace in traces] == ['2021/22', '2020/21']
+    assert len(traces) == len(expected.data)
+    for trace, expected_trace in zip(traces, expected.data):
+        assert list(trace.x) == expected_trace.x.tolist()
+        assert list(trace.y) == pytest.approx(
+            [None if math.isnan(value) else value for value in expected_trace.y.tolist()])
+        trace_json, expected_json = trace.to_plotly_json(), expected_trace.to_plotly_json()
+        for key in ['x', 'y']:
+            trace_json.pop(key), expected_json.pop(key)
+        assert trace_json == expected_json
+
+
+def test_bar_chart_patch_removes_bars():
+    """
+    GIVEN the traces of a bar chart for two academic years
+    WHEN a HEI is removed from the chart
+    THEN its bars should be deleted from each trace, last bar first
+    AND the bars of the other HEIs should be kept
+    """
+    traces = [['2021/22', ['Aston University', 'UCL', 'Aston University']], ['2020/21', ['UCL']]]
+
+    patch, updated_traces = create_bar_chart_patch(
+        traces, [], ['Aston University'], ['2021/22', '2020/21'], 'Total energy (kWh)')
+
+    deleted = [(operation['operation'], operation['location'])
+               for operation in patch.to_plotly_json()['operations']]
+    assert deleted == [('Delete', ['data', 0, 'x', 2]), ('Delete', ['data', 0, 'y', 2]),
+                       ('Delete', ['data', 0, 'x', 0]), ('Delete', ['data', 0, 'y', 0])]
+    assert updated_traces == [['2021/22', ['UCL']], ['2020/21', ['UCL']]]
+
+
+def apply_patch(figure, patch):
+    """Apply the Delete and Extend operations of a dash.Patch to a serialised figure, as the browser does."""
+    for operation in patch.to_plotly_json()['operations']:
+        *path, last = operation['location']
+        target = figure
+        for key in path:
+            target = target[key]
+        if operation['operation'] == 'Delete':
+            del target[last]
+        else:
+            assert operation['operation'] == 'Extend'
+            target[last] = target[last] + operation['params']['value']
+    return figure
+
+
+def test_bar_chart_patch_applies_to_serialised_chart(monkeypatch):
+    """
+    GIVEN a bar chart serialised to JSON as Dash sends it to the browser
+    WHEN the patch that removes one HEI and adds another is applied to it
+    THEN the providers and values of each trace should be plain lists
+    AND each remaining bar should keep the value of its own HEI
+    """
+    data_df = pd.DataFrame({'Academic Year': ['2021/22', '2021/22', '2021/22', '2020/21', '2020/21'],
+                            'HE Provider': ['UCL', 'Aston University', 'SOAS', 'UCL', 'Aston University'],
+                            'Category marker': 'Energy consumption', 'Category': 'Total energy (kWh)',
+                            'Value': [3.0, None, 5.0, 2.0, 4.0]})
+    index = {'Total energy (kWh)': {'data': data_df, 'marker': 'Energy consumption',
+                                    **build_bar_chart_arrays(data_df)}}
+    monkeypatch.setattr(figures, 'get_bar_chart_index', lambda: index)
+    years = ['2021/22', '2020/21']
+
+    figure = create_bar_chart(['UCL', 'Aston University'], years, 'Total energy (kWh)')
+    figure = json.loads(json.dumps(figure.to_plotly_json(), cls=plotly.utils.PlotlyJSONEncoder))
+    assert all(isinstance(trace['x'], list) and isinstance(trace['y'], list) for trace in figure['data'])
+    patch, traces = create_bar_chart_patch(
+        get_bar_chart_traces(figure), ['SOAS'], ['UCL'], years, 'Total energy (kWh)')
+    figure = apply_patch(figure, patch)
+
+    assert [(trace['name'], trace['x'], trace['y']) for trace in figure['data']] == [
+        ('2021/22', ['Aston University', 'SOAS'], [None, 5.0]), ('2020/21', ['Aston University'], [4.0])]
+    assert traces == [['2021/22', ['Aston University', 'SOAS']], ['2020/21', ['Aston University']]]
+
+
+def test_figure_cache_ignores_list_order():
+    """
+    GIVEN an empty figure cache
+    WHEN the same regions are requested in a different order
+    THEN the second request should be served from the cache
+    """
+    cache = FigureCache()
+
+    first = cache.get(create_test_figure, ['London', 'North East'])
+    second = cache.get(create_test_figure, ['North East', 'London'])
+
+    assert second is first
+    assert cache.info()['hits'] == 1
+    assert cache.info()['misses'] == 1
+
+
+def test_figure_cache_evicts_least_recently_used():
+    """
+    GIVEN a figure cache that can hold two entries
+    WHEN three different figures are requested
+    THEN the least recently used figure should be removed
+    """
+    cache = FigureCache(maxsize=2)
+
+    cache.get(create_test_figure, ['London'])
+    cache.get(create_test_figure, ['North East'])
+    cache.get(create_test_figure, ['London'])
+    cache.get(create_test_figure, ['South West'])
+    cache.get(create_test_figure, ['London'])
+    cache.get(create_test_figure, ['North East'])
+
+    assert cache.info() == {'hits': 2, 'misses': 4, 'size': 2, 'maxsize': 2}
+
+
+def test_figure_cache_cleared_on_reload():
+    """
+    GIVEN a figure cache registered with a dataset store
+    WHEN the dataset store is cleared
+    THEN the figure cache should be empty
+    """
+    store = DatasetStore()
+    cache = FigureCache()
+    store.add_reload_listener(cache.clear)
+    cache.get(create_test_figure, ['London'])
+
+    store.clear()
+
+    assert cache.info()['size'] == 0
+
+
+def test_figure_cache_rebuilds_when_version_changes():
+    """
+    GIVEN a figure cache holding a figure built from one version of the data
+    WHEN the same figure is requested after the data files have changed
+    THEN the figure should be built again instead of served from the cache
+    """
+    versions = iter(['v1', 'v1', 'v2'])
+    cache = FigureCache(version=lambda: next(versions))
+
+    first = cache.get(create_test_figure, ['London'])
+    second = cache.get(create_test_figure, ['London'])
+    third = cache.get(create_test_figure, ['London'])
+
+    assert second is first
+    assert third is not first
+    assert cache.info() == {'hits': 1, 'misses': 2, 'size': 1, 'maxsize': 256}
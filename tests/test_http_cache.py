@@ -0,0 +1,110 @@
+"""
+This module contains tests for the ETags added to the responses of the Dash app.
+
+The tests include:
+- Checking that the outputs of single and multi-output callback requests are read.
+- Checking that only data-derived callbacks and routes are given an ETag.
+- Checking that the ETag changes with the request body and the data version.
+- Checking that the code version changes with the settings of the app.
+- Checking that only GET and HEAD requests are answered with 304 Not Modified.
+"""
+
+from flask import Flask
+
+import http_cache
+from http_cache import callback_outputs, code_version, is_cacheable, register_http_caching, request_etag
+
+
+def callback_body(output):
+    """Return the body of a callback request for the given output."""
+    return {'output': output, 'inputs': [{'id': 'class-dropdown-rank', 'property': 'value', 'value': 'Energy'}]}
+
+
+def test_callback_outputs():
+    """
+    GIVEN the bodies of a single-output and a multi-output callback request
+    WHEN their outputs are read
+    THEN each output should be returned as 'id.property'
+    """
+    assert callback_outputs(callback_body('england_map.figure')) == ['england_map.figure']
+    assert callback_outputs(callback_body('..ranking-table.data...ranking-table.page_count..')) == [
+        'ranking-table.data', 'ranking-table.page_count']
+
+
+def test_only_data_requests_cacheable():
+    """
+    GIVEN requests to the Flask server
+    WHEN they are checked for caching
+    THEN data-derived callbacks and routes should be cacheable
+    AND other callbacks and routes should not be
+    """
+    server = Flask(__name__)
+    cases = [('POST', '/_dash-update-component', callback_body('ranking-table-div.children'), True),
+             ('POST', '/_dash-update-component', callback_body('collapse.is_open'), False),
+             ('GET', '/_dash-layout', None, True),
+             ('GET', '/export/ranking.csv', None, True),
+             ('GET', '/ranking_table', None, False)]
+
+    for method, path, body, expected in cases:
+        with server.test_request_context(path, method=method, json=body):
+            assert is_cacheable() == expected
+
+
+def test_etag_depends_on_request_and_data():
+    """
+    GIVEN two callback requests with different inputs
+    WHEN their ETags are built for the same and for a new data version
+    THEN the ETags should only match for the same request and data version
+    """
+    server = Flask(__name__)
+    etags = []
+    for value in ['Energy', 'Energy', 'Transport and environment']:
+        body = callback_body('ranking-table-div.children')
+        body['inputs'][0]['value'] = value
+        with server.test_request_context('/_dash-update-component', method='POST', json=body):
+            etags.append(request_etag('data-v1', 'code-v1'))
+            new_data_etag = request_etag('data-v2', 'code-v1')
+
+    assert etags[0] == etags[1]
+    assert etags[1] != etags[2]
+    assert new_data_etag != etags[2]
+
+
+def test_code_version_depends_on_settings(tmp_path, monkeypatch):
+    """
+    GIVEN a folder of app code
+    WHEN the setting that moves the callbacks to the server is changed
+    THEN the code version should change
+    """
+    tmp_path.joinpath('app.py').write_text('app = None')
+    monkeypatch.delenv('HEI_CLIENTSIDE_CALLBACKS', raising=False)
+    clientside_version = code_version(tmp_path)
+    monkeypatch.setenv('HEI_CLIENTSIDE_CALLBACKS', '0')
+
+    assert code_version(tmp_path) != clientside_version
+
+
+def test_not_modified_only_for_get_and_head(monkeypatch):
+    """
+    GIVEN a server with ETag handling and a cacheable route and callback
+    WHEN they are requested again with the ETag of their previous response
+    THEN the GET and HEAD requests should be answered with 304 Not Modified
+    AND the callback POST request should be handled as usual
+    """
+    monkeypatch.setattr(http_cache.dataset_store, 'version', lambda file_paths: 'data-v1')
+    server = Flask(__name__)
+    server.add_url_rule('/_dash-layout', 'layout', lambda: 'layout')
+    server.add_url_rule('/_dash-update-component', 'callback', lambda: 'figure', methods=['POST'])
+    register_http_caching(server)
+    client = server.test_client()
+    body = callback_body('ranking-table-div.children')
+
+    layout_etag = client.get('/_dash-layout').headers['ETag']
+    callback_response = client.post('/_dash-update-component', json=body)
+    callback_etag = callback_response.headers['ETag']
+
+    assert client.get('/_dash-layout', headers={'If-None-Match': layout_etag}).status_code == 304
+    assert client.head('/_dash-layout', headers={'If-None-Match': layout_etag}).status_code == 304
+    repeated = client.post('/_dash-update-component', json=body, headers={'If-None-Match': callback_etag})
+    assert repeated.status_code == 200
+    assert repeated.get_data(as_text=True) == 'figure'
@@ -0,0 +1,85 @@
+"""
+This module contains tests for the timing instrumentation of the figure builders and page callbacks.
+
+The tests include:
+- Checking that functions are left unchanged when instrumentation is off.
+- Checking that calls and their stages are recorded with their row counts when instrumentation is on.
+- Checking that a JSON timing line is written for each call when instrumentation is on.
+"""
+
+import io
+import json
+import logging
+
+import pandas as pd
+
+import instrumentation
+from instrumentation import configure_metrics_logger, logger, metrics_registry, stage, timed
+
+
+def build_table(rows):
+    """Return a DataFrame with the given number of rows, timing the stage that builds it."""
+    with stage('build') as timing:
+        data_df = pd.DataFrame({'Value': range(rows)})
+        timing.rows = len(data_df)
+    return data_df
+
+
+def test_timed_disabled_returns_function(monkeypatch):
+    """
+    GIVEN instrumentation is off
+    WHEN a function is decorated with timed
+    THEN the function should be returned unchanged
+    AND its stages should not be recorded
+    """
+    monkeypatch.setattr(instrumentation, 'METRICS_ENABLED', False)
+    metrics_registry.clear()
+
+    assert timed()(build_table) is build_table
+    build_table(3)
+    assert metrics_registry.snapshot() == {}
+
+
+def test_timed_records_calls_and_stages(monkeypatch):
+    """
+    GIVEN instrumentation is on
+    WHEN a timed function with a stage is called twice
+    THEN the calls and the stage should be counted
+    AND the rows of the returned DataFrame and of the stage should be added up
+    """
+    monkeypatch.setattr(instrumentation, 'METRICS_ENABLED', True)
+    metrics_registry.clear()
+    timed_build_table = timed('build_table')(build_table)
+
+    timed_build_table(3)
+    timed_build_table(4)
+    metrics = metrics_registry.snapshot()
+
+    assert metrics['build_table']['count'] == 2
+    assert metrics['build_table']['rows'] == 7
+    assert metrics['build_table.build']['count'] == 2
+    assert metrics['build_table.build']['rows'] == 7
+    metrics_registry.clear()
+
+
+def test_timed_writes_log_lines(monkeypatch):
+    """
+    GIVEN instrumentation is on and the metrics logger has no handler
+    WHEN the metrics logger is configured and a timed function is called
+    THEN a JSON timing line with the stages of the call should be written
+    """
+    monkeypatch.setattr(instrumentation, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(logger, 'handlers', [])
+    monkeypatch.setattr(logger, 'level', logging.NOTSET)
+    monkeypatch.setattr(logger, 'propagate', True)
+    stream = io.StringIO()
+    configure_metrics_logger(stream)
+
+    timed('build_table')(build_table)(2)
+    line = json.loads(stream.getvalue().splitlines()[-1])
+
+    assert line['event'] == 'timing'
+    assert line['name'] == 'build_table'
+    assert line['rows'] == 2
+    assert line['stages']['build']['rows'] == 2
+    metrics_registry.clear()
@@ -3,6 +3,7 @@ This module contains tests for the ranking table page.
 
 The tests include:
 - Checking if the ranking table page contains the expected components.
+- Checking that the page opens when its URL has a query string.
 - Testing if selecting options in the dropdowns updates the table.
 """
 
@@ -31,6 +32,19 @@ def test_ranking_table_layout(dash_duo, navigate_to_page, wait_for_element):
     assert table_div.is_displayed()
 
 
+def test_ranking_table_layout_with_query_string(dash_duo, navigate_to_page, wait_for_element):
+    """
+    GIVEN the Dash app is running
+    WHEN the user opens the ranking table page with a query string in its URL
+    THEN the page should show the ranking table
+    """
+
+    navigate_to_page('/ranking_table?utm_source=test')
+    wait_for_element((By.ID, "ranking-table"))
+
+    assert dash_duo.find_element("#ranking-table").is_displayed()
+
+
 def test_ranking_table_callback(dash_duo, navigate_to_page, wait_for_element, choose_select_dbc_option):
     """
     GIVEN the Dash app is running
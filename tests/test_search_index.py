@@ -0,0 +1,51 @@
+"""
+This module contains tests for the search index of the HE provider names.
+
+The tests include:
+- Checking that names are normalised without case, accents or punctuation.
+- Checking that exact, prefix, word prefix, substring and fuzzy matches are ranked in that order.
+- Checking that alternative names are searched and empty queries return every HE provider.
+"""
+
+from search_index import SearchIndex, normalize_text
+
+PROVIDERS = ['Kingston University', "King's College London", 'The University of Manchester',
+             'The Manchester Metropolitan University', 'University of the West of England, Bristol']
+
+
+def test_normalize_text():
+    """
+    GIVEN names with capitals, accents, apostrophes and punctuation
+    WHEN they are normalised
+    THEN they should be lower case words separated by single spaces
+    """
+    assert normalize_text("King's College, London") == 'kings college london'
+    assert normalize_text('  Université  de   Paris ') == 'universite de paris'
+
+
+def test_search_ranks_matches():
+    """
+    GIVEN a search index of HE providers
+    WHEN it is searched for exact names, prefixes, words, substrings and misspelt words
+    THEN the matching HE providers should be returned with the closest matches first
+    """
+    index = SearchIndex(PROVIDERS)
+
+    assert index.search('kings') == ["King's College London", 'Kingston University']
+    assert index.search('uni of man') == ['The University of Manchester']
+    assert index.search('chester') == ['The University of Manchester', 'The Manchester Metropolitan University']
+    assert index.search('manchster univ') == ['The University of Manchester', 'The Manchester Metropolitan University']
+    assert index.search('xyz') == []
+
+
+def test_search_alternative_names():
+    """
+    GIVEN a search index with alternative names
+    WHEN it is searched for an alternative name or for nothing
+    THEN the HE provider of the alternative name, or every HE provider, should be returned
+    """
+    index = SearchIndex(PROVIDERS, {'University of the West of England, Bristol': 'UWE Bristol'})
+
+    assert index.search('UWE') == ['University of the West of England, Bristol']
+    assert index.search('') == PROVIDERS
+    assert index.search(None, limit=2) == PROVIDERS[:2]